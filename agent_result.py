@@ -0,0 +1,157 @@
+import json
+import base64
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+# Token usage fields reported by Bedrock, in the order we report them
+USAGE_FIELDS = ("inputTokens", "outputTokens", "totalTokens", "cacheReadInputTokens", "cacheWriteInputTokens")
+
+# Tools that query the O'Reilly catalog; calling one sets searchedApi
+SEARCH_TOOLS = frozenset({"search_catalog", "http_request"})
+
+@dataclass
+class AgentTurn:
+    """What one agent turn produced: reply text, tool calls and token usage"""
+
+    text: str
+    tool_uses: List[Dict[str, Any]] = field(default_factory=list)
+    usage: Dict[str, int] = field(default_factory=dict)
+    stop_reason: Optional[str] = None
+    # Estimated input tokens removed before this turn to fit the context budget
+    context_tokens_saved: int = 0
+
+    @property
+    def searched_api(self) -> bool:
+        return any(tool_use.get("name") in SEARCH_TOOLS for tool_use in self.tool_uses)
+
+    @property
+    def tool_names(self) -> List[str]:
+        return [tool_use.get("name", "") for tool_use in self.tool_uses]
+
+def message_text(message: Optional[Dict[str, Any]]) -> str:
+    """Join the text blocks of a message, in order"""
+    if not message:
+        return ""
+    parts = []
+    for block in message.get("content") or ():
+        if "text" in block:
+            parts.append(block["text"])
+        elif "citationsContent" in block:
+            parts.extend(item["text"] for item in block["citationsContent"].get("content", ()) if "text" in item)
+    return "\n".join(parts)
+
+def messages_after(messages: List[Dict[str, Any]], marker) -> List[Dict[str, Any]]:
+    """The messages added after marker, the last message before a turn.
+
+    Found by identity rather than position, since the conversation manager
+    may summarize or trim earlier messages at the start of the turn.
+    """
+    for index in range(len(messages) - 1, -1, -1):
+        if messages[index] is marker:
+            return messages[index + 1:]
+    # marker was summarized away too: the turn starts at the latest user prompt
+    for index in range(len(messages) - 1, -1, -1):
+        message = messages[index]
+        if message.get("role") == "user" and not any("toolResult" in block for block in message.get("content") or ()):
+            return messages[index:]
+    return messages
+
+def _encode_value(value):
+    # Bedrock image/document blocks carry raw bytes, which JSON can't hold
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(bytes(value)).decode("ascii")}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _decode_object(obj):
+    if len(obj) == 1 and "__bytes__" in obj:
+        return base64.b64decode(obj["__bytes__"])
+    return obj
+
+def encode_state(state: Dict[str, Any]) -> str:
+    """Serialize agent state (messages plus conversation manager state) to text"""
+    return json.dumps(state, ensure_ascii=False, separators=(",", ":"), default=_encode_value)
+
+def decode_state(text: str) -> Dict[str, Any]:
+    return json.loads(text, object_hook=_decode_object)
+
+def agent_state(agent) -> Dict[str, Any]:
+    """What session_store keeps of an agent: its messages and conversation manager state"""
+    return {"messages": agent.messages, "conversation_manager": agent.conversation_manager.get_state()}
+
+def restore_agent(agent, state: Optional[Dict[str, Any]]) -> None:
+    """Load state saved by agent_state into agent, replacing its messages"""
+    state = state or {}
+    agent.messages[:] = state.get("messages", [])
+    manager = agent.conversation_manager
+    # State saved by another manager class (e.g. before a config change) still
+    # carries the shared fields, so restore it under this manager's name
+    manager.restore_from_session(dict(
+        state.get("conversation_manager") or {"removed_message_count": 0},
+        __name__=type(manager).__name__,
+    ))
+
+def tool_uses_in(messages: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Collect the toolUse blocks of the assistant messages in a turn"""
+    tool_uses = []
+    for message in messages:
+        if message.get("role") != "assistant":
+            continue
+        for block in message.get("content") or ():
+            if "toolUse" in block:
+                tool_use = block["toolUse"]
+                tool_uses.append({
+                    "name": tool_use.get("name"),
+                    "toolUseId": tool_use.get("toolUseId"),
+                    "input": tool_use.get("input"),
+                })
+    return tool_uses
+
+def turn_usage(result) -> Dict[str, int]:
+    """Token usage of the invocation that produced result (not the agent's lifetime total)"""
+    invocation = result.metrics.latest_agent_invocation
+    usage = invocation.usage if invocation is not None else result.metrics.accumulated_usage
+    return {name: usage[name] for name in USAGE_FIELDS if name in usage}
+
+def extract_agent_turn(result, turn_messages: Iterable[Dict[str, Any]] = ()) -> AgentTurn:
+    """Build an AgentTurn from a Strands AgentResult.
+
+    turn_messages are the messages the turn appended to the agent's history;
+    tool calls are read from them since the result only holds the final reply.
+    """
+    return AgentTurn(
+        text=message_text(result.message),
+        tool_uses=tool_uses_in(turn_messages),
+        usage=turn_usage(result),
+        stop_reason=result.stop_reason,
+    )
+
+class UsageTotals:
+    """Running token and tool-call totals across all agent turns"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.tokens = {name: 0 for name in USAGE_FIELDS}
+        self.tool_calls: Dict[str, int] = {}
+        self.context_tokens_saved = 0
+
+    def add(self, turn: AgentTurn) -> None:
+        with self._lock:
+            self.turns += 1
+            self.context_tokens_saved += turn.context_tokens_saved
+            for name, value in turn.usage.items():
+                self.tokens[name] = self.tokens.get(name, 0) + value
+            for name in turn.tool_names:
+                self.tool_calls[name] = self.tool_calls.get(name, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "turns": self.turns,
+                "tokens": dict(self.tokens),
+                "tool_calls": dict(self.tool_calls),
+                "context_tokens_saved": self.context_tokens_saved,
+            }
+
+usage_totals = UsageTotals()
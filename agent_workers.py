@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import time
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from agent_result import AgentTurn, decode_state, encode_state
+from structured_logging import get_logger, request_id_var
+from tracing import inject_trace_context
+
+logger = get_logger("agent_workers")
+
+# Warm worker pool settings. Off by default: each worker is a second cold
+# start (credentials, model client, agents), which lazy startup avoids
+AGENT_WORKER_PROCESSES = int(os.getenv("AGENT_WORKER_PROCESSES", "0"))
+AGENT_WORKER_MAX_REQUESTS = int(os.getenv("AGENT_WORKER_MAX_REQUESTS", "200"))
+AGENT_WORKER_TIMEOUT_SECONDS = float(os.getenv("AGENT_WORKER_TIMEOUT_SECONDS", "180"))
+AGENT_WORKER_STARTUP_TIMEOUT_SECONDS = float(os.getenv("AGENT_WORKER_STARTUP_TIMEOUT_SECONDS", "120"))
+AGENT_WORKER_HEALTHCHECK_SECONDS = float(os.getenv("AGENT_WORKER_HEALTHCHECK_SECONDS", "30"))
+
+# Responses run to tens of KB; the default 64 KB line limit is too tight
+_FRAME_LIMIT_BYTES = 16 * 1024 * 1024
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+class AgentWorkerError(Exception):
+    """Raised when a worker can't serve a request"""
+
+class AgentWorker:
+    """One long-lived `main.py --worker` process, handling one request at a time"""
+
+    def __init__(self):
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.requests_served = 0
+        self.started_at: Optional[float] = None
+        self._next_id = 0
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process else None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self) -> None:
+        """Spawn the process and wait until it has built its agents"""
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            WORKER_SCRIPT,
+            "--worker",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=None,  # Worker logs go straight to our stderr
+            limit=_FRAME_LIMIT_BYTES,
+        )
+        try:
+            frame = await asyncio.wait_for(self._read_frame(), timeout=AGENT_WORKER_STARTUP_TIMEOUT_SECONDS)
+        except Exception:
+            await self.stop()
+            raise
+        if frame.get("type") != "ready":
+            await self.stop()
+            raise AgentWorkerError(f"Unexpected startup frame from worker: {frame}")
+        self.started_at = time.monotonic()
+
+    async def _read_frame(self) -> Dict[str, Any]:
+        line = await self.process.stdout.readline()
+        if not line:
+            raise AgentWorkerError(f"Worker {self.pid} exited with code {self.process.returncode}")
+        return json.loads(line)
+
+    async def request(self, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """Send one request frame and wait for its response"""
+        if not self.alive:
+            raise AgentWorkerError("Worker is not running")
+        self._next_id += 1
+        frame = dict(payload, id=self._next_id)
+        self.process.stdin.write((json.dumps(frame, ensure_ascii=False) + "\n").encode("utf-8"))
+        await self.process.stdin.drain()
+
+        response = await asyncio.wait_for(self._read_frame(), timeout=timeout)
+        if response.get("id") != frame["id"]:
+            raise AgentWorkerError(f"Worker {self.pid} answered request {response.get('id')}, expected {frame['id']}")
+        return response
+
+    async def ping(self, timeout: float = 5.0) -> bool:
+        try:
+            response = await self.request({"type": "ping"}, timeout=timeout)
+            return bool(response.get("ok"))
+        except Exception:
+            return False
+
+    async def stop(self) -> None:
+        if self.process is None or self.process.returncode is not None:
+            return
+        try:
+            self.process.stdin.close()  # Worker exits when stdin closes
+            await asyncio.wait_for(self.process.wait(), timeout=5)
+        except Exception:
+            self.process.kill()
+            await self.process.wait()
+
+class AgentWorkerPool:
+    """Supervised pool of warm agent worker processes.
+
+    Workers are started once and reused, so a request costs a pipe round-trip
+    instead of a Python/boto3/strands cold start. Each worker serves one
+    request at a time and is recycled after AGENT_WORKER_MAX_REQUESTS. A
+    worker that times out, crashes or fails its health check is replaced.
+    """
+
+    def __init__(self, size: int = AGENT_WORKER_PROCESSES,
+                 max_requests: int = AGENT_WORKER_MAX_REQUESTS):
+        self.size = size
+        self.max_requests = max_requests
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers: List[AgentWorker] = []
+        self._supervisor: Optional[asyncio.Task] = None
+        self._spawning: set = set()
+        # Workers being stopped outside a request; held so the tasks aren't
+        # garbage-collected mid-run and stop() can wait for them
+        self._retiring: set = set()
+        self.recycled = 0
+        self.failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def start(self) -> None:
+        """Start warming workers in the background (call from the app lifespan)"""
+        if not self.enabled or self._supervisor is not None:
+            return
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            self._spawn()
+        self._supervisor = asyncio.create_task(self._supervise())
+
+    def _spawn(self) -> None:
+        task = asyncio.create_task(self._start_worker())
+        self._spawning.add(task)
+        task.add_done_callback(self._spawning.discard)
+
+    async def _start_worker(self) -> None:
+        worker = AgentWorker()
+        try:
+            await worker.start()
+        except Exception as e:
+            self.failures += 1
+            logger.error("Error starting agent worker: %s", e)
+            # Back off before trying again so a broken setup doesn't spin
+            await asyncio.sleep(AGENT_WORKER_HEALTHCHECK_SECONDS)
+            self._spawn()
+            return
+        self._workers.append(worker)
+        self._idle.put_nowait(worker)
+        logger.info("Agent worker %s ready", worker.pid)
+
+    def _retire_in_background(self, worker: AgentWorker) -> None:
+        task = asyncio.create_task(self._retire(worker))
+        self._retiring.add(task)
+        task.add_done_callback(self._retired)
+
+    def _retired(self, task: asyncio.Task) -> None:
+        self._retiring.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Error retiring agent worker: %s", task.exception())
+
+    async def _retire(self, worker: AgentWorker, replace: bool = True) -> None:
+        if worker in self._workers:
+            self._workers.remove(worker)
+        await worker.stop()
+        if replace:
+            self._spawn()
+
+    async def call(self, message: str, session_id: Optional[str] = None,
+                   content_type: Optional[str] = None, state: Optional[Dict[str, Any]] = None,
+                   timeout: float = AGENT_WORKER_TIMEOUT_SECONDS) -> Tuple[AgentTurn, Dict[str, Any]]:
+        """Run one agent turn on a warm worker, continuing from the given agent state.
+
+        Returns the uncleaned result and the agent state after the turn.
+        """
+        if not self.enabled or self._idle is None:
+            raise AgentWorkerError("Agent worker pool is not running")
+
+        try:
+            worker = await asyncio.wait_for(self._idle.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise AgentWorkerError(f"No agent worker became free within {timeout}s")
+
+        try:
+            response = await worker.request({
+                "type": "chat",
+                "message": message,
+                "session_id": session_id,
+                "content_type": content_type,
+                "state": encode_state(state) if state else None,
+                "request_id": request_id_var.get(),
+                "trace_context": inject_trace_context(),
+            }, timeout=timeout)
+        except BaseException:
+            # Timed out, crashed or cancelled mid-request: its pipe state is unknown
+            self.failures += 1
+            self._retire_in_background(worker)
+            raise
+
+        worker.requests_served += 1
+        if worker.requests_served >= self.max_requests:
+            self.recycled += 1
+            self._retire_in_background(worker)
+        else:
+            self._idle.put_nowait(worker)
+
+        if not response.get("ok"):
+            raise AgentWorkerError(f"{response.get('error_type', 'Error')}: {response.get('error')}")
+        turn = AgentTurn(
+            text=response.get("text", ""),
+            tool_uses=response.get("tool_uses") or [],
+            usage=response.get("usage") or {},
+            stop_reason=response.get("stop_reason"),
+        )
+        return turn, decode_state(response["state"])
+
+    async def _supervise(self) -> None:
+        """Periodically ping idle workers and replace any that are unhealthy"""
+        while True:
+            await asyncio.sleep(AGENT_WORKER_HEALTHCHECK_SECONDS)
+            for _ in range(self._idle.qsize()):
+                worker = self._idle.get_nowait()
+                if worker.alive and await worker.ping():
+                    self._idle.put_nowait(worker)
+                else:
+                    self.failures += 1
+                    logger.warning("Agent worker %s failed health check, replacing it", worker.pid)
+                    await self._retire(worker)
+
+    async def stop(self) -> None:
+        # Let retirements finish first: a cancelled one could leave its process running
+        await asyncio.gather(*self._retiring, return_exceptions=True)
+        tasks = list(self._spawning)
+        if self._supervisor is not None:
+            tasks.append(self._supervisor)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._supervisor = None
+        await asyncio.gather(*(worker.stop() for worker in self._workers), return_exceptions=True)
+        self._workers.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "ready": len(self._workers),
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "recycled": self.recycled,
+            "failures": self.failures,
+        }
+
+agent_worker_pool = AgentWorkerPool()
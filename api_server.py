@@ -1,28 +1,87 @@
 from fastapi import FastAPI, Request, BackgroundTasks, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import subprocess
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 import sys
 import asyncio
 from pydantic import BaseModel
 import os
 import time
 import json
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+import weakref
+from opentelemetry import trace
+import contextvars
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+from agent_workers import agent_worker_pool
+from session_store import session_store
+from session_memory import session_memory
+from response_cache import response_cache
+from response_cleaner import clean_and_format_response, StreamingResponseCleaner
+from structured_logging import get_logger, log_payload, CorrelationIdMiddleware
+from metrics import (
+    registry as metrics_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE, RequestLatencyMiddleware, CHAT_STAGE_SECONDS,
+    WORKER_FALLBACKS_TOTAL, SESSION_EVICTIONS_TOTAL, AGENT_TURNS_TOTAL, TOKENS_TOTAL, CONTEXT_TOKENS_SAVED_TOTAL
+)
+from intent_router import intent_router, Route, INTENT_ROUTER_ENABLED
+from conversation_managers import summary_executor
+from tracing import configure_tracing, shutdown_tracing, traced, TracingMiddleware
+from agent_result import (
+    AgentTurn, agent_state, extract_agent_turn, messages_after, restore_agent, tool_uses_in, turn_usage,
+    usage_totals,
+)
+from main import create_session_agent, warm_up
+from live_events import (
+    live_events_store, public_event, parse_datetime, filter_events, sort_events,
+    query_fingerprint, encode_cursor, decode_cursor, LiveEventsAuthError,
+    DURATION_BUCKETS, SORT_ORDERS, LIVE_EVENTS_DEFAULT_PAGE_SIZE, LIVE_EVENTS_MAX_PAGE_SIZE
+)
 
 # Load environment variables from .env file
 load_dotenv()
 
+logger = get_logger("api")
+configure_tracing()
+
 # Simple lifespan manager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown handler"""
-    print("🚀 Starting O'Reilly Learning Assistant API Server...")
+    global server_loop
+    logger.info("Starting O'Reilly Learning Assistant API Server")
+    server_loop = asyncio.get_running_loop()
+    # Keep the live events index warm so requests never wait on the upstream API
+    live_events_store.start()
+    # Warm the fallback agent workers so a failed in-process turn doesn't pay a cold start
+    agent_worker_pool.start()
+    if session_memory.budget_bytes > 0 and session_store.spill_drops_state():
+        logger.warning("Neither SESSION_SPILL_DIR nor SESSION_SNAPSHOT_PATH is set: sessions evicted to stay "
+                       "within SESSION_MEMORY_BUDGET_MB lose their history and agent state")
+    # Expire idle sessions on a fixed schedule rather than from request handlers
+    session_reaper = asyncio.create_task(reap_sessions_periodically())
+    if AGENT_WARMUP_CONTENT_TYPES:
+        # Credentials and model clients are otherwise set up by the first /chat
+        await asyncio.to_thread(warm_up, AGENT_WARMUP_CONTENT_TYPES)
     yield
-    print("🔌 Shutting down server...")
+    logger.info("Shutting down server")
+    session_reaper.cancel()
+    try:
+        await session_reaper
+    except asyncio.CancelledError:
+        pass
+    await live_events_store.stop()
+    await agent_worker_pool.stop()
+    # Let in-flight agent calls finish, but drop anything still queued
+    agent_executor.shutdown(wait=False, cancel_futures=True)
+    # Background summaries only shorten future turns, so queued ones can be dropped
+    summary_executor.shutdown(wait=False, cancel_futures=True)
+    from catalog import close_http_client
+    close_http_client()
+    session_store.close()
+    shutdown_tracing()
 
 # Create FastAPI app with lifespan manager
 app = FastAPI(title="EduMentor AI - Learning Assistant", lifespan=lifespan)
@@ -53,6 +112,16 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+CHAT_PATHS = ["/chat", "/chat/stream", "/chat-raw"]
+
+# Top-level span of each chat request's trace (opt-in via TRACING_ENABLED); added
+# before the correlation middleware so it runs inside it and sees the request ID
+app.add_middleware(TracingMiddleware, paths=CHAT_PATHS)
+# Tag every request's log records with an X-Request-ID correlation ID
+app.add_middleware(CorrelationIdMiddleware)
+# End-to-end latency of the chat endpoints for /metrics
+app.add_middleware(RequestLatencyMiddleware, paths=CHAT_PATHS)
+
 # Define request models
 class ChatRequest(BaseModel):
     """
@@ -69,408 +138,498 @@ class ChatRequest(BaseModel):
 
 # Create a process pool for running the chatbot
 chatbot_process = None
-chatbot_path = os.path.join(os.path.dirname(__file__), "main.py")
 
-# Dictionary to store conversation history by session ID
-conversation_history = {}
+# Conversation history, activity/heartbeat times and serialized agent messages
+# live in session_store (SESSION_STORE_BACKEND=sqlite to share them between workers)
 
-# Dictionary to store agent instances by session ID
+# Agents built in this process, by session ID (plus content type for specialists).
+# Only a cache: their messages are reloaded from session_store when another
+# worker has run a turn for the session since.
 agent_instances = {}
+# agent_instances keys per session (each mapped to its stored agent state
+# key), so a session's agents drop without a scan
+session_agent_keys: Dict[str, Dict[str, str]] = {}
+# Agent state key holding the content type intent_router last sent a
+# default-profile session to. Stored like agent state so the route survives
+# restarts and is shared between workers; content types never start with "_"
+ROUTE_STATE_KEY = "_route"
 
-# Dictionary to store last activity time for each session
-last_activity = {}
-
-# Dictionary to store session heartbeat times
-session_heartbeats = {}
+# Which (session_id, agent_key, version) of stored state each live agent holds
+loaded_agent_state: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
 
 # Session timeout settings - More aggressive cleanup for minimal resource usage
 SESSION_TIMEOUT_HOURS = 0.5  # Sessions timeout after 30 minutes of inactivity
 HEARTBEAT_TIMEOUT_MINUTES = 5  # Sessions timeout after 5 minutes without heartbeat
+# How often the reaper started in lifespan removes expired sessions
+SESSION_REAP_INTERVAL_SECONDS = float(os.getenv("SESSION_REAP_INTERVAL_SECONDS", "30"))
 
-def clean_and_format_response(text):
-    """Clean and format the response for better UI presentation"""
-    if not text:
-        return ""
-        
-    text = str(text)  # Ensure it's a string
-    print(f"DEBUG: Raw response length: {len(text)}")
-    print(f"DEBUG: Raw response preview: {text[:500]}...")
-    
-    import re
-    
-    # Remove AI thinking/meta-commentary lines
-    lines_to_remove = [
-        r"^Thank you for providing.*",
-        r"^I'll now (?:summarize|present|provide).*",
-        r"^Let me (?:summarize|present|provide).*",
-        r"^Here's (?:a summary|what I found).*search results.*",
-        r"^Based on (?:the|your) search results.*",
-    ]
-    
-    for pattern in lines_to_remove:
-        text = re.sub(pattern, "", text, flags=re.MULTILINE | re.IGNORECASE)
-    
-    # Only remove obvious JSON structure artifacts, but preserve content
-    # Remove leading JSON artifacts
-    text = re.sub(r"^'role'\s*:\s*'assistant'\s*,?\s*'?content'?\s*:\s*\[\s*\{\s*'text'\s*:\s*[\"']", "", text)
-    text = re.sub(r"^\{\s*'content'\s*:\s*\[\s*\{\s*'text'\s*:\s*[\"']", "", text)
-    text = re.sub(r"^\[\s*\{\s*'text'\s*:\s*[\"']", "", text)
-    
-    # Remove trailing JSON artifacts
-    text = re.sub(r"[\"']\s*\}\s*\]\s*\}\s*$", "", text)
-    text = re.sub(r"[\"']\s*\}\s*\]\s*$", "", text)
-    
-    # Clean up escaped characters
-    text = re.sub(r'\\n', '\n', text)
-    text = re.sub(r'\\t', ' ', text)
-    text = re.sub(r'\\"', '"', text)
-    text = re.sub(r"\\'", "'", text)
-    
-    # Only remove completely empty lines (preserve formatting)
-    lines = [line.rstrip() for line in text.split('\n')]
-    text = '\n'.join(lines)
-    
-    # Remove excessive blank lines (more than 2 in a row)
-    text = re.sub(r'\n{4,}', '\n\n\n', text)
-    
-    text = text.strip()
-    
-    print(f"DEBUG: Cleaned response length: {len(text)}")
-    print(f"DEBUG: Cleaned response preview: {text[:500]}...")
-    return text
+# Agent worker pool settings - agent calls block on Bedrock/tool round-trips,
+# so they run on a bounded thread pool instead of the event loop
+AGENT_MAX_WORKERS = int(os.getenv("AGENT_MAX_WORKERS", "8"))
+AGENT_QUEUE_TIMEOUT_SECONDS = float(os.getenv("AGENT_QUEUE_TIMEOUT_SECONDS", "30"))
+
+# Content types whose agents are built during startup, e.g. "all,books";
+# empty leaves AWS credentials and Bedrock clients to the first request
+AGENT_WARMUP_CONTENT_TYPES = tuple(
+    content_type.strip() for content_type in os.getenv("AGENT_WARMUP", "").split(",") if content_type.strip()
+)
+
+agent_executor = ThreadPoolExecutor(max_workers=AGENT_MAX_WORKERS, thread_name_prefix="agent-worker")
+
+# Limits how many agent calls may be running or waiting on the executor at once.
+# Created lazily so it binds to the running event loop.
+agent_slots: Optional[asyncio.Semaphore] = None
+
+# Per-session locks so turns for the same session run strictly in order
+session_locks: Dict[str, asyncio.Lock] = {}
+# Turns holding or waiting for each session's lock; a lock is only dropped at
+# zero, since a released lock still looks free to a waiter that was just woken
+session_lock_users: Dict[str, int] = {}
+
+# The loop serving requests. Agent threads only add agents, for the session
+# whose lock they hold; removing agents and locks happens on this loop
+# (agent threads go through call_on_loop)
+server_loop: Optional[asyncio.AbstractEventLoop] = None
+
+class AgentPoolBusyError(Exception):
+    """Raised when a call can't start within AGENT_QUEUE_TIMEOUT_SECONDS"""
+
+def get_session_lock(session_id: str) -> asyncio.Lock:
+    """Get or create the lock that serializes agent calls for a session"""
+    lock = session_locks.get(session_id)
+    if lock is None:
+        lock = session_locks[session_id] = asyncio.Lock()
+    return lock
+
+async def run_in_agent_pool(session_id: str, func, *args):
+    """Run a blocking agent call on the worker pool, one call per session at a time.
+
+    Calls for different sessions run in parallel up to AGENT_MAX_WORKERS. A
+    call waits up to AGENT_QUEUE_TIMEOUT_SECONDS in all for the session's
+    previous call to finish and a worker to free up, then raises
+    AgentPoolBusyError.
+    """
+    global agent_slots
+    if agent_slots is None:
+        agent_slots = asyncio.Semaphore(AGENT_MAX_WORKERS)
+
+    started = time.perf_counter()
+    session_lock_users[session_id] = session_lock_users.get(session_id, 0) + 1
+    try:
+        lock = get_session_lock(session_id)
+
+        async def acquire():
+            await lock.acquire()
+            try:
+                await agent_slots.acquire()
+            except BaseException:
+                lock.release()
+                raise
+
+        try:
+            await asyncio.wait_for(acquire(), timeout=AGENT_QUEUE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise AgentPoolBusyError(
+                f"No agent worker free for this session within {AGENT_QUEUE_TIMEOUT_SECONDS}s "
+                f"({AGENT_MAX_WORKERS} workers)"
+            )
+        CHAT_STAGE_SECONDS.observe(time.perf_counter() - started, stage="agent_acquisition")
+        try:
+            loop = asyncio.get_running_loop()
+            # Run in a copy of this request's context so worker logs keep its request ID
+            return await loop.run_in_executor(agent_executor, contextvars.copy_context().run, func, *args)
+        finally:
+            agent_slots.release()
+            lock.release()
+    finally:
+        session_lock_users[session_id] -= 1
+        if not session_lock_users[session_id]:
+            del session_lock_users[session_id]
+
+def call_on_loop(func, *args) -> None:
+    """Run func on server_loop: now if this is the loop's thread, else as soon as the loop gets to it"""
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if server_loop is None or running is server_loop:
+        func(*args)
+    else:
+        server_loop.call_soon_threadsafe(func, *args)
+
+def describe_tool_use(tool_use: dict) -> str:
+    """Turn a tool call into a short progress message for the UI"""
+    tool_input = tool_use.get("input") or {}
+    if tool_use.get("name") == "search_catalog" and isinstance(tool_input, dict):
+        formats = {"book": "books", "video": "courses", "course": "courses", "audiobook": "audiobooks",
+                   "live-training": "live events", "learning-path": "learning paths"}
+        what = formats.get(str(tool_input.get("content_format", "")).lower(), "resources")
+        topic = str(tool_input.get("topic", "")).replace("-", " ").strip()
+        if topic:
+            return f"Searching O'Reilly for {topic} {what}"
+        return f"Searching O'Reilly for {what}"
+    if tool_use.get("name") == "http_request" and isinstance(tool_input, dict):
+        params = parse_qs(urlparse(str(tool_input.get("url", ""))).query)
+        if "live-events" in str(tool_input.get("url", "")) or params.get("content_format") == ["live-training"]:
+            what = "live events"
+        else:
+            formats = {"book": "books", "video": "courses", "course": "courses", "audiobook": "audiobooks"}
+            what = formats.get(params.get("content_format", [""])[0], "resources")
+        topic = params.get("any_topic_slug", [""])[0].replace("-", " ")
+        if topic:
+            return f"Searching O'Reilly for {topic} {what}"
+        return f"Searching O'Reilly for {what}"
+    return f"Running {tool_use.get('name', 'tool')}"
+
+def get_session_agent(session_id: str, content_type: str = None):
+    """Get or create the agent that serves this session and content type"""
+    # Use content_type if provided, otherwise use general agent
+    if content_type and content_type != 'all':
+        # Create a session-specific key including content type
+        session_agent_key = f"{session_id}_{content_type}"
+    else:
+        session_agent_key = session_id
+        content_type = 'all'
+
+    agent = agent_instances.get(session_agent_key)
+    if agent is None:
+        logger.debug("Creating new %s agent instance for session %s", content_type, session_id)
+        agent = agent_instances[session_agent_key] = create_session_agent(content_type)
+        session_agent_keys.setdefault(session_id, {})[session_agent_key] = agent_state_key(content_type)
+    else:
+        logger.debug("Using existing %s agent for session %s", content_type, session_id)
+
+    restore_agent_state(agent, session_id, content_type)
+    return agent
+
+def agent_state_key(content_type: str = None) -> str:
+    """Key the session's agent state is stored under in session_store"""
+    # Interned: it is held once per session in several indexes
+    return sys.intern(content_type) if content_type and content_type != 'all' else 'all'
+
+def restore_agent_state(agent, session_id: str, content_type: str = None) -> None:
+    """Load the session's stored messages into agent unless it already holds the latest.
+
+    The local agent is current unless another worker ran a turn for this
+    session or this process restarted since it was built.
+    """
+    agent_key = agent_state_key(content_type)
+    version = session_store.get_agent_version(session_id, agent_key)
+    if loaded_agent_state.get(agent) == (session_id, agent_key, version):
+        return
+
+    version, state = session_store.load_agent_state(session_id, agent_key)
+    restore_agent(agent, state)
+    loaded_agent_state[agent] = (session_id, agent_key, version)
+    logger.debug("Loaded %d stored messages (v%d) into %s agent for session %s",
+                 len(agent.messages), version, agent_key, session_id)
+
+def persist_agent_state(agent, session_id: str, content_type: str = None) -> None:
+    """Write the agent's messages back to session_store after a successful turn"""
+    agent_key = agent_state_key(content_type)
+    loaded = loaded_agent_state.get(agent)
+    expected_version = loaded[2] if loaded and loaded[:2] == (session_id, agent_key) else None
+    version = session_store.save_agent_state(session_id, agent_key, agent_state(agent),
+                                             expected_version=expected_version)
+    loaded_agent_state[agent] = (session_id, agent_key, version)
+
+def is_first_turn(session_id: str, content_type: str = None) -> bool:
+    """True if the session has no earlier conversation an answer could depend on"""
+    return (session_store.history_length(session_id) == 0
+            and session_store.get_agent_version(session_id, agent_state_key(content_type)) == 0)
+
+def seed_agent_from_cache(session_id: str, content_type: str, message: str, response: str) -> None:
+    """Record a cached answer in the session's agent state so follow-ups have context"""
+    session_store.save_agent_state(session_id, agent_state_key(content_type), {
+        "messages": [
+            {"role": "user", "content": [{"text": message}]},
+            {"role": "assistant", "content": [{"text": response}]},
+        ],
+    })
+    track_session_memory(session_id)
+
+def run_agent_turn(agent, session_id: str, content_type: str, func):
+    """Run func() against agent and persist the result, or roll back on failure"""
+    try:
+        result = func()
+    except BaseException:
+        # Reload the last stored state next turn instead of keeping a half-finished one
+        loaded_agent_state.pop(agent, None)
+        raise
+    persist_agent_state(agent, session_id, content_type)
+    track_session_memory(session_id)
+    return result
+
+def track_session_memory(session_id: str) -> None:
+    """Report the session's footprint to session_memory and evict others if over budget.
+
+    Live agents count at the size of their stored state, which they match
+    right after a turn; tool results and summaries are part of it.
+    """
+    footprint = session_store.memory_footprint(session_id)
+    live_keys = session_agent_keys.get(session_id)
+    if live_keys:
+        sizes = session_store.agent_state_sizes(session_id)
+        footprint["live_agents"] = sum(sizes.get(agent_key, 0) for agent_key in live_keys.values())
+    for evicted in session_memory.update(session_id, footprint):
+        evict_session(evicted)
 
-async def get_chatbot_response(message: str, session_id: str = None, content_type: str = None) -> str:
+def evict_session(session_id: str) -> None:
+    """Free a least-recently-used session's memory; its stored state is kept where possible.
+
+    Usually runs on an agent thread after a turn: the store spill happens
+    here, while dropping the session's agents and lock is left to the loop.
+    """
+    spilled = session_store.spill(session_id)
+    call_on_loop(drop_local_session, session_id)
+    SESSION_EVICTIONS_TOTAL.inc(reason="memory")
+    logger.info("Evicted session %s to stay within the memory budget", session_id,
+                extra={"spilled": spilled})
+
+def record_agent_turn(session_id: str, content_type: Optional[str], turn: AgentTurn) -> None:
+    """Count a finished turn's tokens and log one INFO summary line, plus a sampled dump of the reply"""
+    usage_totals.add(turn)
+    content_type = content_type or "all"
+    AGENT_TURNS_TOTAL.inc(content_type=content_type)
+    CONTEXT_TOKENS_SAVED_TOTAL.inc(turn.context_tokens_saved, content_type=content_type)
+    for kind, value in turn.usage.items():
+        TOKENS_TOTAL.inc(value, content_type=content_type, kind=kind)
+    logger.info("Agent turn finished", extra={
+        "session_id": session_id,
+        "chars": len(turn.text),
+        "tools": turn.tool_names,
+        "tokens": turn.usage.get("totalTokens", 0),
+        "cache_read_tokens": turn.usage.get("cacheReadInputTokens", 0),
+        "cache_write_tokens": turn.usage.get("cacheWriteInputTokens", 0),
+        "context_tokens_saved": turn.context_tokens_saved,
+        "stop_reason": turn.stop_reason,
+    })
+    log_payload(logger, "Agent response", turn.text, session_id=session_id)
+
+def invoke_session_agent(message: str, session_id: str, content_type: str = None) -> AgentTurn:
+    """Run one turn on the session's agent and return its cleaned result.
+
+    Blocks on the Bedrock/tool round-trip, so it must be called through
+    run_in_agent_pool rather than directly from a request handler.
+    """
+    with CHAT_STAGE_SECONDS.time(stage="agent_setup"), \
+            traced("session.lookup", session_id=session_id, content_type=content_type):
+        agent = get_session_agent(session_id, content_type)
+    last_message = agent.messages[-1] if agent.messages else None
+
+    # Call the agent directly to maintain conversation state
+    result = run_agent_turn(agent, session_id, content_type, lambda: agent(message))
+    turn = extract_agent_turn(result, messages_after(agent.messages, last_message))
+    turn.context_tokens_saved = agent.conversation_manager.last_tokens_saved
+    with CHAT_STAGE_SECONDS.time(stage="clean"), traced("response.clean", chars=len(turn.text)):
+        turn.text = clean_and_format_response(turn.text)
+    record_agent_turn(session_id, content_type, turn)
+
+    # Make sure we have valid text
+    if not turn.text:
+        raise Exception("No valid response content found")
+    return turn
+
+def stream_session_agent(message: str, session_id: str, content_type: str, emit) -> AgentTurn:
+    """Run one turn on the session's agent, passing stream events to emit().
+
+    emit() receives ("text", chunk) for model tokens and ("tool", tool_use)
+    once per tool call, just before the tool runs. Returns the turn's tool
+    calls and usage; its text is left empty since the caller assembles it
+    from the chunks. Like invoke_session_agent, this blocks and must go
+    through run_in_agent_pool.
+    """
+    with CHAT_STAGE_SECONDS.time(stage="agent_setup"), \
+            traced("session.lookup", session_id=session_id, content_type=content_type):
+        agent = get_session_agent(session_id, content_type)
+    turn = AgentTurn(text="")
+
+    async def consume():
+        async for event in agent.stream_async(message):
+            if "data" in event:
+                emit("text", event["data"])
+            elif "message" in event:
+                tool_uses = tool_uses_in([event["message"]])
+                if tool_uses:
+                    # Text before a tool call is its own paragraph
+                    emit("text", "\n\n")
+                for tool_use in tool_uses:
+                    emit("tool", tool_use)
+                turn.tool_uses.extend(tool_uses)
+            elif "result" in event:
+                turn.usage = turn_usage(event["result"])
+                turn.stop_reason = event["result"].stop_reason
+
+    # The worker thread has no event loop of its own, so give the stream one
+    run_agent_turn(agent, session_id, content_type, lambda: asyncio.run(consume()))
+    turn.context_tokens_saved = agent.conversation_manager.last_tokens_saved
+    record_agent_turn(session_id, content_type, turn)
+    return turn
+
+def route_message(message: str, session_id: str, content_type: str = None) -> Tuple[Route, Optional[str]]:
+    """Classify a message with intent_router: its route and the content type to run the turn with.
+
+    A default-profile message that asks for one content type goes to that
+    type's agent. Messages that name none (or several) go wherever the
+    session was last routed, since that agent holds the conversation.
+    """
+    if not INTENT_ROUTER_ENABLED:
+        return Route("agent"), content_type
+    route = intent_router.classify(message)
+    if route.reply is not None:
+        intent_router.record(route.name)
+        return route, content_type
+    if session_id and agent_state_key(content_type) == 'all':
+        _, stored = session_store.load_agent_state(session_id, ROUTE_STATE_KEY)
+        routed = stored["content_type"] if stored else None
+        if route.content_type is not None and route.content_type != routed:
+            routed = route.content_type
+            session_store.save_agent_state(session_id, ROUTE_STATE_KEY, {"content_type": routed})
+            logger.debug("Routing session %s to the %s agent", session_id, routed)
+        if routed is not None:
+            intent_router.record(routed)
+            return route, routed
+    intent_router.record("agent")
+    return route, content_type
+
+async def get_chatbot_response(message: str, session_id: str = None, content_type: str = None) -> AgentTurn:
     """Send a message to the chatbot and get the response, maintaining conversation context"""
     try:
-        print(f"DEBUG: Running chatbot with message: '{message}' for session: {session_id}, content_type: {content_type}")
-        print(f"DEBUG: Chatbot path: {chatbot_path}")
+        logger.debug("Running chatbot for session %s, content_type: %s", session_id, content_type)
+        log_payload(logger, "Chat message", message, session_id=session_id)
         
-        # Initialize a new session if not exists
-        if session_id and session_id not in conversation_history:
-            conversation_history[session_id] = []
-            
+        # session_store calls may wait on SQLite locks or disk (spilled and
+        # snapshotted sessions), so they run off the event loop throughout
+        # Greetings, thanks and the like get a canned reply without an agent turn
+        route, content_type = await asyncio.to_thread(route_message, message, session_id, content_type)
+        if route.reply is not None:
+            logger.debug("Answered %s message for session %s without the agent", route.name, session_id)
+            if session_id and route.name == "reset":
+                await reset_session(session_id)
+            elif session_id:
+                await asyncio.to_thread(session_store.append_history, session_id, "user", message)
+            return AgentTurn(text=route.reply)
+
+        # First-turn queries can be answered from the response cache; follow-ups
+        # depend on the conversation so they always go to the agent
+        cacheable = (bool(session_id) and response_cache.enabled
+                     and await asyncio.to_thread(is_first_turn, session_id, content_type))
+        if cacheable:
+            cached = response_cache.get(message, content_type)
+            if cached is not None:
+                logger.debug("Response cache hit for session %s", session_id)
+                await asyncio.to_thread(session_store.append_history, session_id, "user", message)
+                await asyncio.to_thread(seed_agent_from_cache, session_id, content_type, message, cached)
+                return AgentTurn(text=cached)
+
         # Add current message to conversation history
         if session_id:
-            conversation_history[session_id].append({"role": "user", "content": message})
-            print(f"DEBUG: Added message to history. Session now has {len(conversation_history[session_id])} messages")
+            history_length = await asyncio.to_thread(session_store.append_history, session_id, "user", message)
+            logger.debug("Added message to history. Session %s now has %d messages", session_id, history_length)
         
         # Use persistent agent instance for this session
         if session_id:
             try:
-                # Import required modules from ain.py
-                import sys
-                import os
-                
-                # Ensure ain.py directory is in the path
-                ain_dir = os.path.dirname(chatbot_path)
-                if ain_dir not in sys.path:
-                    sys.path.append(ain_dir)
-                
-                # Import modules for creating agent if needed
-                from main import (
-                    bedrock_model, http_request, 
-                    general_summary, agent_prompt,
-                    get_agent_for_content_type
+                started = time.monotonic()
+                turn = await run_in_agent_pool(
+                    session_id, invoke_session_agent, message, session_id, content_type
                 )
-                from strands import Agent
-                
-                # Determine which agent to use based on content_type
-                # Use content_type if provided, otherwise use general agent
-                if content_type and content_type != 'all':
-                    # Create a session-specific key including content type
-                    session_agent_key = f"{session_id}_{content_type}"
-                    
-                    if session_agent_key not in agent_instances:
-                        print(f"DEBUG: Creating new {content_type} agent instance for session {session_id}")
-                        # Get the specialized agent for this content type
-                        base_agent = get_agent_for_content_type(content_type)
-                        # Note: We're using the pre-configured agents from ain.py
-                        agent_instances[session_agent_key] = base_agent
-                    
-                    agent = agent_instances[session_agent_key]
-                    print(f"DEBUG: Using specialized {content_type} agent for session {session_id}")
-                else:
-                    # Get existing agent or create a new one for this session
-                    if session_id not in agent_instances:
-                        print(f"DEBUG: Creating new general agent instance for session {session_id}")
-                        # Create a new agent instance with the same configuration
-                        agent_instances[session_id] = Agent(
-                            model=bedrock_model,
-                            conversation_manager=general_summary,
-                            system_prompt=agent_prompt,
-                            tools=[http_request],
-                        )
-                    
-                    # Use the session-specific agent instance
-                    agent = agent_instances[session_id]
-                    print(f"DEBUG: Using existing general agent for session {session_id}")
-                
-                # Call the agent directly to maintain conversation state
-                response = agent(message)
-                print(f"DEBUG: Raw agent response: {response}")
-                print(f"DEBUG: Agent response type: {type(response)}")
-                
-                # Extract the actual content from the AgentResult
-                response_text = None
-                
-                print(f"DEBUG: Response type: {type(response)}")
-                print(f"DEBUG: Response dir: {[attr for attr in dir(response) if not attr.startswith('_')]}")
-                
-                # Handle AgentResult object specifically
-                if hasattr(response, 'message'):
-                    message = response.message
-                    print(f"DEBUG: Found message attribute: {type(message)}")
-                    
-                    # If message is a dict with the problematic structure
-                    if isinstance(message, dict) and 'content' in message:
-                        content = message['content']
-                        print(f"DEBUG: Message content type: {type(content)}")
-                        
-                        if isinstance(content, list) and len(content) > 0:
-                            # Extract text from content blocks
-                            text_parts = []
-                            for i, item in enumerate(content):
-                                print(f"DEBUG: Content item {i}: {type(item)}")
-                                if isinstance(item, dict) and 'text' in item:
-                                    text_parts.append(item['text'])
-                                    print(f"DEBUG: Extracted text from item {i}: {len(item['text'])} chars")
-                                else:
-                                    text_parts.append(str(item))
-                            response_text = '\n'.join(text_parts)
-                            print(f"DEBUG: Extracted from message.content: {len(response_text)} chars")
-                        else:
-                            response_text = str(content)
-                    
-                    # If message is a string, use it directly
-                    elif isinstance(message, str):
-                        response_text = message
-                        print(f"DEBUG: Message is string: {len(response_text)} chars")
-                    
-                    # If message is something else, convert to string
-                    else:
-                        response_text = str(message)
-                        print(f"DEBUG: Message converted to string: {len(response_text)} chars")
-                
-                # If no message attribute, try other common attributes
-                elif hasattr(response, 'content'):
-                    content = response.content
-                    print(f"DEBUG: Found content attribute: {type(content)}")
-                    
-                    # Handle list of content blocks
-                    if isinstance(content, list) and len(content) > 0:
-                        text_parts = []
-                        for item in content:
-                            if isinstance(item, dict) and 'text' in item:
-                                text_parts.append(item['text'])
-                            else:
-                                text_parts.append(str(item))
-                        response_text = '\n'.join(text_parts)
-                    else:
-                        response_text = str(content)
-                
-                # Try other common attributes
-                elif hasattr(response, 'text'):
-                    response_text = response.text
-                elif hasattr(response, 'output'):
-                    response_text = response.output
-                elif hasattr(response, 'data'):
-                    response_text = response.data
-                
-                # If still no text, convert the whole response to string
-                if not response_text:
-                    response_str = str(response)
-                    print(f"DEBUG: Converting whole response to string: {len(response_str)} chars")
-                    response_text = response_str
-                
-                print(f"DEBUG: Final extracted response text (first 200 chars): {str(response_text)[:200]}...")
-                
-                # Make sure we have valid text
-                if response_text and len(str(response_text).strip()) > 0:
-                    return clean_and_format_response(str(response_text))
-                else:
-                    print("DEBUG: No valid response text found, falling back to subprocess")
-                    raise Exception("No valid response content found")
+                if cacheable:
+                    response_cache.put(message, content_type, turn.text, time.monotonic() - started)
+                return turn
+            except AgentPoolBusyError:
+                # The turn never ran, so don't keep it in the history
+                await asyncio.to_thread(session_store.pop_history, session_id)
+                raise
             except Exception as e:
-                print(f"ERROR using direct agent: {e}")
-                print("Falling back to subprocess method")
+                logger.warning("Direct agent failed, falling back to agent worker pool: %s", e, exc_info=True)
                 
-        # Start a new Python process to run the chatbot script in API mode
-        process = await asyncio.create_subprocess_exec(
-            sys.executable,
-            chatbot_path,
-            "--cli",  # Use CLI mode for direct interaction
-            stdin=asyncio.subprocess.PIPE,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        
-        # Send the message to the chatbot with explicit exit command
-        stdin_data = f"{message}\nexit\n".encode()
-        print(f"DEBUG: Sending data to stdin: {stdin_data}")
-        
-        stdout, stderr = await process.communicate(stdin_data)
-        
-        # Check for errors
-        if process.returncode != 0:
-            error_msg = stderr.decode()
-            print(f"ERROR: Process returned non-zero code {process.returncode}")
-            print(f"ERROR: {error_msg}")
-            return f"Sorry, there was an error processing your request. Error: {error_msg}"
-        
-        # Print full output for debugging
-        output = stdout.decode()
-        print(f"DEBUG: Raw output from chatbot:\n{output}")
-        
-        # Parse the output to extract just the assistant's response
+        # Fall back to a warm worker process, which continues the session's
+        # stored conversation and hands back the agent state to save
+        agent_key = agent_state_key(content_type)
+        version, state = 0, None
         try:
-            print(f"DEBUG: Parsing output of length: {len(output)}")
-            print(f"DEBUG: Raw agent response: {output}")
-            
-            # The agent response should be most of the content after system setup
-            # Look for the actual substantive response
-            lines = output.split('\n')
-            
-            # Find where the actual response starts - after the user message
-            response_started = False
-            response_lines = []
-            
-            for i, line in enumerate(lines):
-                stripped = line.strip()
-                
-                # Skip empty lines
-                if not stripped:
-                    continue
-                
-                # Skip system messages
-                system_indicators = [
-                    "Starting O'Reilly Learning Assistant API",
-                    "Type 'exit' to quit", 
-                    "Welcome to O'Reilly Learning Assistant!",
-                    "How can I help you find resources today?",
-                    "DEBUG:",
-                    "📚 You:",
-                    "🔍 Assistant:"
-                ]
-                
-                if any(indicator in stripped for indicator in system_indicators):
-                    continue
-                
-                # If we see the user's message, the response should come after
-                if message.strip().lower() in stripped.lower():
-                    response_started = True
-                    continue
-                
-                # Collect substantial content lines
-                if len(stripped) > 20:  # Only collect substantial lines
-                    response_lines.append(line)
-            
-            # If we found substantial content, use it
-            if response_lines:
-                response_text = '\n'.join(response_lines).strip()
-                print(f"DEBUG: Extracted response: {response_text[:200]}...")
-                return clean_and_format_response(response_text)
-            
-            # Fallback: Look for the pattern where the agent provides a complete response
-            # Sometimes the agent output contains the full response without clear markers
-            content_blocks = []
-            current_block = []
-            
-            for line in lines:
-                stripped = line.strip()
-                if not stripped:
-                    if current_block:
-                        content_blocks.append('\n'.join(current_block))
-                        current_block = []
-                    continue
-                
-                # Skip obvious system lines
-                if any(skip in stripped for skip in [
-                    "Starting O'Reilly", "Type 'exit'", "DEBUG:", "📚", "🔍", "Welcome!", 
-                    "How can I help", "Assistant API", "Learning Assistant"
-                ]):
-                    continue
-                    
-                current_block.append(line)
-            
-            # Add the last block if it exists
-            if current_block:
-                content_blocks.append('\n'.join(current_block))
-            
-            # Find the largest content block (likely the response)
-            if content_blocks:
-                largest_block = max(content_blocks, key=len)
-                if len(largest_block.strip()) > 50:  # Only if it's substantial
-                    print(f"DEBUG: Using largest content block: {largest_block[:200]}...")
-                    return clean_and_format_response(largest_block.strip())
-            
-            # Final fallback - clean up the entire output
-            filtered_output = output
-            system_messages = [
-                "Starting O'Reilly Learning Assistant API",
-                "Type 'exit' to quit", 
-                "O'Reilly Learning Assistant",
-                "Welcome to O'Reilly Learning Assistant!",
-                "How can I help you find resources today?"
-            ]
-            
-            for system_msg in system_messages:
-                filtered_output = filtered_output.replace(system_msg, "")
-                
-            return clean_and_format_response(filtered_output.strip())
+            if session_id:
+                version, state = await asyncio.to_thread(session_store.load_agent_state, session_id, agent_key)
+            with traced("agent_worker.fallback", session_id=session_id, content_type=content_type):
+                turn, state = await agent_worker_pool.call(message, session_id, content_type, state)
         except Exception as e:
-            print(f"ERROR parsing response: {e}")
-            return f"Error parsing the chatbot response. Raw output: {output[:200]}..."
+            WORKER_FALLBACKS_TOTAL.inc(status="error")
+            logger.error("Agent worker fallback failed: %s", e)
+            return AgentTurn(text=f"Sorry, there was an error processing your request. Error: {str(e)}")
+        WORKER_FALLBACKS_TOTAL.inc(status="success")
+        if session_id:
+            await asyncio.to_thread(session_store.save_agent_state, session_id, agent_key, state,
+                                    expected_version=version)
+            await asyncio.to_thread(track_session_memory, session_id)
+
+        with CHAT_STAGE_SECONDS.time(stage="clean"), traced("response.clean", chars=len(turn.text)):
+            turn.text = clean_and_format_response(turn.text)
+        record_agent_turn(session_id, content_type, turn)
+        return turn
+    except AgentPoolBusyError:
+        raise
     except Exception as e:
-        print(f"CRITICAL ERROR running chatbot: {e}")
-        return f"Critical error running the chatbot: {str(e)}"
+        logger.critical("Error running chatbot: %s", e, exc_info=True)
+        return AgentTurn(text=f"Critical error running the chatbot: {str(e)}")
+
+def drop_local_session(session_id: str) -> bool:
+    """Forget this process's agents and lock for a session; True if it had agents.
+
+    Call on server_loop only (see call_on_loop).
+    """
+    keys = session_agent_keys.pop(session_id, ())
+    for key in keys:
+        agent_instances.pop(key, None)
+    session_memory.forget(session_id)
+    if session_id not in session_lock_users:
+        session_locks.pop(session_id, None)
+    return bool(keys)
+
+async def reset_session(session_id: str) -> bool:
+    """Clear a session's history, agent state and local agents; True if there was anything to clear"""
+    reset_performed = await asyncio.to_thread(session_store.delete_session, session_id)
+    if drop_local_session(session_id):
+        reset_performed = True
+        logger.debug("Removed agent instance for session %s", session_id)
+    return reset_performed
 
 async def cleanup_old_sessions():
     """Clean up inactive sessions to prevent memory bloat"""
-    now = datetime.now()
-    activity_threshold = timedelta(hours=SESSION_TIMEOUT_HOURS)
-    heartbeat_threshold = timedelta(minutes=HEARTBEAT_TIMEOUT_MINUTES)
-    
-    sessions_to_remove = []
-    
-    # Check both activity and heartbeat timeouts
-    for session_id in list(agent_instances.keys()):
-        should_remove = False
-        reason = ""
-        
-        # Check activity timeout
-        if session_id in last_activity:
-            if now - last_activity[session_id] > activity_threshold:
-                should_remove = True
-                reason = f"inactive for {activity_threshold}"
-        
-        # Check heartbeat timeout (more aggressive)
-        if session_id in session_heartbeats:
-            if now - session_heartbeats[session_id] > heartbeat_threshold:
-                should_remove = True
-                reason = f"no heartbeat for {heartbeat_threshold}"
-        elif session_id in last_activity:
-            # No heartbeat recorded but has activity - give it a grace period
-            if now - last_activity[session_id] > heartbeat_threshold:
-                should_remove = True
-                reason = f"no heartbeat recorded and inactive for {heartbeat_threshold}"
-        
-        if should_remove:
-            sessions_to_remove.append((session_id, reason))
+    sessions_to_remove = await asyncio.to_thread(
+        session_store.expired_sessions,
+        activity_timeout=SESSION_TIMEOUT_HOURS * 3600,
+        heartbeat_timeout=HEARTBEAT_TIMEOUT_MINUTES * 60,
+    )
     
     # Clean up identified sessions
     for session_id, reason in sessions_to_remove:
-        if session_id in conversation_history:
-            del conversation_history[session_id]
-        if session_id in agent_instances:
-            del agent_instances[session_id]
-        if session_id in last_activity:
-            del last_activity[session_id]
-        if session_id in session_heartbeats:
-            del session_heartbeats[session_id]
-        print(f"Cleaned up session {session_id}: {reason}")
+        await asyncio.to_thread(session_store.delete_session, session_id)
+        drop_local_session(session_id)
+        SESSION_EVICTIONS_TOTAL.inc(reason="heartbeat" if "heartbeat" in reason else "inactive")
+        logger.info("Cleaned up session %s: %s", session_id, reason)
+
+    # With a shared store, other workers reap and reset sessions too; drop
+    # this worker's agents for any that are gone, unless a turn is running
+    local_sessions = list(session_agent_keys)
+    if local_sessions:
+        existing = await asyncio.to_thread(session_store.existing_sessions, local_sessions)
+        for session_id in local_sessions:
+            if session_id not in existing and session_id not in session_lock_users:
+                drop_local_session(session_id)
+                logger.info("Dropped local agents of session %s, removed by another worker", session_id)
     
     return len(sessions_to_remove)
 
+async def reap_sessions_periodically():
+    """Remove expired sessions every SESSION_REAP_INTERVAL_SECONDS (started from lifespan)"""
+    while True:
+        await asyncio.sleep(SESSION_REAP_INTERVAL_SECONDS)
+        try:
+            await cleanup_old_sessions()
+        except Exception as e:
+            logger.error("Session cleanup failed: %s", e, exc_info=True)
+
 # Add explicit OPTIONS handlers for CORS preflight requests
 @app.options("/chat")
 async def chat_options():
@@ -484,6 +643,18 @@ async def chat_options():
         }
     )
 
+@app.options("/chat/stream")
+async def chat_stream_options():
+    """Handle CORS preflight requests for streaming chat endpoint"""
+    return JSONResponse(
+        status_code=200,
+        headers={
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": "POST, OPTIONS",
+            "Access-Control-Allow-Headers": "*",
+        }
+    )
+
 @app.options("/test-post")
 async def test_post_options():
     """Handle CORS preflight requests for test-post endpoint"""
@@ -496,78 +667,50 @@ async def test_post_options():
         }
     )
 
-def analyze_message_for_search_intent(message: str) -> bool:
-    """Analyze if the message is likely to trigger an O'Reilly API search"""
-    search_indicators = [
-        # Direct learning requests
-        "find", "search", "looking for", "need", "want to learn", "show me", "recommend",
-        # Content types
-        "book", "course", "tutorial", "video", "learning path", "training",
-        # Technologies and topics (common O'Reilly content)
-        "python", "javascript", "java", "react", "node", "docker", "kubernetes", "aws", "azure",
-        "machine learning", "ai", "data science", "web development", "programming", "coding",
-        "cybersecurity", "cloud", "devops", "database", "sql", "mongodb", "api", "rest",
-        # Learning-related verbs
-        "learn", "study", "understand", "master", "practice", "guide", "introduction",
-        # Question patterns that typically need resources
-        "how to", "what is", "explain", "teach me", "help me with"
-    ]
-    
-    message_lower = message.lower()
-    
-    # Check for search indicators
-    has_search_intent = any(indicator in message_lower for indicator in search_indicators)
-    
-    # Additional patterns
-    is_question = message.strip().endswith('?')
-    is_learning_request = any(word in message_lower for word in ["learn", "tutorial", "course", "book"])
-    
-    return has_search_intent or (is_question and is_learning_request)
+def agent_pool_busy_response(session_id: str) -> JSONResponse:
+    """503 response returned when the agent worker pool stays saturated"""
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": str(int(AGENT_QUEUE_TIMEOUT_SECONDS))},
+        content={
+            "message": "The assistant is busy right now. Please try again in a moment.",
+            "status": "error",
+            "sessionId": session_id,
+            "error_type": "AgentPoolBusyError"
+        }
+    )
 
 @app.post("/chat")
 async def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks):
     """Chat API endpoint that forwards messages to the O'Reilly Learning Assistant"""
     try:
-        # More detailed debugging of incoming request
-        print(f"DEBUG: Received chat request: message={repr(request.message)}, sessionId={repr(request.sessionId)}")
-        print(f"DEBUG: Request model validation passed with type: {type(request)}")
-        
         # Create a session ID if none is provided
         session_id = request.sessionId if request.sessionId else "default"
-        
-        print(f"DEBUG: Using session_id: {session_id}")
-        
-        # Analyze if this message is likely to trigger API search
-        will_search_api = analyze_message_for_search_intent(request.message)
-        print(f"DEBUG: Message analysis - will likely search API: {will_search_api}")
+        logger.debug("Received chat request for session %s, contentType: %s", session_id, request.contentType)
+        log_payload(logger, "Chat request", request.message, session_id=session_id)
         
         # Update last activity time and heartbeat
-        now = datetime.now()
-        last_activity[session_id] = now
-        session_heartbeats[session_id] = now
+        await asyncio.to_thread(session_store.touch, session_id)
         
         # Get response using conversation history
-        print(f"DEBUG: Calling get_chatbot_response with message: {repr(request.message)}, contentType: {repr(request.contentType)}")
-        response = await get_chatbot_response(request.message, session_id, request.contentType)
+        try:
+            turn = await get_chatbot_response(request.message, session_id, request.contentType)
+        except AgentPoolBusyError as e:
+            logger.warning("%s - rejecting request for session %s", e, session_id)
+            return agent_pool_busy_response(session_id)
+        response = turn.text
         
         # Store assistant's response in conversation history
-        if session_id in conversation_history:
-            conversation_history[session_id].append({"role": "assistant", "content": response})
-        
-        # Run cleanup in the background more frequently
-        if len(agent_instances) > 0 and len(agent_instances) % 5 == 0:  # Every 5th request
-            background_tasks.add_task(cleanup_old_sessions)
+        await asyncio.to_thread(session_store.append_history, session_id, "assistant", response)
         
         return {
             "message": response, 
             "status": "success", 
             "sessionId": session_id,
-            "searchedApi": will_search_api  # Add this flag to indicate if we searched the API
+            "searchedApi": turn.searched_api  # Whether the agent actually called the catalog search
         }
     except Exception as e:
-        print(f"ERROR in chat_endpoint: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in chat_endpoint: %s", e)
         
         # Create a more detailed error response
         error_response = {
@@ -583,19 +726,168 @@ async def chat_endpoint(request: ChatRequest, background_tasks: BackgroundTasks)
             content=error_response
         )
 
+def sse_event(event: str, data: dict) -> str:
+    """Format a single server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, background_tasks: BackgroundTasks):
+    """Streaming variant of /chat that sends tokens and tool progress as server-sent events
+
+    Events:
+        start: the turn was accepted
+        tool:  a tool call is about to run, with a human-readable progress message
+        token: a chunk of cleaned response text, in order
+        done:  the full cleaned response, same shape as the /chat body
+        error: the turn failed; no done event follows
+    """
+    session_id = request.sessionId if request.sessionId else "default"
+    logger.debug("Received streaming chat request for session %s, contentType: %s", session_id, request.contentType)
+    log_payload(logger, "Chat request", request.message, session_id=session_id)
+
+    # Update last activity time and heartbeat
+    await asyncio.to_thread(session_store.touch, session_id)
+
+    route, content_type = await asyncio.to_thread(route_message, request.message, session_id, request.contentType)
+    cacheable = (route.reply is None and response_cache.enabled
+                 and await asyncio.to_thread(is_first_turn, session_id, content_type))
+    cached = response_cache.get(request.message, content_type) if cacheable else None
+    await asyncio.to_thread(session_store.append_history, session_id, "user", request.message)
+
+    async def event_stream():
+        yield sse_event("start", {"sessionId": session_id})
+
+        if route.reply is not None:
+            logger.debug("Answered %s message for session %s without the agent", route.name, session_id)
+            if route.name == "reset":
+                await reset_session(session_id)
+            else:
+                await asyncio.to_thread(session_store.append_history, session_id, "assistant", route.reply)
+            yield sse_event("token", {"text": route.reply})
+            yield sse_event("done", {
+                "message": route.reply,
+                "status": "success",
+                "sessionId": session_id,
+                "searchedApi": False
+            })
+            return
+
+        if cached is not None:
+            logger.debug("Response cache hit for session %s", session_id)
+            await asyncio.to_thread(seed_agent_from_cache, session_id, content_type, request.message, cached)
+            await asyncio.to_thread(session_store.append_history, session_id, "assistant", cached)
+            yield sse_event("token", {"text": cached})
+            yield sse_event("done", {
+                "message": cached,
+                "status": "success",
+                "sessionId": session_id,
+                "searchedApi": False
+            })
+            return
+
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        cleaner = StreamingResponseCleaner()
+        started = time.monotonic()
+        clean_seconds = 0.0
+
+        def emit(kind, payload):
+            # Called from the agent worker thread
+            loop.call_soon_threadsafe(events.put_nowait, (kind, payload))
+
+        turn = asyncio.create_task(run_in_agent_pool(
+            session_id, stream_session_agent, request.message, session_id, content_type, emit
+        ))
+        # Worker events are queued before the task completes, so this sentinel always comes last
+        turn.add_done_callback(lambda _: events.put_nowait(None))
+
+        while True:
+            item = await events.get()
+            if item is None:
+                break
+            kind, payload = item
+            if kind == "text":
+                clean_started = time.perf_counter()
+                chunk = cleaner.feed(payload)
+                clean_seconds += time.perf_counter() - clean_started
+                if chunk:
+                    yield sse_event("token", {"text": chunk})
+            elif kind == "tool":
+                yield sse_event("tool", {"name": payload.get("name"), "message": describe_tool_use(payload)})
+
+        try:
+            agent_turn = turn.result()
+        except Exception as e:
+            if isinstance(e, AgentPoolBusyError):
+                logger.warning("%s - rejecting request for session %s", e, session_id)
+            else:
+                logger.error("Error in chat_stream_endpoint: %s", e, exc_info=e)
+            # The turn produced no answer, so don't keep the question either
+            await asyncio.to_thread(session_store.pop_history, session_id)
+            if isinstance(e, AgentPoolBusyError):
+                message = "The assistant is busy right now. Please try again in a moment."
+            else:
+                message = f"Server error: {str(e)}"
+            yield sse_event("error", {
+                "message": message,
+                "status": "error",
+                "sessionId": session_id,
+                "error_type": type(e).__name__
+            })
+            return
+
+        clean_started = time.perf_counter()
+        tail = cleaner.finish()
+        clean_seconds += time.perf_counter() - clean_started
+        CHAT_STAGE_SECONDS.observe(clean_seconds, stage="clean")
+        # Cleaning is spread over every chunk, so it goes on the request span rather than its own
+        trace.get_current_span().set_attribute("clean_seconds", clean_seconds)
+        if tail:
+            yield sse_event("token", {"text": tail})
+
+        response = cleaner.text
+        await asyncio.to_thread(session_store.append_history, session_id, "assistant", response)
+        if cacheable:
+            response_cache.put(request.message, content_type, response, time.monotonic() - started)
+
+        yield sse_event("done", {
+            "message": response,
+            "status": "success",
+            "sessionId": session_id,
+            "searchedApi": agent_turn.searched_api
+        })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background_tasks
+    )
+
 @app.get("/")
 async def root():
     """Root endpoint that returns a welcome message"""
     return {"message": "Welcome to O'Reilly Learning Assistant API"}
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus scrape endpoint: request/stage latency histograms and counters"""
+    return Response(content=metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint for monitoring"""
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "active_sessions": len(agent_instances),
-        "cors_enabled": True
+        "active_sessions": (await asyncio.to_thread(session_store.stats))["sessions"],
+        "cors_enabled": True,
+        "session_store": session_store.backend,
+        "live_events": live_events_store.stats(),
+        "agent_workers": agent_worker_pool.stats(),
+        "response_cache": response_cache.stats(),
+        "intent_routes": intent_router.stats(),
+        "token_usage": usage_totals.stats()
     }
     
 @app.post("/test-post")
@@ -603,10 +895,10 @@ async def test_post(request: Request):
     """Simple test endpoint to validate basic POST functionality"""
     try:
         data = await request.json()
-        print(f"DEBUG: Received test data: {data}")
+        log_payload(logger, "Received test data", data)
         return {"received": data, "status": "success"}
     except Exception as e:
-        print(f"ERROR in test endpoint: {e}")
+        logger.error("Error in test endpoint: %s", e)
         return {"error": str(e), "status": "error"}
     
 @app.post("/chat-raw")
@@ -615,7 +907,7 @@ async def chat_raw_endpoint(request: Request, background_tasks: BackgroundTasks)
     try:
         # Parse the raw JSON
         data = await request.json()
-        print(f"DEBUG: Received raw data: {data}")
+        log_payload(logger, "Received raw data", data)
         
         # Extract message and sessionId
         message = data.get('message', '')
@@ -625,30 +917,27 @@ async def chat_raw_endpoint(request: Request, background_tasks: BackgroundTasks)
             return {"message": "No message provided", "status": "error"}
         
         # Update last activity time and heartbeat
-        now = datetime.now()
-        last_activity[session_id] = now
-        session_heartbeats[session_id] = now
-        
-        # Analyze if this message is likely to trigger API search
-        will_search_api = analyze_message_for_search_intent(message)
+        await asyncio.to_thread(session_store.touch, session_id)
         
         # Get response using conversation history
-        response = await get_chatbot_response(message, session_id)
+        try:
+            turn = await get_chatbot_response(message, session_id)
+        except AgentPoolBusyError as e:
+            logger.warning("%s - rejecting request for session %s", e, session_id)
+            return agent_pool_busy_response(session_id)
+        response = turn.text
         
         # Store assistant's response in conversation history
-        if session_id in conversation_history:
-            conversation_history[session_id].append({"role": "assistant", "content": response})
+        await asyncio.to_thread(session_store.append_history, session_id, "assistant", response)
         
         return {
             "message": response, 
             "status": "success", 
             "sessionId": session_id,
-            "searchedApi": will_search_api
+            "searchedApi": turn.searched_api
         }
     except Exception as e:
-        print(f"ERROR in chat_raw_endpoint: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in chat_raw_endpoint: %s", e)
         return {"message": f"Server error: {str(e)}", "status": "error"}
 
 @app.post("/reset")
@@ -657,20 +946,7 @@ async def reset_chat(request: Request):
     data = await request.json()
     session_id = data.get("sessionId", "default")
     
-    reset_performed = False
-    
-    # Clear conversation history if exists
-    if session_id in conversation_history:
-        conversation_history.pop(session_id)
-        reset_performed = True
-    
-    # Remove agent instance if exists
-    if session_id in agent_instances:
-        agent_instances.pop(session_id)
-        reset_performed = True
-        print(f"DEBUG: Removed agent instance for session {session_id}")
-    
-    if reset_performed:
+    if await reset_session(session_id):
         return {"message": "Conversation and memory cleared", "status": "success"}
     return {"message": "No conversation found with this session ID", "status": "error"}
 
@@ -681,18 +957,17 @@ async def heartbeat(request: Request):
         data = await request.json()
         session_id = data.get("sessionId", "default")
         
-        now = datetime.now()
-        session_heartbeats[session_id] = now
-        last_activity[session_id] = now
+        now = await asyncio.to_thread(session_store.touch, session_id)
+        history_length = await asyncio.to_thread(session_store.history_length, session_id)
         
         # Return session info
         return {
             "status": "success",
             "sessionId": session_id,
             "serverTime": now.isoformat(),
-            "hasAgent": session_id in agent_instances,
-            "hasHistory": session_id in conversation_history,
-            "historyLength": len(conversation_history.get(session_id, []))
+            "hasAgent": session_id in session_agent_keys,
+            "hasHistory": history_length > 0,
+            "historyLength": history_length
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -701,24 +976,24 @@ async def heartbeat(request: Request):
 async def session_status(session_id: str = "default"):
     """Get detailed status of a specific session"""
     now = datetime.now()
+    history_length = await asyncio.to_thread(session_store.history_length, session_id)
+    last_act, last_hb = await asyncio.to_thread(session_store.get_activity, session_id)
     
     status = {
         "sessionId": session_id,
-        "exists": session_id in agent_instances,
-        "hasHistory": session_id in conversation_history,
-        "historyLength": len(conversation_history.get(session_id, [])),
+        "exists": session_id in session_agent_keys,
+        "hasHistory": history_length > 0,
+        "historyLength": history_length,
         "lastActivity": None,
         "lastHeartbeat": None,
         "isActive": False
     }
     
-    if session_id in last_activity:
-        last_act = last_activity[session_id]
+    if last_act is not None:
         status["lastActivity"] = last_act.isoformat()
         status["minutesSinceActivity"] = (now - last_act).total_seconds() / 60
     
-    if session_id in session_heartbeats:
-        last_hb = session_heartbeats[session_id]
+    if last_hb is not None:
         status["lastHeartbeat"] = last_hb.isoformat()
         status["minutesSinceHeartbeat"] = (now - last_hb).total_seconds() / 60
         
@@ -735,12 +1010,17 @@ async def memory_status(session_id: str = None):
         # Run cleanup and return overall statistics
         cleaned_count = await cleanup_old_sessions()
         
+        store_stats = await asyncio.to_thread(session_store.stats)
+        session_ids = await asyncio.to_thread(session_store.session_ids)
+        
         return {
-            "total_sessions": len(conversation_history),
+            "total_sessions": store_stats["sessions"],
             "active_agents": len(agent_instances),
-            "active_heartbeats": len(session_heartbeats),
-            "session_ids": list(agent_instances.keys()),
+            "active_heartbeats": store_stats["heartbeats"],
+            "session_ids": session_ids,
             "cleaned_sessions": cleaned_count,
+            "session_store": store_stats,
+            "memory": session_memory.stats(),
             "timeout_settings": {
                 "session_timeout_hours": SESSION_TIMEOUT_HOURS,
                 "heartbeat_timeout_minutes": HEARTBEAT_TIMEOUT_MINUTES
@@ -748,209 +1028,104 @@ async def memory_status(session_id: str = None):
         }
     
     # Return info about specific session
+    history_length = await asyncio.to_thread(session_store.history_length, session_id)
+    has_heartbeat = await asyncio.to_thread(session_store.has_heartbeat, session_id)
     return {
-        "has_history": session_id in conversation_history,
-        "history_length": len(conversation_history.get(session_id, [])),
-        "has_agent": session_id in agent_instances,
-        "has_heartbeat": session_id in session_heartbeats,
+        "has_history": history_length > 0,
+        "history_length": history_length,
+        "has_agent": session_id in session_agent_keys,
+        "has_heartbeat": has_heartbeat,
+        "memory_bytes": session_memory.footprint(session_id),
     }
 
 @app.get("/live-events")
-async def get_live_events(page: int = 1, page_size: int = 20, search: str = ""):
-    """Fetch all live events from O'Reilly API with pagination and search"""
+async def get_live_events(
+    page: int = 1,
+    page_size: int = LIVE_EVENTS_DEFAULT_PAGE_SIZE,
+    search: str = "",
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    start_after: Optional[str] = None,
+    start_before: Optional[str] = None,
+    duration: Optional[str] = None,
+    min_sessions: Optional[int] = None,
+    max_sessions: Optional[int] = None,
+):
+    """Serve upcoming live events from the in-memory index
+
+    Supports search, filtering by start date range, duration bucket
+    (short/medium/long) and session count, sorting, and either page numbers
+    or the opaque next_cursor/prev_cursor values from a previous response.
+    """
+    # Validate the query up front so bad input is a 400, not an empty result
+    page_size = max(1, min(page_size, LIVE_EVENTS_MAX_PAGE_SIZE))
+    search = search.strip()
+    sort = sort or ("relevance" if search else "start")
+    if sort not in SORT_ORDERS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort '{sort}'. Use one of: {', '.join(sorted(SORT_ORDERS))}")
+    if duration and duration not in DURATION_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Unknown duration '{duration}'. Use one of: {', '.join(DURATION_BUCKETS)}")
+
+    parsed_dates = {}
+    for name, value in (("start_after", start_after), ("start_before", start_before)):
+        parsed = parse_datetime(value) if value else None
+        if value and parsed is None:
+            raise HTTPException(status_code=400, detail=f"Invalid {name} '{value}'. Use an ISO date or datetime.")
+        if parsed is not None and parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        parsed_dates[name] = parsed
+
+    fingerprint = query_fingerprint(
+        search=search, sort=sort, start_after=start_after, start_before=start_before,
+        duration=duration, min_sessions=min_sessions, max_sessions=max_sessions, page_size=page_size
+    )
+    offset = None
+    if cursor:
+        try:
+            offset = decode_cursor(cursor, fingerprint)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     try:
-        import requests
-        
-        # Use the same API call format as the working agents
-        api_key = os.getenv('OREILLY_API_KEY')
-        if not api_key:
-            raise Exception("OREILLY_API_KEY not found in environment variables")
-        
-        api_url = "https://api.oreilly.com/api/v1/integrations/live-events/"
-        headers = {
-            "Authorization": f"Token {api_key}",
-            "Accept": "application/json"
-        }
-        
-        # Get only upcoming live events (both starting and ending in the future)
-        from datetime import datetime, timezone, timedelta
-        now = datetime.now(timezone.utc)
-        tomorrow = (now + timedelta(days=1)).strftime('%Y-%m-%d')
-        
-        print(f"Current time: {now}")
-        print(f"Filtering for events starting after: {tomorrow}")
-        print(f"Requested page: {page}, page_size: {page_size}")
-        
-        # Fetch ALL events from API (iterate through pages)
-        all_results = []
-        next_url = api_url
-        api_page = 1
-        
-        # Build initial params
-        initial_params = {
-            "start_datetime_after": tomorrow,
-            "limit": 100  # Max per API call
-        }
-        
-        while next_url and api_page <= 10:  # Limit to 10 API pages (1000 events max)
-            print(f"Fetching API page {api_page}...")
-            
-            if api_page == 1:
-                response = requests.get(next_url, headers=headers, params=initial_params, timeout=10)
-            else:
-                # Use the next_url directly (it already has params)
-                response = requests.get(next_url, headers=headers, timeout=10)
-            
-            print(f"Response status: {response.status_code}")
-            
-            if response.status_code == 401:
-                print("Authentication failed - check API key")
-                return {
-                    "status": "error",
-                    "message": "Authentication failed",
-                    "events": [],
-                    "pagination": {"page": page, "page_size": page_size, "total_pages": 0, "total_events": 0}
-                }
-            
-            if response.status_code != 200:
-                print(f"Error response: {response.text}")
-                break
-            
-            data = response.json()
-            
-            if "results" in data and isinstance(data["results"], list):
-                all_results.extend(data["results"])
-                print(f"Got {len(data['results'])} events from API page {api_page}. Total so far: {len(all_results)}")
-            
-            # Check for next page
-            next_url = data.get("next")
-            if not next_url:
-                print("No more pages from API")
-                break
-            
-            api_page += 1
-        
-        print(f"Total events fetched from API: {len(all_results)}")
-        
-        events = []
-        now = datetime.now(timezone.utc)
-        
-        # Process all results
-        for item in all_results:
-                # Extract event information from live events API
-                event_id = item.get("identifier", "")
-                ourn = item.get("ourn", "")
-                series_ourn = item.get("series_ourn", "")
-                title = item.get("title", "Untitled Event")
-                
-                # Filter out events that already started
-                start_datetime_str = item.get("start_datetime")
-                if start_datetime_str:
-                    try:
-                        start_dt = datetime.fromisoformat(start_datetime_str.replace('Z', '+00:00'))
-                        # Skip events that already started
-                        if start_dt <= now:
-                            print(f"Skipping past event: {title} (started {start_dt})")
-                            continue
-                    except Exception as e:
-                        print(f"Error parsing start date for {title}: {e}")
-                        continue
-                
-                # Get cover image from the live event API response
-                cover_path = item.get("cover", "")
-                cover_url = f"https://learning.oreilly.com{cover_path}400w/" if cover_path else ""
-                
-                # Construct event URL directly from series_ourn (no extra API call needed)
-                web_url = "https://learning.oreilly.com/live-events/"
-                if series_ourn:
-                    # Extract the series ID from the ourn and construct URL
-                    series_id = series_ourn.split(":")[-1]
-                    web_url = f"https://learning.oreilly.com/live-events/-/{series_id}/"
-                
-                # Parse start and end datetime (we already have start_datetime_str from filtering)
-                status = "upcoming"  # All events are upcoming since we filter
-                start_date = None
-                end_date = None
-                duration = None
-                
-                # We already parsed start_datetime_str above for filtering
-                end_datetime_str = item.get("end_datetime")
-                
-                if start_datetime_str:
-                    try:
-                        start_dt = datetime.fromisoformat(start_datetime_str.replace('Z', '+00:00'))
-                        start_date = start_datetime_str
-                        
-                        # Calculate duration if end date exists
-                        if end_datetime_str:
-                            end_dt = datetime.fromisoformat(end_datetime_str.replace('Z', '+00:00'))
-                            end_date = end_datetime_str
-                            
-                            # Calculate duration
-                            duration_seconds = int((end_dt - start_dt).total_seconds())
-                            hours = duration_seconds // 3600
-                            minutes = (duration_seconds % 3600) // 60
-                            duration = f"{hours}h {minutes}m" if hours > 0 else f"{minutes}m"
-                    except Exception as e:
-                        print(f"Error parsing dates: {e}")
-                
-                # Get sessions info if available
-                sessions = item.get("sessions", [])
-                session_count = len(sessions) if isinstance(sessions, list) else 0
-                
-                # Description - for live events, create one from title and dates
-                description = f"Live training event"
-                if session_count > 0:
-                    description += f" with {session_count} session{'s' if session_count != 1 else ''}"
-                
-                events.append({
-                    "id": event_id,
-                    "title": title,
-                    "description": description,
-                    "coverUrl": cover_url,
-                    "eventUrl": web_url,
-                    "duration": duration or "Multiple sessions",
-                    "status": status,
-                    "level": "All Levels",  # Live events API doesn't return this
-                    "instructor": None,  # Would need to fetch series details for this
-                    "startDate": start_date,
-                    "endDate": end_date,
-                    "sessionCount": session_count
-                })
-        
-        # Apply search filter if provided
-        if search and search.strip():
-            search_lower = search.strip().lower()
-            filtered_events = []
-            for event in events:
-                title_match = search_lower in event.get("title", "").lower()
-                instructor_match = event.get("instructor") and search_lower in event.get("instructor", "").lower()
-                description_match = search_lower in event.get("description", "").lower()
-                
-                if title_match or instructor_match or description_match:
-                    filtered_events.append(event)
-            
-            events = filtered_events
-            print(f"Search query: '{search}' - Found {len(events)} matching events")
-        
-        # Apply client-side pagination
+        try:
+            # Ranked search results when a query is given, otherwise start-time order
+            events = await live_events_store.get_upcoming(search)
+        except LiveEventsAuthError:
+            logger.error("Live events authentication failed - check API key")
+            return {
+                "status": "error",
+                "message": "Authentication failed",
+                "events": [],
+                "pagination": {"page": page, "page_size": page_size, "total_pages": 0, "total_events": 0}
+            }
+
+        events = filter_events(
+            events,
+            start_after=parsed_dates["start_after"],
+            start_before=parsed_dates["start_before"],
+            duration=duration,
+            min_sessions=min_sessions,
+            max_sessions=max_sessions,
+        )
+        events = sort_events(events, sort)
+
         total_events = len(events)
         total_pages = (total_events + page_size - 1) // page_size  # Ceiling division
-        
-        # Validate page number
-        if page < 1:
-            page = 1
-        if page > total_pages and total_pages > 0:
-            page = total_pages
-        
-        # Calculate slice indices
-        start_idx = (page - 1) * page_size
-        end_idx = start_idx + page_size
-        paginated_events = events[start_idx:end_idx]
-        
-        print(f"Total events after filtering: {total_events}")
-        print(f"Returning page {page}/{total_pages} with {len(paginated_events)} events")
-        
+
+        if offset is None:
+            # Validate page number
+            if page < 1:
+                page = 1
+            if page > total_pages and total_pages > 0:
+                page = total_pages
+            offset = (page - 1) * page_size
+        else:
+            page = offset // page_size + 1
+
+        paginated_events = [public_event(event) for event in events[offset:offset + page_size]]
+        has_next = offset + page_size < total_events
+        has_prev = offset > 0
+
         return {
             "status": "success",
             "events": paginated_events,
@@ -959,14 +1134,15 @@ async def get_live_events(page: int = 1, page_size: int = 20, search: str = ""):
                 "page_size": page_size,
                 "total_pages": total_pages,
                 "total_events": total_events,
-                "has_next": page < total_pages,
-                "has_prev": page > 1
+                "has_next": has_next,
+                "has_prev": has_prev,
+                "next_cursor": encode_cursor(offset + page_size, fingerprint) if has_next else None,
+                "prev_cursor": encode_cursor(max(0, offset - page_size), fingerprint) if has_prev else None,
+                "sort": sort
             }
         }
     except Exception as e:
-        print(f"Error fetching live events: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error fetching live events: %s", e)
         return {
             "status": "error",
             "message": str(e),
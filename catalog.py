@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+from strands import tool
+
+from structured_logging import get_logger
+from tracing import traced
+from metrics import UPSTREAM_REQUEST_SECONDS, UPSTREAM_REQUESTS_TOTAL, CACHE_LOOKUPS_TOTAL, status_label
+
+load_dotenv()
+
+logger = get_logger("catalog")
+
+# O'Reilly content API - override the URL to point the tool at a local stub server
+CONTENT_API_URL = os.getenv("OREILLY_CONTENT_API_URL", "https://api.oreilly.com/api/v1/integrations/content/")
+WEB_BASE_URL = "https://learning.oreilly.com"
+
+# Results per upstream call; smaller requests are served by slicing the cached page
+UPSTREAM_LIMIT = 30
+MAX_RESULTS = 30
+DESCRIPTION_MAX_CHARS = 240
+
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "900"))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "512"))
+CATALOG_HTTP_TIMEOUT_SECONDS = float(os.getenv("CATALOG_HTTP_TIMEOUT_SECONDS", "10"))
+
+# Formats the agents may ask for; anything else is searched across all formats
+CONTENT_FORMATS = {"book", "video", "course", "audiobook", "live-training", "learning-path"}
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a fixed TTL"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached value, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value) -> None:
+        """Store a value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+catalog_cache = TTLCache(CATALOG_CACHE_MAX_ENTRIES, CATALOG_CACHE_TTL_SECONDS)
+
+# Number of requests actually sent to the content API
+upstream_calls = 0
+
+_http_client: Optional[httpx.Client] = None
+_http_client_lock = threading.Lock()
+
+def get_http_client() -> httpx.Client:
+    """Shared, connection-pooled client for the content API"""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    timeout=CATALOG_HTTP_TIMEOUT_SECONDS,
+                    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                    headers={"Accept": "application/json"},
+                )
+    return _http_client
+
+def close_http_client() -> None:
+    """Close the pooled client, e.g. on server shutdown"""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
+
+def normalize_topic(topic: str) -> str:
+    """Turn free text like 'Machine Learning' into a topic slug"""
+    return "-".join(str(topic).strip().lower().split())
+
+def _first(item: Dict[str, Any], *keys: str):
+    for key in keys:
+        value = item.get(key)
+        if value:
+            return value
+    return None
+
+def _format_duration(item: Dict[str, Any]) -> Optional[str]:
+    seconds = _first(item, "duration_seconds", "duration")
+    if isinstance(seconds, (int, float)) and seconds > 0:
+        hours = int(seconds) // 3600
+        minutes = (int(seconds) % 3600) // 60
+        return f"{hours}h {minutes}m" if hours > 0 else f"{minutes}m"
+    if isinstance(seconds, str) and seconds:
+        return seconds
+    pages = _first(item, "virtual_pages", "page_count")
+    if pages:
+        return f"{pages} pages"
+    return None
+
+def _format_authors(item: Dict[str, Any]) -> List[str]:
+    authors = _first(item, "authors", "instructors", "narrators") or []
+    if isinstance(authors, str):
+        return [authors]
+    names = []
+    for author in authors:
+        if isinstance(author, dict):
+            author = author.get("name") or author.get("full_name")
+        if author:
+            names.append(str(author))
+    return names
+
+def _absolute_url(path: Optional[str]) -> Optional[str]:
+    if not path:
+        return None
+    if path.startswith("http"):
+        return path
+    return f"{WEB_BASE_URL}{path}"
+
+def trim_result(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only the fields the agent prompts render"""
+    cover = item.get("cover") or item.get("cover_url")
+    if cover and not cover.startswith("http"):
+        cover = f"{WEB_BASE_URL}{cover.rstrip('/')}/400w/"
+
+    description = _first(item, "description", "short_description") or ""
+    if len(description) > DESCRIPTION_MAX_CHARS:
+        description = description[:DESCRIPTION_MAX_CHARS].rsplit(" ", 1)[0] + "..."
+
+    trimmed = {
+        "title": item.get("title"),
+        "format": item.get("content_format"),
+        "level": _first(item, "content_level", "level"),
+        "duration": _format_duration(item),
+        "authors": _format_authors(item),
+        "description": description,
+        "cover": cover,
+        "link": _absolute_url(_first(item, "web_url", "url")),
+    }
+    # Drop empty fields rather than sending nulls back to the model
+    return {key: value for key, value in trimmed.items() if value}
+
+def fetch_catalog(topic: str, content_format: str = "") -> List[Dict[str, Any]]:
+    """Fetch and trim one page of catalog results, served from the cache when fresh"""
+    slug = normalize_topic(topic)
+    content_format = content_format.strip().lower() if content_format else ""
+    if content_format not in CONTENT_FORMATS:
+        content_format = ""
+
+    cache_key = (slug, content_format)
+    with traced("catalog.fetch", topic=slug, content_format=content_format) as span:
+        cached = catalog_cache.get(cache_key)
+        CACHE_LOOKUPS_TOTAL.inc(cache="catalog", result="miss" if cached is None else "hit")
+        if span.is_recording():
+            span.set_attribute("cache_hit", cached is not None)
+        if cached is not None:
+            return cached
+        return _fetch_upstream(cache_key, slug, content_format)
+
+def _fetch_upstream(cache_key: Tuple[str, str], slug: str, content_format: str) -> List[Dict[str, Any]]:
+    """Query the content API on a cache miss and cache the trimmed results"""
+    global upstream_calls
+    api_key = os.getenv("OREILLY_API_KEY") or os.getenv("COURSE_API_KEY")
+    if not api_key:
+        raise RuntimeError("OREILLY_API_KEY not found in environment variables")
+
+    params = {"any_topic_slug": slug, "limit": UPSTREAM_LIMIT, "status": "Live"}
+    if content_format:
+        params["content_format"] = content_format
+
+    # search_catalog runs on several agent threads at once
+    with _http_client_lock:
+        upstream_calls += 1
+    status_code = None
+    try:
+        with UPSTREAM_REQUEST_SECONDS.time(api="catalog"), traced("http GET catalog") as span:
+            response = get_http_client().get(
+                CONTENT_API_URL,
+                params=params,
+                headers={"Authorization": f"Token {api_key}"},
+            )
+            if span.is_recording():
+                span.set_attribute("http.status_code", response.status_code)
+        status_code = response.status_code
+    finally:
+        UPSTREAM_REQUESTS_TOTAL.inc(api="catalog", status=status_label(status_code))
+    response.raise_for_status()
+
+    results = [trim_result(item) for item in response.json().get("results", []) if isinstance(item, dict)]
+    catalog_cache.set(cache_key, results)
+    return results
+
+@tool
+def search_catalog(topic: str, content_format: str = "", limit: int = 10) -> dict:
+    """Search the O'Reilly catalog for learning resources on a topic.
+
+    Returns a JSON list of resources with title, format, level, duration,
+    authors, description, cover (full image URL) and link fields.
+
+    Args:
+        topic: Topic to search for, e.g. "python", "react", "machine learning".
+        content_format: Optional format filter: "book", "video", "audiobook",
+            "live-training" or "learning-path". Leave empty to search all formats.
+        limit: Maximum number of resources to return, between 1 and 30.
+    """
+    limit = max(1, min(int(limit), MAX_RESULTS))
+    try:
+        results = fetch_catalog(topic, content_format)
+    except Exception as e:
+        logger.error("Error searching catalog for %r (%s): %s", topic, content_format or "all", e)
+        return {"status": "error", "content": [{"text": f"Catalog search failed: {e}"}]}
+
+    return {
+        "status": "success",
+        "content": [{"text": json.dumps(results[:limit], ensure_ascii=False, separators=(",", ":"))}],
+    }
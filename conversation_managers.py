@@ -0,0 +1,382 @@
+import os
+import json
+import time
+import asyncio
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from strands.agent.conversation_manager import SummarizingConversationManager
+from strands.hooks import BeforeInvocationEvent, HookRegistry
+from strands.types.content import Message
+from strands.types.exceptions import ContextWindowOverflowException
+
+from agent_result import USAGE_FIELDS
+from metrics import CHAT_STAGE_SECONDS, SUMMARIZATIONS_TOTAL, SUMMARY_SECONDS, SUMMARY_TOKENS_TOTAL
+from strands_compat import (
+    DEFAULT_SUMMARIZATION_PROMPT, adjust_split_point, as_user_summary, ensure_tracking_id,
+    get_summary_message, process_stream, set_summary_message, stop_event,
+)
+from structured_logging import get_logger
+from tracing import traced
+
+# "background" summarizes older turns after a response has gone out;
+# "inline" only summarizes when a turn overflows the context window
+SUMMARIZATION_MODE = os.getenv("SUMMARIZATION_MODE", "background").strip().lower()
+# History length at which a background summary of all but the recent window is started
+BACKGROUND_SUMMARY_TRIGGER_MESSAGES = int(os.getenv("BACKGROUND_SUMMARY_TRIGGER_MESSAGES", "30"))
+BACKGROUND_SUMMARY_WORKERS = int(os.getenv("BACKGROUND_SUMMARY_WORKERS", "2"))
+# Estimated input tokens (system prompt + history) an agent may send per model
+# call; CONTEXT_TOKEN_BUDGET_<CONTENT_TYPE>, e.g. CONTEXT_TOKEN_BUDGET_BOOKS, overrides it per agent
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "24000"))
+# Turns at the end of the history whose tool results are always sent verbatim
+CONTEXT_KEEP_RECENT_TURNS = int(os.getenv("CONTEXT_KEEP_RECENT_TURNS", "2"))
+
+# Rough size of a token in characters, close enough for budgeting
+CHARS_PER_TOKEN = 4
+# Catalog result fields kept for earlier turns: enough for the user to refer
+# back to an item, without the description and cover the answer already showed
+COMPACT_RESULT_FIELDS = ("title", "format", "level", "duration", "authors", "link")
+COMPACTED_MARKER = "[Earlier results, trimmed] "
+OMITTED_MARKER = "[Earlier tool output omitted]"
+# Non-catalog tool output longer than this is cut down when compacted
+COMPACT_TEXT_MAX_CHARS = 300
+
+logger = get_logger("conversation")
+
+# Shared by every session's manager; summaries are Bedrock-bound, so a couple of threads is plenty
+summary_executor = ThreadPoolExecutor(max_workers=BACKGROUND_SUMMARY_WORKERS, thread_name_prefix="summarizer")
+
+async def generate_summary_with_usage(messages: List[Message], model,
+                                      system_prompt: Optional[str] = None) -> Tuple[Message, Dict[str, int]]:
+    """Ask the model to summarize messages; returns the user-role summary and its token usage"""
+    summarization_messages = list(messages) + [
+        {"role": "user", "content": [{"text": "Please summarize this conversation."}]}
+    ]
+    chunks = model.stream(
+        summarization_messages,
+        tool_specs=None,
+        system_prompt=system_prompt if system_prompt is not None else DEFAULT_SUMMARIZATION_PROMPT,
+    )
+
+    result_message, usage = None, {}
+    async for event in process_stream(chunks):
+        stop = stop_event(event)
+        if stop is not None:
+            _, result_message, usage, _ = stop
+    if result_message is None:
+        raise RuntimeError("Failed to generate summary: no response from model")
+    return as_user_summary(result_message), {name: usage[name] for name in USAGE_FIELDS if name in usage}
+
+def estimate_tokens(value: Any) -> int:
+    """Rough token count of a prompt string or message list"""
+    if isinstance(value, str):
+        return len(value) // CHARS_PER_TOKEN
+    return len(json.dumps(value, ensure_ascii=False, default=str)) // CHARS_PER_TOKEN
+
+def context_budget_for(content_type: str) -> int:
+    """Token budget for one content type's agent"""
+    override = os.getenv(f"CONTEXT_TOKEN_BUDGET_{content_type.upper().replace('-', '_')}")
+    return int(override) if override else CONTEXT_TOKEN_BUDGET
+
+def _compact_tool_text(text: str) -> str:
+    if text.startswith(COMPACTED_MARKER) or text == OMITTED_MARKER:
+        return text
+    try:
+        results = json.loads(text)
+    except ValueError:
+        results = None
+    if isinstance(results, list) and all(isinstance(item, dict) for item in results):
+        compact = [{key: item[key] for key in COMPACT_RESULT_FIELDS if key in item} for item in results]
+        return COMPACTED_MARKER + json.dumps(compact, ensure_ascii=False, separators=(",", ":"))
+    if len(text) > COMPACT_TEXT_MAX_CHARS:
+        return COMPACTED_MARKER + text[:COMPACT_TEXT_MAX_CHARS] + "..."
+    return text
+
+def starts_turn(message: Message) -> bool:
+    """A turn starts at a user message that isn't just carrying tool results back"""
+    return (message.get("role") == "user"
+            and not any("toolResult" in block for block in message.get("content") or ()))
+
+class ContextBudget:
+    """Keeps an agent's input under a token budget by trimming old tool results.
+
+    Tool results from before the last keep_recent_turns turns are first
+    compacted to COMPACT_RESULT_FIELDS; if the estimate is still over
+    max_tokens they are replaced by a placeholder. Anything still over
+    budget after that is left to the conversation manager to summarize.
+    Messages are edited in place and only ever shrink, so running this
+    every turn is idempotent.
+    """
+
+    def __init__(self, max_tokens: int = CONTEXT_TOKEN_BUDGET, keep_recent_turns: int = CONTEXT_KEEP_RECENT_TURNS):
+        self.max_tokens = max_tokens
+        self.keep_recent_turns = keep_recent_turns
+
+    def _old_tool_results(self, messages: List[Message]) -> List[Dict[str, Any]]:
+        """toolResult blocks from before the last keep_recent_turns turns"""
+        turn_starts = [index for index, message in enumerate(messages) if starts_turn(message)]
+        if self.keep_recent_turns <= 0:
+            cutoff = len(messages)
+        elif len(turn_starts) >= self.keep_recent_turns:
+            cutoff = turn_starts[-self.keep_recent_turns]
+        else:
+            cutoff = 0
+        return [block["toolResult"] for message in messages[:cutoff]
+                for block in message.get("content") or () if "toolResult" in block]
+
+    def estimate(self, agent) -> int:
+        return estimate_tokens(agent.system_prompt or "") + estimate_tokens(agent.messages)
+
+    def apply(self, agent) -> Tuple[int, int]:
+        """Trim agent's history toward the budget; returns (tokens before, tokens after)"""
+        before = self.estimate(agent)
+        tool_results = self._old_tool_results(agent.messages)
+        for tool_result in tool_results:
+            for item in tool_result.get("content") or ():
+                if "text" in item:
+                    item["text"] = _compact_tool_text(item["text"])
+        after = self.estimate(agent) if tool_results else before
+
+        if after > self.max_tokens and tool_results:
+            for tool_result in tool_results:
+                tool_result["content"] = [{"text": OMITTED_MARKER}]
+            after = self.estimate(agent)
+        return before, after
+
+def _run_coroutine(factory: Callable[[], Awaitable[Any]]) -> Any:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(factory())
+    # Called from inside a streamed turn's event loop, which is busy running us
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(lambda: asyncio.run(factory())).result()
+
+def _record_summary(mode: str, started: float, usage: Dict[str, int]) -> None:
+    SUMMARY_SECONDS.observe(time.perf_counter() - started, mode=mode)
+    for kind, value in usage.items():
+        SUMMARY_TOKENS_TOTAL.inc(value, mode=mode, kind=kind)
+
+_clamped_triggers = set()
+
+def _warn_trigger_clamped(requested: int, minimum: int) -> None:
+    # A manager is built per agent and session, so say it once per value
+    if (requested, minimum) not in _clamped_triggers:
+        _clamped_triggers.add((requested, minimum))
+        logger.warning("Background summary trigger of %d messages is under twice the %d preserved; using %d",
+                       requested, minimum // 2, minimum)
+
+class TracedSummarizingConversationManager(SummarizingConversationManager):
+    """SummarizingConversationManager that times each summarization and records it as a span.
+
+    Summaries run inline, inside the user's turn, so they show up in that
+    turn's trace and in the "summarize" stage histogram. With a
+    context_budget, each turn first trims old tool results to fit it and
+    summarizes if that isn't enough; last_tokens_saved holds the estimated
+    tokens that removed from the latest turn's input.
+    """
+
+    def __init__(self, *args, context_budget: Optional[ContextBudget] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.context_budget = context_budget
+        self.last_tokens_saved = 0
+
+    def register_hooks(self, registry: HookRegistry, **kwargs: Any) -> None:
+        super().register_hooks(registry, **kwargs)
+        registry.add_callback(BeforeInvocationEvent, self._on_before_invocation)
+
+    def _on_before_invocation(self, event: BeforeInvocationEvent) -> None:
+        self._enforce_budget(event.agent)
+
+    def _enforce_budget(self, agent) -> None:
+        self.last_tokens_saved = 0
+        if self.context_budget is None:
+            return
+        before, after = self.context_budget.apply(agent)
+        if after > self.context_budget.max_tokens:
+            logger.info("Context of ~%d tokens is over its %d-token budget, summarizing",
+                        after, self.context_budget.max_tokens)
+            # Proactive (no exception), so a failed summary just sends the longer context
+            self.reduce_context(agent)
+            after = self.context_budget.estimate(agent)
+        self.last_tokens_saved = max(0, before - after)
+
+    def reduce_context(self, agent, e=None, **kwargs):
+        with CHAT_STAGE_SECONDS.time(stage="summarize"), \
+                traced("conversation.summarize", messages_before=len(agent.messages),
+                       context_overflow=e is not None) as span:
+            super().reduce_context(agent, e, **kwargs)
+            if span.is_recording():
+                span.set_attribute("messages_after", len(agent.messages))
+
+    def _generate_summary_with_model(self, messages: List[Message], agent) -> Message:
+        started = time.perf_counter()
+        try:
+            summary, usage = _run_coroutine(
+                lambda: generate_summary_with_usage(messages, agent.aux_model, self.summarization_system_prompt)
+            )
+        except Exception:
+            SUMMARIZATIONS_TOTAL.inc(mode="inline", status="error")
+            raise
+        _record_summary("inline", started, usage)
+        SUMMARIZATIONS_TOTAL.inc(mode="inline", status="success")
+        return summary
+
+class BackgroundSummarizingConversationManager(TracedSummarizingConversationManager):
+    """Summarizes older turns off the request path instead of inside an overflowing turn.
+
+    After a turn that leaves the history at summarize_after_messages (at
+    least twice preserve_recent_messages) or more, everything but the last
+    preserve_recent_messages is summarized on summary_executor while the
+    response goes back to the user. A turn that starts over its context
+    budget starts one too, and meanwhile drops its oldest messages rather
+    than waiting. The summary replaces the summarized messages still at the
+    front of the history at the start of the next turn that finds it ready,
+    provided they are still the same message objects - a restore or an
+    inline summary in the meantime makes it stale and it is dropped. Turns
+    never wait for it, except one that overflows the context window while it
+    is in flight, which waits rather than summarizing twice.
+    """
+
+    def __init__(self, *args, summarize_after_messages: int = BACKGROUND_SUMMARY_TRIGGER_MESSAGES,
+                 executor: Optional[ThreadPoolExecutor] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Below twice the preserved window each summary would fold in only a few
+        # messages, and a new one would start after almost every turn
+        minimum = 2 * self.preserve_recent_messages
+        if summarize_after_messages < minimum:
+            _warn_trigger_clamped(summarize_after_messages, minimum)
+        self.summarize_after_messages = max(summarize_after_messages, minimum)
+        self._executor = executor or summary_executor
+        self._pending: Optional[Future] = None
+        self._pending_prefix: List[Message] = []
+
+    def _on_before_invocation(self, event: BeforeInvocationEvent) -> None:
+        # Swap first: the summary may already bring the context under budget
+        self._swap_in_summary(event.agent)
+        super()._on_before_invocation(event)
+
+    def _enforce_budget(self, agent) -> None:
+        self.last_tokens_saved = 0
+        if self.context_budget is None:
+            return
+        before, after = self.context_budget.apply(agent)
+        if after > self.context_budget.max_tokens:
+            # Summarizing here would hold up the turn; trim now and let the summary catch up
+            self._start_background_summary(agent)
+            self._trim_oldest(agent, after - self.context_budget.max_tokens)
+            after = self.context_budget.estimate(agent)
+            logger.info("Context was over its %d-token budget, trimmed to ~%d tokens",
+                        self.context_budget.max_tokens, after)
+        self.last_tokens_saved = max(0, before - after)
+
+    def _trim_oldest(self, agent, excess_tokens: int) -> int:
+        """Drop the oldest messages worth about excess_tokens, keeping the recent window; returns how many"""
+        messages = agent.messages
+        limit = len(messages) - self.preserve_recent_messages
+        split = 0
+        while split < limit and excess_tokens > 0:
+            excess_tokens -= estimate_tokens(messages[split])
+            split += 1
+        # The history has to open with a new turn, not a reply or a tool result
+        while split < limit and not starts_turn(messages[split]):
+            split += 1
+        if split == 0 or split >= len(messages) or not starts_turn(messages[split]):
+            return 0
+
+        summary = get_summary_message(self)
+        if summary is not None and any(message is summary for message in messages[:split]):
+            # Same bookkeeping as a summary: the summary itself isn't a removed turn
+            self.removed_message_count += split - 1
+            set_summary_message(self, None)
+        else:
+            self.removed_message_count += split
+        del messages[:split]
+        return split
+
+    def apply_management(self, agent, **kwargs: Any) -> None:
+        """Runs as each turn ends: start a background summary if the history is long enough"""
+        super().apply_management(agent, **kwargs)
+        if len(agent.messages) >= self.summarize_after_messages:
+            self._start_background_summary(agent)
+
+    def _start_background_summary(self, agent) -> None:
+        """Summarize all but the recent window on summary_executor, unless a summary is already in flight"""
+        if self._pending is not None:
+            return
+        try:
+            split = adjust_split_point(self, agent.messages, len(agent.messages) - self.preserve_recent_messages)
+        except ContextWindowOverflowException:
+            return
+        if split < 2:
+            return
+
+        self._pending_prefix = agent.messages[:split]
+        # Keep the request's context so logs and spans stay correlated with the turn that started it
+        self._pending = self._executor.submit(
+            contextvars.copy_context().run, self._summarize_in_background, self._pending_prefix, agent.aux_model
+        )
+
+    def _summarize_in_background(self, prefix: List[Message], model) -> Message:
+        started = time.perf_counter()
+        with traced("conversation.summarize.background", messages=len(prefix)):
+            try:
+                summary, usage = asyncio.run(
+                    generate_summary_with_usage(prefix, model, self.summarization_system_prompt)
+                )
+            except Exception as e:
+                SUMMARIZATIONS_TOTAL.inc(mode="background", status="error")
+                logger.warning("Background summarization failed: %s", e)
+                raise
+        _record_summary("background", started, usage)
+        return summary
+
+    def _swap_in_summary(self, agent) -> bool:
+        """Replace the summarized messages with a finished background summary; True if it did"""
+        job = self._pending
+        if job is None or not job.done():
+            return False
+        prefix = self._pending_prefix
+        self._pending, self._pending_prefix = None, []
+        if job.exception() is not None:
+            return False
+
+        messages = agent.messages
+        # Trimming may have dropped the start of the prefix since; the summary still covers it
+        start = next((index for index, message in enumerate(prefix) if messages and message is messages[0]), None)
+        if start is None:
+            SUMMARIZATIONS_TOTAL.inc(mode="background", status="discarded")
+            return False
+        prefix = prefix[start:]
+        if len(messages) < len(prefix) or any(current is not summarized for current, summarized in zip(messages, prefix)):
+            SUMMARIZATIONS_TOTAL.inc(mode="background", status="discarded")
+            return False
+
+        summary = job.result()
+        ensure_tracking_id(summary)
+        # Same bookkeeping as an inline summary: an earlier summary at the front isn't a removed turn
+        self.removed_message_count += len(prefix) - (1 if get_summary_message(self) else 0)
+        set_summary_message(self, summary)
+        messages[:len(prefix)] = [summary]
+        SUMMARIZATIONS_TOTAL.inc(mode="background", status="success")
+        logger.debug("Swapped %d messages for a background summary", len(prefix))
+        return True
+
+    def reduce_context(self, agent, e=None, **kwargs):
+        if self._pending is not None and e is not None:
+            # Overflowed with a summary already in flight: finishing it beats starting another
+            wait([self._pending])
+        if self._swap_in_summary(agent):
+            return
+        super().reduce_context(agent, e, **kwargs)
+
+def create_conversation_manager(summary_prompt: str, mode: str = SUMMARIZATION_MODE,
+                                content_type: str = "all") -> SummarizingConversationManager:
+    """Conversation manager for one agent, as selected by SUMMARIZATION_MODE, with its content type's token budget"""
+    budget = ContextBudget(context_budget_for(content_type))
+    if mode == "background":
+        return BackgroundSummarizingConversationManager(summarization_system_prompt=summary_prompt, context_budget=budget)
+    if mode != "inline":
+        logger.warning("Unknown SUMMARIZATION_MODE %r, summarizing inline", mode)
+    return TracedSummarizingConversationManager(summarization_system_prompt=summary_prompt, context_budget=budget)
@@ -0,0 +1,173 @@
+import os
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from metrics import INTENT_ROUTES_TOTAL
+
+# Answer trivial messages (greetings, thanks, reset, ...) without an agent
+# turn and send explicit content-type requests to the specialized agent.
+# Messages that need no catalog search still go to the agent with its tools:
+# Bedrock's Converse API has no "none" tool choice and rejects a history
+# holding toolUse/toolResult blocks unless tools are configured, so a turn
+# can't drop them once the session has searched.
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+
+# Longer messages always go to the agent, whatever they contain
+CANNED_MAX_WORDS = 8
+
+# Canned intents, highest priority first: "thanks for the help" is thanks, not
+# help, and "thanks, start over" is a reset. The API clears the session on reset.
+CANNED_PHRASES = {
+    "reset": ("reset", "start over", "start again", "restart", "new conversation", "new chat", "clear chat",
+              "clear history", "clear the chat", "forget everything"),
+    "thanks": ("thanks", "thank you", "thank u", "thx", "ty", "cheers", "much appreciated", "appreciate it"),
+    "goodbye": ("bye", "goodbye", "bye bye", "see you", "see ya", "good night"),
+    "help": ("help", "what can you do", "how does this work", "who are you"),
+    "greeting": ("hi", "hello", "hey", "hiya", "howdy", "greetings", "good morning", "good afternoon",
+                 "good evening"),
+}
+
+CANNED_REPLIES = {
+    "reset": "Done - I've cleared our conversation. What would you like to learn next?",
+    "thanks": "You're welcome! Let me know if you'd like more resources or a learning plan for another topic.",
+    "goodbye": "Goodbye, and happy learning! Come back any time you want new resources or a study plan.",
+    "help": ("I can search the O'Reilly catalog for books, video courses, audiobooks and live events on any "
+             "topic, suggest a learning path with time estimates, and answer follow-up questions about what "
+             "to study next. Try something like \"Python books for beginners\" or \"a learning path for Kubernetes\"."),
+    "greeting": ("Hi! I'm your O'Reilly learning mentor. Tell me what you'd like to learn - a language, framework "
+                 "or skill - and I'll find books, courses, audiobooks and live events for it, with a suggested "
+                 "learning path."),
+}
+
+# Words that may pad a canned message without changing what it asks
+FILLER_WORDS = frozenset({
+    "a", "again", "all", "and", "awesome", "cool", "everyone", "for", "great", "it", "lets", "lot", "much", "nice",
+    "now", "oh", "ok", "okay", "perfect", "please", "so", "that", "thats", "the", "there", "very", "you", "your",
+})
+
+# Explicit mentions of one content type, by the agent profile that serves it
+CONTENT_TYPE_PHRASES = {
+    "books": ("book", "books", "ebook", "ebooks"),
+    "audiobooks": ("audiobook", "audiobooks", "audio book", "audio books"),
+    "courses": ("course", "courses", "video", "videos", "video course", "video courses"),
+    "live-event-series": ("live event", "live events", "live training", "live trainings", "workshop",
+                          "workshops", "webinar", "webinars"),
+}
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    return _WORD.findall(text.lower().replace("'", ""))
+
+class PhraseMatcher:
+    """Aho-Corasick automaton over words: finds every phrase in a message in one pass.
+
+    Matching whole words rather than characters means "hi" never matches
+    inside "high" and hyphenated or punctuated text needs no special cases.
+    """
+
+    def __init__(self, phrases: Iterable[Tuple[str, str]]):
+        # State 0 is the root; each state has word transitions, a failure link
+        # and the (length, label) of every phrase ending there
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str]]] = [[]]
+        for phrase, label in phrases:
+            words = tokenize(phrase)
+            state = 0
+            for word in words:
+                next_state = self._goto[state].get(word)
+                if next_state is None:
+                    next_state = self._goto[state][word] = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = next_state
+            self._out[state].append((len(words), label))
+
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for word, next_state in self._goto[state].items():
+                pending.append(next_state)
+                fail = self._fail[state]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(word, 0)
+                # A first-level state would otherwise fail to itself
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def find(self, words: Sequence[str]) -> List[Tuple[int, int, str]]:
+        """Every (start, end, label) phrase occurrence in words, end exclusive"""
+        matches = []
+        state = 0
+        for index, word in enumerate(words):
+            while state and word not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(word, 0)
+            for length, label in self._out[state]:
+                matches.append((index + 1 - length, index + 1, label))
+        return matches
+
+def _longest(matches: List[Tuple[int, int, str]]) -> List[Tuple[int, int, str]]:
+    """Drop matches inside a longer one, e.g. "book" within "audio book" """
+    return [match for match in matches
+            if not any(other != match and other[0] <= match[0] and match[1] <= other[1] for other in matches)]
+
+@dataclass
+class Route:
+    """Where a message goes: a canned reply, or an agent (optionally a specific content type)"""
+
+    name: str
+    reply: Optional[str] = None
+    content_type: Optional[str] = None
+
+class IntentRouter:
+    """Rule-based fast path in front of the agents, with per-route counts"""
+
+    def __init__(self):
+        self._canned = PhraseMatcher(
+            (phrase, intent) for intent, phrases in CANNED_PHRASES.items() for phrase in phrases
+        )
+        self._content_types = PhraseMatcher(
+            (phrase, content_type) for content_type, phrases in CONTENT_TYPE_PHRASES.items() for phrase in phrases
+        )
+        self._priority = {intent: rank for rank, intent in enumerate(CANNED_PHRASES)}
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+
+    def classify(self, message: str) -> Route:
+        """Route for a message; Route("agent") when no rule applies"""
+        words = tokenize(message)
+        if not words:
+            return Route("agent")
+
+        if len(words) <= CANNED_MAX_WORDS:
+            matches = self._canned.find(words)
+            covered = set()
+            for start, end, _ in matches:
+                covered.update(range(start, end))
+            if matches and all(index in covered or word in FILLER_WORDS for index, word in enumerate(words)):
+                intent = min((label for _, _, label in matches), key=self._priority.__getitem__)
+                return Route(intent, reply=CANNED_REPLIES[intent])
+
+        content_types = {label for _, _, label in _longest(self._content_types.find(words))}
+        if len(content_types) == 1:
+            return Route("content_type", content_type=content_types.pop())
+        return Route("agent")
+
+    def record(self, route: str) -> None:
+        """Count a routing decision that was acted on"""
+        INTENT_ROUTES_TOTAL.inc(route=route)
+        with self._lock:
+            self.counts[route] = self.counts.get(route, 0) + 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+intent_router = IntentRouter()
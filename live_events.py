@@ -0,0 +1,551 @@
+import os
+import re
+import json
+import math
+import base64
+import hashlib
+import time
+import random
+import asyncio
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+
+from structured_logging import get_logger
+from tracing import traced
+from metrics import UPSTREAM_REQUEST_SECONDS, UPSTREAM_REQUESTS_TOTAL, status_label
+
+load_dotenv()
+
+logger = get_logger("live_events")
+
+LIVE_EVENTS_API_URL = os.getenv("OREILLY_LIVE_EVENTS_API_URL", "https://api.oreilly.com/api/v1/integrations/live-events/")
+WEB_BASE_URL = "https://learning.oreilly.com"
+
+# How often the background task refreshes the index, and how old the index may
+# get before a request triggers an early refresh
+LIVE_EVENTS_REFRESH_SECONDS = float(os.getenv("LIVE_EVENTS_REFRESH_SECONDS", "300"))
+LIVE_EVENTS_STALE_SECONDS = float(os.getenv("LIVE_EVENTS_STALE_SECONDS", "600"))
+
+# Page sizes served by /live-events
+LIVE_EVENTS_DEFAULT_PAGE_SIZE = int(os.getenv("LIVE_EVENTS_DEFAULT_PAGE_SIZE", "12"))
+LIVE_EVENTS_MAX_PAGE_SIZE = int(os.getenv("LIVE_EVENTS_MAX_PAGE_SIZE", "50"))
+
+# Upstream fetch settings
+LIVE_EVENTS_PAGE_SIZE = 100  # Max per API call
+LIVE_EVENTS_MAX_EVENTS = int(os.getenv("LIVE_EVENTS_MAX_EVENTS", "1000"))
+LIVE_EVENTS_FETCH_CONCURRENCY = int(os.getenv("LIVE_EVENTS_FETCH_CONCURRENCY", "4"))
+LIVE_EVENTS_MAX_RETRIES = int(os.getenv("LIVE_EVENTS_MAX_RETRIES", "3"))
+LIVE_EVENTS_BACKOFF_SECONDS = 0.5
+LIVE_EVENTS_MAX_BACKOFF_SECONDS = 10.0
+LIVE_EVENTS_TIMEOUT_SECONDS = 10.0
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+class LiveEventsAuthError(Exception):
+    """Raised when the live events API rejects our API key"""
+
+class LiveEventsFetchError(Exception):
+    """Raised when a live events page can't be fetched, even after retries"""
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    """Parse an API timestamp, returning None if it is missing or malformed"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+def normalize_event(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Convert a raw API item into the event dict served by /live-events.
+
+    Returns None for items whose start time is malformed. Items with no start
+    time at all are kept and order after every dated event.
+    """
+    start_datetime_str = item.get("start_datetime") or None
+    start_dt = parse_datetime(start_datetime_str)
+    if start_datetime_str and start_dt is None:
+        return None
+
+    # Get cover image from the live event API response
+    cover_path = item.get("cover", "")
+    cover_url = f"{WEB_BASE_URL}{cover_path}400w/" if cover_path else ""
+
+    # Construct event URL directly from series_ourn (no extra API call needed)
+    web_url = f"{WEB_BASE_URL}/live-events/"
+    series_ourn = item.get("series_ourn", "")
+    if series_ourn:
+        series_id = series_ourn.split(":")[-1]
+        web_url = f"{WEB_BASE_URL}/live-events/-/{series_id}/"
+
+    end_datetime_str = item.get("end_datetime")
+    end_dt = parse_datetime(end_datetime_str)
+    duration = None
+    duration_seconds = None
+    if start_dt is not None and end_dt is not None:
+        duration_seconds = int((end_dt - start_dt).total_seconds())
+        hours = duration_seconds // 3600
+        minutes = (duration_seconds % 3600) // 60
+        duration = f"{hours}h {minutes}m" if hours > 0 else f"{minutes}m"
+
+    sessions = item.get("sessions", [])
+    session_count = len(sessions) if isinstance(sessions, list) else 0
+
+    # Description - for live events, create one from title and dates
+    description = "Live training event"
+    if session_count > 0:
+        description += f" with {session_count} session{'s' if session_count != 1 else ''}"
+
+    return {
+        "id": item.get("identifier", ""),
+        "title": item.get("title", "Untitled Event"),
+        "description": description,
+        "coverUrl": cover_url,
+        "eventUrl": web_url,
+        "duration": duration or "Multiple sessions",
+        "status": "upcoming",
+        "level": "All Levels",  # Live events API doesn't return this
+        "instructor": None,  # Would need to fetch series details for this
+        "startDate": start_datetime_str,
+        "endDate": end_datetime_str if end_dt is not None else None,
+        "sessionCount": session_count,
+        # Precomputed for ordering; stripped before events are returned.
+        # Undated events sort last and never count as started.
+        "_start_ts": start_dt.timestamp() if start_dt is not None else math.inf,
+        "_duration_seconds": duration_seconds,
+    }
+
+def public_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop the internal precomputed fields from an event dict"""
+    return {key: value for key, value in event.items() if not key.startswith("_")}
+
+async def get_http_client() -> httpx.AsyncClient:
+    """Shared, connection-pooled client for the live events API"""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            timeout=LIVE_EVENTS_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=LIVE_EVENTS_FETCH_CONCURRENCY, max_keepalive_connections=LIVE_EVENTS_FETCH_CONCURRENCY),
+            headers={"Accept": "application/json"},
+        )
+    return _http_client
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Seconds to wait before retrying, honouring Retry-After when present"""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(float(retry_after), LIVE_EVENTS_MAX_BACKOFF_SECONDS)
+        except ValueError:
+            pass
+    backoff = LIVE_EVENTS_BACKOFF_SECONDS * (2 ** attempt)
+    return min(backoff + random.uniform(0, backoff / 2), LIVE_EVENTS_MAX_BACKOFF_SECONDS)
+
+async def fetch_upstream_events() -> Tuple[List[Dict[str, Any]], int]:
+    """Fetch upcoming events from the live events API.
+
+    The first page gives the total count; the remaining pages are then
+    requested by offset concurrently, at most LIVE_EVENTS_FETCH_CONCURRENCY
+    at a time. 429 and 5xx responses are retried with exponential backoff.
+    Returns the raw items and the number of upstream requests made.
+    """
+    api_key = os.getenv('OREILLY_API_KEY')
+    if not api_key:
+        raise Exception("OREILLY_API_KEY not found in environment variables")
+
+    client = await get_http_client()
+    headers = {"Authorization": f"Token {api_key}"}
+    tomorrow = (datetime.now(timezone.utc) + timedelta(days=1)).strftime('%Y-%m-%d')
+    calls = 0
+
+    async def get_page(offset: int) -> Dict[str, Any]:
+        nonlocal calls
+        params = {
+            "start_datetime_after": tomorrow,
+            "limit": LIVE_EVENTS_PAGE_SIZE,
+            "offset": offset,
+        }
+        for attempt in range(LIVE_EVENTS_MAX_RETRIES + 1):
+            status_code = None
+            try:
+                with UPSTREAM_REQUEST_SECONDS.time(api="live_events"), \
+                        traced("http GET live_events", offset=offset, attempt=attempt):
+                    response = await client.get(LIVE_EVENTS_API_URL, headers=headers, params=params)
+                status_code = response.status_code
+            finally:
+                UPSTREAM_REQUESTS_TOTAL.inc(api="live_events", status=status_label(status_code))
+            calls += 1
+
+            if response.status_code == 401:
+                raise LiveEventsAuthError("Authentication failed")
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt < LIVE_EVENTS_MAX_RETRIES:
+                    await asyncio.sleep(_retry_delay(response, attempt))
+                    continue
+            if response.status_code != 200:
+                raise LiveEventsFetchError(
+                    f"Live events API returned {response.status_code} for offset {offset}: {response.text[:200]}"
+                )
+            return response.json()
+
+    first_page = await get_page(0)
+    all_results = list(first_page.get("results") or [])
+    total = min(int(first_page.get("count") or len(all_results)), LIVE_EVENTS_MAX_EVENTS)
+
+    limiter = asyncio.Semaphore(LIVE_EVENTS_FETCH_CONCURRENCY)
+
+    async def get_limited_page(offset: int) -> Dict[str, Any]:
+        async with limiter:
+            return await get_page(offset)
+
+    offsets = range(LIVE_EVENTS_PAGE_SIZE, total, LIVE_EVENTS_PAGE_SIZE)
+    pages = await asyncio.gather(*(get_limited_page(offset) for offset in offsets), return_exceptions=True)
+
+    for offset, page in zip(offsets, pages):
+        if isinstance(page, LiveEventsAuthError):
+            raise page
+        if isinstance(page, Exception):
+            # Keep the pages we did get rather than failing the whole refresh
+            logger.warning("Skipping live events page at offset %d: %s", offset, page)
+            continue
+        all_results.extend(page.get("results") or [])
+
+    return all_results[:LIVE_EVENTS_MAX_EVENTS], calls
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase word tokens used for both indexing and queries"""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+class EventSearchIndex:
+    """Inverted index over event titles, instructors and descriptions.
+
+    Every query token must match (AND). Each token also matches as a prefix,
+    so type-ahead queries like "kube" find "kubernetes". Exact token matches
+    score higher than prefix matches, and title matches outweigh instructor
+    and description matches. Rarer tokens count for more (idf).
+    """
+
+    FIELD_WEIGHTS = {"title": 3.0, "instructor": 2.0, "description": 1.0}
+    PREFIX_PENALTY = 0.6
+    RANKED_CACHE_SIZE = 512
+
+    def __init__(self, events: List[Dict[str, Any]]):
+        # token -> {event position: weighted term frequency}
+        postings: Dict[str, Dict[int, float]] = {}
+        for position, event in enumerate(events):
+            for field, weight in self.FIELD_WEIGHTS.items():
+                for token in tokenize(event.get(field)):
+                    doc_scores = postings.setdefault(token, {})
+                    doc_scores[position] = doc_scores.get(position, 0.0) + weight
+
+        self._postings = postings
+        self._vocabulary = sorted(postings)
+        self._ranked_cache: "OrderedDict[Tuple[str, ...], List[int]]" = OrderedDict()
+        self._idf = {
+            token: math.log(1 + len(events) / len(doc_scores))
+            for token, doc_scores in postings.items()
+        }
+
+    def _matching_tokens(self, prefix: str) -> List[str]:
+        start = bisect_left(self._vocabulary, prefix)
+        end = bisect_left(self._vocabulary, prefix + "\uffff", lo=start)
+        return self._vocabulary[start:end]
+
+    def search(self, query: str, min_position: int = 0) -> List[int]:
+        """Positions of matching events, best match first.
+
+        Positions below min_position (events that have already started) are
+        skipped. Ties keep start-time order.
+        """
+        query_tokens = tuple(dict.fromkeys(tokenize(query)))
+        if not query_tokens:
+            return []
+
+        # Type-ahead sends the same prefixes over and over, so rankings are
+        # memoized for the lifetime of this index snapshot
+        ranked = self._ranked_cache.get(query_tokens)
+        if ranked is None:
+            ranked = self._rank(query_tokens)
+            self._ranked_cache[query_tokens] = ranked
+            if len(self._ranked_cache) > self.RANKED_CACHE_SIZE:
+                self._ranked_cache.popitem(last=False)
+        else:
+            self._ranked_cache.move_to_end(query_tokens)
+
+        if min_position <= 0:
+            return ranked
+        return [position for position in ranked if position >= min_position]
+
+    def _rank(self, query_tokens: Tuple[str, ...]) -> List[int]:
+        scores: Optional[Dict[int, float]] = None
+        for query_token in query_tokens:
+            token_scores: Dict[int, float] = {}
+            for token in self._matching_tokens(query_token):
+                factor = self._idf[token] * (1.0 if token == query_token else self.PREFIX_PENALTY)
+                for position, weight in self._postings[token].items():
+                    score = weight * factor
+                    if score > token_scores.get(position, 0.0):
+                        token_scores[position] = score
+
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {position: scores[position] + score
+                          for position, score in token_scores.items() if position in scores}
+            if not scores:
+                return []
+
+        return sorted(scores, key=lambda position: (-scores[position], position))
+
+# Duration buckets for the /live-events "duration" filter: (min seconds, max seconds)
+DURATION_BUCKETS = {
+    "short": (0, 3600),            # under an hour
+    "medium": (3600, 3 * 3600),    # one to three hours
+    "long": (3 * 3600, None),      # three hours or more
+}
+
+# Sort orders for /live-events; "relevance" only applies to searches
+SORT_ORDERS = {"start", "-start", "title", "-title", "duration", "-duration", "relevance"}
+
+def filter_events(events: List[Dict[str, Any]],
+                  start_after: Optional[datetime] = None,
+                  start_before: Optional[datetime] = None,
+                  duration: Optional[str] = None,
+                  min_sessions: Optional[int] = None,
+                  max_sessions: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Apply the /live-events filters, keeping the incoming order"""
+    after_ts = start_after.timestamp() if start_after else None
+    before_ts = start_before.timestamp() if start_before else None
+    bucket = DURATION_BUCKETS.get(duration) if duration else None
+
+    if after_ts is None and before_ts is None and bucket is None and min_sessions is None and max_sessions is None:
+        return events
+
+    filtered = []
+    for event in events:
+        start_ts = event["_start_ts"]
+        # A date range can't say anything about an undated event
+        if (after_ts is not None or before_ts is not None) and start_ts == math.inf:
+            continue
+        if after_ts is not None and start_ts < after_ts:
+            continue
+        if before_ts is not None and start_ts >= before_ts:
+            continue
+        if bucket is not None:
+            seconds = event["_duration_seconds"]
+            if seconds is None or seconds < bucket[0] or (bucket[1] is not None and seconds >= bucket[1]):
+                continue
+        if min_sessions is not None and event["sessionCount"] < min_sessions:
+            continue
+        if max_sessions is not None and event["sessionCount"] > max_sessions:
+            continue
+        filtered.append(event)
+    return filtered
+
+def sort_events(events: List[Dict[str, Any]], sort: str) -> List[Dict[str, Any]]:
+    """Reorder events; start and relevance orders are already how events arrive"""
+    if sort in ("start", "relevance"):
+        return events
+    if sort == "-start":
+        # Events without a start time stay last, as in start order
+        dated = [event for event in events if event["_start_ts"] != math.inf]
+        return dated[::-1] + [event for event in events if event["_start_ts"] == math.inf]
+
+    reverse = sort.startswith("-")
+    if sort.lstrip("-") == "title":
+        return sorted(events, key=lambda event: event["title"].lower(), reverse=reverse)
+
+    # Duration: events without a known duration always go last
+    known = [event for event in events if event["_duration_seconds"] is not None]
+    unknown = [event for event in events if event["_duration_seconds"] is None]
+    known.sort(key=lambda event: event["_duration_seconds"], reverse=reverse)
+    return known + unknown
+
+def query_fingerprint(**params: Any) -> str:
+    """Short hash of the query a cursor belongs to"""
+    payload = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+def encode_cursor(offset: int, fingerprint: str) -> str:
+    """Opaque cursor pointing at an offset within one specific query"""
+    payload = json.dumps({"o": offset, "q": fingerprint}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, fingerprint: str) -> int:
+    """Offset from a cursor; raises ValueError if it is malformed or from another query"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        offset = int(payload["o"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if payload.get("q") != fingerprint:
+        raise ValueError("Cursor does not match this query")
+    if offset < 0:
+        raise ValueError("Invalid cursor")
+    return offset
+
+def _round_ms(value: Optional[float]) -> Optional[float]:
+    return round(value, 3) if value is not None else None
+
+class LiveEventsStore:
+    """In-memory index of upcoming live events, refreshed in the background.
+
+    Events are normalized once per refresh and kept sorted by start time, so
+    serving a request is a bisect past already-started events plus a slice.
+    Requests never wait on the upstream API except for the very first load;
+    a stale index is served while a refresh runs (stale-while-revalidate).
+    """
+
+    def __init__(self, refresh_seconds: float = LIVE_EVENTS_REFRESH_SECONDS,
+                 stale_seconds: float = LIVE_EVENTS_STALE_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.stale_seconds = stale_seconds
+        self._events: List[Dict[str, Any]] = []
+        self._start_times: List[float] = []
+        self._search_index = EventSearchIndex([])
+        self._loaded_at: Optional[float] = None
+        self._refresh_lock: Optional[asyncio.Lock] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._refresher: Optional[asyncio.Task] = None
+
+        # Stats reported in /health
+        self.upstream_calls = 0
+        self.refresh_count = 0
+        self.refresh_errors = 0
+        self.last_error: Optional[str] = None
+        self.last_refresh_ms: Optional[float] = None
+        self.cold_latency_ms: Optional[float] = None
+        self.warm_latency_ms: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    @property
+    def age_seconds(self) -> Optional[float]:
+        if self._loaded_at is None:
+            return None
+        return time.monotonic() - self._loaded_at
+
+    async def refresh(self) -> None:
+        """Reload the index from upstream; concurrent callers share one refresh"""
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+
+        seen_refreshes = self.refresh_count
+        async with self._refresh_lock:
+            if self.refresh_count != seen_refreshes:
+                return  # Another caller refreshed while we waited for the lock
+            started = time.perf_counter()
+            try:
+                raw_items, calls = await fetch_upstream_events()
+            except Exception as e:
+                self.refresh_errors += 1
+                self.last_error = str(e)
+                logger.error("Error refreshing live events: %s", e)
+                raise
+            self.upstream_calls += calls
+
+            events = [event for event in map(normalize_event, raw_items) if event is not None]
+            events.sort(key=lambda event: event["_start_ts"])
+
+            start_times = [event["_start_ts"] for event in events]
+            search_index = EventSearchIndex(events)
+
+            # Swap everything in one step so readers never see it out of sync
+            self._events, self._start_times, self._search_index = events, start_times, search_index
+            self._loaded_at = time.monotonic()
+            self.refresh_count += 1
+            self.last_error = None
+            self.last_refresh_ms = (time.perf_counter() - started) * 1000
+            logger.info("Live events index refreshed: %d events in %.0fms", len(events), self.last_refresh_ms)
+
+    def _refresh_in_background(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._safe_refresh())
+
+    async def _safe_refresh(self) -> None:
+        try:
+            await self.refresh()
+        except Exception:
+            pass  # Already recorded in refresh(); keep serving the old index
+
+    async def get_upcoming(self, search: str = "") -> List[Dict[str, Any]]:
+        """Events that haven't started yet.
+
+        Ordered by start time, or by relevance when a search query is given.
+        """
+        started = time.perf_counter()
+        cold = not self.loaded
+        if cold:
+            await self.refresh()
+        elif self.age_seconds > self.stale_seconds:
+            self._refresh_in_background()
+
+        events, search_index = self._events, self._search_index
+        first_upcoming = bisect_right(self._start_times, time.time())
+        if search and search.strip():
+            events = [events[position] for position in search_index.search(search, min_position=first_upcoming)]
+        else:
+            events = events[first_upcoming:]
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if cold:
+            self.cold_latency_ms = elapsed_ms
+        else:
+            self.warm_latency_ms = elapsed_ms
+        return events
+
+    async def _run_refresher(self) -> None:
+        while True:
+            await self._safe_refresh()
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self) -> None:
+        """Start the periodic background refresh (call from the app lifespan)"""
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._run_refresher())
+
+    async def stop(self) -> None:
+        """Cancel the background refresh tasks"""
+        for task in (self._refresher, self._refresh_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._refresher = self._refresh_task = None
+        await close_http_client()
+
+    def stats(self) -> Dict[str, Any]:
+        age = self.age_seconds
+        return {
+            "events": len(self._events),
+            "index_age_seconds": round(age, 1) if age is not None else None,
+            "refresh_count": self.refresh_count,
+            "refresh_errors": self.refresh_errors,
+            "last_error": self.last_error,
+            "upstream_calls": self.upstream_calls,
+            "last_refresh_ms": _round_ms(self.last_refresh_ms),
+            "cold_latency_ms": _round_ms(self.cold_latency_ms),
+            "warm_latency_ms": _round_ms(self.warm_latency_ms),
+        }
+
+live_events_store = LiveEventsStore()
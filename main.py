@@ -1,6 +1,8 @@
 import os
 import sys
+import time
 import codecs
+import threading
 import boto3
 from botocore.exceptions import NoCredentialsError, ClientError
 
@@ -9,18 +11,23 @@ if sys.stdout.encoding != 'utf-8':
     sys.stdout = codecs.getwriter('utf-8')(sys.stdout.buffer, 'strict')
     
 from strands import Agent
-from strands.models import BedrockModel
-from strands_tools import http_request
-from strands.agent.conversation_manager import SummarizingConversationManager
+from strands.models import BedrockModel, CacheConfig
+from catalog import search_catalog
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request, BackgroundTasks
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from typing import Dict, Optional, Tuple
 import uvicorn
+from structured_logging import get_logger, request_id_var
+from metrics import AgentMetricsHooks
+from tracing import configure_tracing, remote_parent
+from conversation_managers import create_conversation_manager, SUMMARIZATION_MODE
 
 load_dotenv()
 
+logger = get_logger("main")
+
 API_BASE_URL = os.getenv("COURSE_API_BASE_URL", "https://api.example.com/v1/content/")
 ACCESS_TOKEN = os.getenv("COURSE_API_KEY")
 
@@ -30,7 +37,7 @@ def setup_aws_credentials():
     try:
         # Method 1: Try AWS profile (recommended for local development)
         if os.getenv("AWS_PROFILE"):
-            print(f"🔑 Using AWS Profile: {os.getenv('AWS_PROFILE')}")
+            logger.info("Using AWS profile: %s", os.getenv("AWS_PROFILE"))
             session = boto3.Session(profile_name=os.getenv("AWS_PROFILE"))
             return session
         
@@ -38,9 +45,9 @@ def setup_aws_credentials():
         elif os.getenv("AWS_ACCESS_KEY_ID") and os.getenv("AWS_SECRET_ACCESS_KEY"):
             # Check if using temporary session token (should be avoided)
             if os.getenv("AWS_SESSION_TOKEN"):
-                print("⚠️  WARNING: Using temporary session token. Consider using permanent credentials.")
+                logger.warning("Using temporary session token. Consider using permanent credentials.")
             else:
-                print("✅ Using permanent AWS credentials from environment variables")
+                logger.info("Using permanent AWS credentials from environment variables")
             
             session = boto3.Session(
                 aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
@@ -52,56 +59,105 @@ def setup_aws_credentials():
         
         # Method 3: Try default AWS credentials (from ~/.aws/)
         else:
-            print("🔍 Trying default AWS credentials...")
+            logger.info("Trying default AWS credentials")
             session = boto3.Session()
             # Test if credentials work
             sts = session.client('sts')
             identity = sts.get_caller_identity()
-            print(f"✅ Using default AWS credentials: {identity.get('Arn', 'Unknown')}")
+            logger.info("Using default AWS credentials: %s", identity.get("Arn", "Unknown"))
             return session
             
     except NoCredentialsError:
-        print("❌ No AWS credentials found!")
-        print("📋 Please set up permanent credentials:")
-        print("   1. Create IAM user with Bedrock permissions")
-        print("   2. Set AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY")
-        print("   3. Remove AWS_SESSION_TOKEN from .env")
+        logger.error("No AWS credentials found! Please set up permanent credentials: "
+                     "1. Create IAM user with Bedrock permissions "
+                     "2. Set AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY "
+                     "3. Remove AWS_SESSION_TOKEN from .env")
         raise
     except ClientError as e:
-        print(f"❌ AWS credentials error: {e}")
+        logger.error("AWS credentials error: %s", e)
         raise
 
-# Setup AWS session
-aws_session = setup_aws_credentials()
-
-# Create Bedrock model - optimized for speed
-bedrock_model = BedrockModel(
-    model_id="anthropic.claude-3-5-sonnet-20240620-v1:0",
-    temperature=0.3,  # Lower temperature for faster, more focused responses  # Limit response length for faster generation
-)
+# Resolved on first use: the default-credentials path makes a blocking STS
+# call, which shouldn't run at import time or more than once per process
+_aws_session: Optional[boto3.Session] = None
+_aws_session_lock = threading.Lock()
+
+def get_aws_session() -> boto3.Session:
+    """The process-wide AWS session, set up on first call"""
+    global _aws_session
+    if _aws_session is None:
+        with _aws_session_lock:
+            if _aws_session is None:
+                _aws_session = setup_aws_credentials()
+    return _aws_session
+
+BEDROCK_MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "anthropic.claude-3-5-sonnet-20240620-v1:0")
+
+# Bedrock prompt caching, per agent: "off", or a comma-separated list of the
+# checkpoints to place - "tools" (tool definitions) and "system" (system
+# prompt, which also covers the tools before it). PROMPT_CACHE_BOOKS etc.
+# override PROMPT_CACHE for one content type. Needs a model that supports
+# prompt caching on Bedrock (e.g. Claude 3.7 Sonnet or later).
+PROMPT_CACHE = os.getenv("PROMPT_CACHE", "off")
+# Cache entry lifetime, e.g. "5m" or "1h"; unset uses the Bedrock default
+PROMPT_CACHE_TTL = os.getenv("PROMPT_CACHE_TTL") or None
+PROMPT_CACHE_SECTIONS = ("tools", "system")
+
+def prompt_cache_for(content_type: str) -> Tuple[str, ...]:
+    """Prompt cache checkpoints configured for one content type's agent"""
+    value = os.getenv(f"PROMPT_CACHE_{content_type.upper().replace('-', '_')}", PROMPT_CACHE)
+    requested = {part.strip().lower() for part in value.split(",")} - {"", "off"}
+    unknown = requested - set(PROMPT_CACHE_SECTIONS)
+    if unknown:
+        logger.warning("Ignoring unknown prompt cache sections %s for %s", sorted(unknown), content_type)
+    return tuple(section for section in PROMPT_CACHE_SECTIONS if section in requested)
+
+def create_bedrock_model(cache_sections: Tuple[str, ...] = ()) -> BedrockModel:
+    """Bedrock model client, with prompt cache checkpoints on the given sections.
+
+    With any checkpoint on, Strands also marks the latest user message, so
+    the model calls of a tool loop reuse the conversation prefix as well.
+    """
+    cache_config = None
+    if cache_sections:
+        cache_config = CacheConfig(
+            strategy="anthropic",
+            ttl=PROMPT_CACHE_TTL,
+            system_prompt_ttl="system" in cache_sections,
+            tools_ttl="tools" in cache_sections,
+        )
+    return BedrockModel(
+        boto_session=get_aws_session(),
+        model_id=BEDROCK_MODEL_ID,
+        temperature=0.3,  # Lower temperature for faster, more focused responses
+        cache_config=cache_config,
+    )
+
+# One model client per prompt cache setting, shared by every agent using it
+# and built when the first such agent is
+bedrock_models: Dict[Tuple[str, ...], BedrockModel] = {}
+_bedrock_models_lock = threading.Lock()
+
+def bedrock_model_for(content_type: str) -> BedrockModel:
+    cache_sections = prompt_cache_for(content_type)
+    model = bedrock_models.get(cache_sections)
+    if model is None:
+        with _bedrock_models_lock:
+            model = bedrock_models.get(cache_sections)
+            if model is None:
+                model = bedrock_models[cache_sections] = create_bedrock_model(cache_sections)
+    return model
 
 agent_prompt = """You are an O'Reilly Learning Mentor & Assistant. Your role is to:
 1. Search the O'Reilly API for relevant learning resources
 2. Act as a learning mentor - provide guidance, roadmaps, and time estimates
 3. Answer follow-up questions about learning paths and skill development
 
-API CALL FORMAT:
-```
-{
-  "method": "GET",
-  "url": "https://api.oreilly.com/api/v1/integrations/content/?any_topic_slug=[topic]&limit=30&status=Live",
-  "headers": {
-    "Authorization": "Token [YOUR_OREILLY_TOKEN]",
-    "Accept": "application/json"
-  }
-}
-```
-
-SEARCH PARAMETERS:
-• any_topic_slug: Topic (e.g., "python", "react")
-• content_format: "course", "book", "video", "learning-path"
-• limit: 30 (fixed for fast results)
-• status: Live (required)
+SEARCH TOOL:
+Call search_catalog(topic, content_format, limit). Each result has title, format, level, duration, authors, description, cover (full image URL) and link.
+• topic: Topic (e.g., "python", "react")
+• content_format: "book", "video", "learning-path", or "" for all formats
+• limit: 10
 
 OUTPUT FORMAT (5-6 resources max):
 
@@ -110,7 +166,7 @@ OUTPUT FORMAT (5-6 resources max):
 ### {Title}
 **Type**: {Format} | **Level**: {Level} | **Duration**: {Time}
 **Description**: {1-2 sentences on key topics and learning outcomes}
-Cover: https://learning.oreilly.com{cover}/400w/
+Cover: {cover}
 **[View on O'Reilly →](link)**
 
 ---
@@ -149,22 +205,11 @@ books_agent_prompt = """You are an O'Reilly Books Specialist & Learning Mentor.
 2. Act as a reading mentor - provide reading roadmaps and time estimates
 3. Answer questions about learning paths through books
 
-API CALL FORMAT:
-```
-{
-  "method": "GET",
-  "url": "https://api.oreilly.com/api/v1/integrations/content/?any_topic_slug=[topic]&content_format=book&limit=30",
-  "headers": {
-    "Authorization": "Token [YOUR_OREILLY_TOKEN]",
-    "Accept": "application/json"
-  }
-}
-```
-
-SEARCH PARAMETERS:
-• any_topic_slug: Topic (e.g., "python", "react")
+SEARCH TOOL:
+Call search_catalog(topic, content_format, limit). Each result has title, format, level, duration, authors, description, cover (full image URL) and link.
+• topic: Topic (e.g., "python", "react")
 • content_format: "book" (REQUIRED - only show books)
-• limit: 30
+• limit: 12
 
 OUTPUT FORMAT:
 
@@ -174,7 +219,7 @@ OUTPUT FORMAT:
 **Type**: Book | **Level**: {Level} | **Pages**: {Page Count or Duration}
 **Author**: {Author Name(s)}
 **Description**: {1-2 sentences on what you'll learn}
-Cover: https://learning.oreilly.com{cover}/400w/
+Cover: {cover}
 **[Read on O'Reilly →](link)**
 
 ---
@@ -220,22 +265,11 @@ courses_agent_prompt = """You are an O'Reilly Courses Specialist & Learning Ment
 2. Act as a course mentor - provide course roadmaps and time estimates
 3. Answer questions about learning paths through video courses
 
-API CALL FORMAT:
-```
-{
-  "method": "GET",
-  "url": "https://api.oreilly.com/api/v1/integrations/content/?any_topic_slug=[topic]&content_format=video&limit=30",
-  "headers": {
-    "Authorization": "Token [YOUR_OREILLY_TOKEN]",
-    "Accept": "application/json"
-  }
-}
-```
-
-SEARCH PARAMETERS:
-• any_topic_slug: Topic (e.g., "python", "react")
+SEARCH TOOL:
+Call search_catalog(topic, content_format, limit). Each result has title, format, level, duration, authors, description, cover (full image URL) and link.
+• topic: Topic (e.g., "python", "react")
 • content_format: "video" (REQUIRED - courses are video format)
-• limit: 30
+• limit: 10
 
 OUTPUT FORMAT:
 
@@ -245,7 +279,7 @@ OUTPUT FORMAT:
 **Type**: Course | **Level**: {Level} | **Duration**: {Duration}
 **Instructor**: {Authors/Instructors}
 **Description**: {1-2 sentences on course objectives}
-Cover: https://learning.oreilly.com{cover}/400w/
+Cover: {cover}
 **[Start Course →](link)**
 
 ---
@@ -296,22 +330,11 @@ audiobooks_agent_prompt = """You are an O'Reilly Audiobooks Specialist & Learnin
 2. Act as a listening mentor - provide audiobook roadmaps and time estimates
 3. Answer questions about learning through audiobooks
 
-API CALL FORMAT:
-```
-{
-  "method": "GET",
-  "url": "https://api.oreilly.com/api/v1/integrations/content/?any_topic_slug=[topic]&content_format=video&limit=30",
-  "headers": {
-    "Authorization": "Token [YOUR_OREILLY_TOKEN]",
-    "Accept": "application/json"
-  }
-}
-```
-
-SEARCH PARAMETERS:
-• any_topic_slug: Topic (e.g., "python", "react")
+SEARCH TOOL:
+Call search_catalog(topic, content_format, limit). Each result has title, format, level, duration, authors, description, cover (full image URL) and link.
+• topic: Topic (e.g., "python", "react")
 • content_format: "video" (REQUIRED - courses are video format)
-• limit: 30
+• limit: 10
 
 OUTPUT FORMAT:
 
@@ -321,7 +344,7 @@ OUTPUT FORMAT:
 **Type**: Course | **Level**: {Level} | **Duration**: {Duration}
 **Instructor**: {Authors/Instructors}
 **Description**: {1-2 sentences on course objectives}
-Cover: https://learning.oreilly.com{cover}/400w/
+Cover: {cover}
 **[Start Course →](link)**
 
 ---
@@ -339,23 +362,11 @@ RULES:
 
 audiobooks_agent_prompt = """You are an O'Reilly Audiobooks Specialist. Search ONLY for audiobook content.
 
-API CALL FORMAT:
-```
-{
-  "method": "GET",
-  "url": "https://api.oreilly.com/api/v1/integrations/content/?any_topic_slug=[topic]&content_format=audiobook&limit=30&status=Live",
-  "headers": {
-    "Authorization": "Token [YOUR_OREILLY_TOKEN]",
-    "Accept": "application/json"
-  }
-}
-```
-
-SEARCH PARAMETERS:
-• any_topic_slug: Topic (e.g., "python", "react")
+SEARCH TOOL:
+Call search_catalog(topic, content_format, limit). Each result has title, format, level, duration, authors, description, cover (full image URL) and link.
+• topic: Topic (e.g., "python", "react")
 • content_format: "audiobook" (REQUIRED - only show audiobooks)
-• limit: 30
-• status: Live (required)
+• limit: 12
 
 OUTPUT FORMAT:
 
@@ -364,7 +375,7 @@ OUTPUT FORMAT:
 ### {Title}
 **Type**: Audiobook | **Duration**: {Duration} | **Level**: {Level}
 **Description**: {1-2 sentences on audiobook content}
-Cover: https://learning.oreilly.com{cover}/400w/
+Cover: {cover}
 **[Listen Now →](link)**
 
 ---
@@ -383,23 +394,11 @@ RULES:
 
 live_event_series_agent_prompt = """You are an O'Reilly Live Event Series Specialist. Search ONLY for live training events and series.
 
-API CALL FORMAT:
-```
-{
-  "method": "GET",
-  "url": "https://api.oreilly.com/api/v1/integrations/content/?any_topic_slug=[topic]&content_format=live-training&limit=30&status=Live",
-  "headers": {
-    "Authorization": "Token [YOUR_OREILLY_TOKEN]",
-    "Accept": "application/json"
-  }
-}
-```
-
-SEARCH PARAMETERS:
-• any_topic_slug: Topic (e.g., "python", "react")
+SEARCH TOOL:
+Call search_catalog(topic, content_format, limit). Each result has title, format, level, duration, authors, description, cover (full image URL) and link.
+• topic: Topic (e.g., "python", "react")
 • content_format: "live-training" (REQUIRED - only show live events)
-• limit: 30
-• status: Live (required)
+• limit: 10
 
 OUTPUT FORMAT:
 
@@ -409,7 +408,7 @@ OUTPUT FORMAT:
 **Type**: Live Training | **Duration**: {Duration} | **Level**: {Level}
 **Date**: {Event Date/Time}
 **Description**: {1-2 sentences on event content}
-Cover: https://learning.oreilly.com{cover}/400w/
+Cover: {cover}
 **[Register for Event →](link)**
 
 ---
@@ -441,104 +440,87 @@ Format stored memory entries as:
 - **Follow-up Topics Requested:**
 """
 
-# Create separate conversation managers for each agent
-general_summary = SummarizingConversationManager(
-    summarization_system_prompt=custom_Summarizer_prompt,
-)
-
-books_summary = SummarizingConversationManager(
-    summarization_system_prompt="""You are managing long-term memory for a books specialist. Track:
+# Summarization prompts for each agent's conversation manager
+books_summary_prompt = """You are managing long-term memory for a books specialist. Track:
 - Book titles, authors, and publishers discussed
 - User's reading preferences and skill level
 - Topics of interest for books
 - Previously recommended books
 - Book-specific learning goals and progress
-Keep memory focused on books and reading materials only.""",
-)
+Keep memory focused on books and reading materials only."""
 
-courses_summary = SummarizingConversationManager(
-    summarization_system_prompt="""You are managing long-term memory for a courses specialist. Track:
+courses_summary_prompt = """You are managing long-term memory for a courses specialist. Track:
 - Course titles and instructors discussed
 - User's learning style and pace preferences
 - Completed or in-progress courses
 - Desired skill levels and course durations
 - Course-specific goals and outcomes
-Keep memory focused on courses and structured learning only.""",
-)
+Keep memory focused on courses and structured learning only."""
 
-audiobooks_summary = SummarizingConversationManager(
-    summarization_system_prompt="""You are managing long-term memory for an audiobooks specialist. Track:
+audiobooks_summary_prompt = """You are managing long-term memory for an audiobooks specialist. Track:
 - Audiobook titles and narrators discussed
 - User's listening preferences and habits
 - Topics of interest for audio content
 - Previously recommended audiobooks
 - Audiobook-specific learning goals and progress
-Keep memory focused on audiobooks only.""",
-)
+Keep memory focused on audiobooks only."""
 
-live_event_series_summary = SummarizingConversationManager(
-    summarization_system_prompt="""You are managing long-term memory for a live event series specialist. Track:
+live_event_series_summary_prompt = """You are managing long-term memory for a live event series specialist. Track:
 - Live events and training sessions attended or interested in
 - User's schedule and time zone preferences
 - Interactive learning preferences
 - Instructors and presenters followed
 - Event-specific goals and networking interests
-Keep memory focused on live events and training series only.""",
-)
-
-
-# Create specialized agents for each content type
-writer_Agent = Agent(
-    model=bedrock_model,
-    conversation_manager=general_summary,
-    system_prompt=agent_prompt,
-    tools=[http_request],
-    callback_handler=None,
-)
-
-books_Agent = Agent(
-    model=bedrock_model,
-    conversation_manager=books_summary,
-    system_prompt=books_agent_prompt,
-    tools=[http_request],
-    callback_handler=None,
-)
-
-courses_Agent = Agent(
-    model=bedrock_model,
-    conversation_manager=courses_summary,
-    system_prompt=courses_agent_prompt,
-    tools=[http_request],
-    callback_handler=None,
-)
-
-audiobooks_Agent = Agent(
-    model=bedrock_model,
-    conversation_manager=audiobooks_summary,
-    system_prompt=audiobooks_agent_prompt,
-    tools=[http_request],
-    callback_handler=None,
-)
-
-live_event_series_Agent = Agent(
-    model=bedrock_model,
-    conversation_manager=live_event_series_summary,
-    system_prompt=live_event_series_agent_prompt,
-    tools=[http_request],
-    callback_handler=None,
-)
+Keep memory focused on live events and training series only."""
+
+# System and summarization prompts per content type. The model client, prompts
+# and tool specs are shared; only messages and the conversation manager are
+# created per agent, so sessions never share a message history.
+AGENT_PROFILES = {
+    'all': (agent_prompt, custom_Summarizer_prompt),
+    'books': (books_agent_prompt, books_summary_prompt),
+    'courses': (courses_agent_prompt, courses_summary_prompt),
+    'audiobooks': (audiobooks_agent_prompt, audiobooks_summary_prompt),
+    'live-event-series': (live_event_series_agent_prompt, live_event_series_summary_prompt),
+}
 
-# Agent routing function
-def get_agent_for_content_type(content_type: str):
-    """Route to the appropriate specialized agent based on content type"""
-    agents = {
-        'all': writer_Agent,
-        'books': books_Agent,
-        'courses': courses_Agent,
-        'audiobooks': audiobooks_Agent,
-        'live-event-series': live_event_series_Agent,
-    }
-    return agents.get(content_type, writer_Agent)  # Default to general agent
+AGENT_TOOLS = [search_catalog]
+
+def create_session_agent(content_type: str = 'all', messages=None, summarization_mode: str = SUMMARIZATION_MODE) -> Agent:
+    """Build a fresh agent for one session, with its own history and conversation manager.
+
+    Agents used for a single turn should pass summarization_mode='inline',
+    since a background summary would finish after the agent is gone.
+    """
+    if content_type not in AGENT_PROFILES:
+        content_type = 'all'  # Default to general agent
+    system_prompt, summary_prompt = AGENT_PROFILES[content_type]
+    return Agent(
+        model=bedrock_model_for(content_type),
+        conversation_manager=create_conversation_manager(summary_prompt, summarization_mode, content_type),
+        system_prompt=system_prompt,
+        tools=AGENT_TOOLS,
+        messages=messages,
+        callback_handler=None,
+        hooks=[AgentMetricsHooks()],
+    )
+
+def warm_up(content_types=tuple(AGENT_PROFILES)) -> None:
+    """Resolve AWS credentials and build the model clients ahead of the first request.
+
+    Also builds (and discards) one agent per content type so tool specs and
+    conversation managers are exercised once. Failures are logged, not
+    raised: the first request will retry and report them.
+    """
+    started = time.perf_counter()
+    try:
+        for content_type in content_types:
+            create_session_agent(content_type, summarization_mode='inline')
+    except Exception as e:
+        logger.warning("Agent warm-up failed: %s", e)
+        return
+    logger.info("Agents warmed up in %.2fs", time.perf_counter() - started,
+                extra={"content_types": list(content_types)})
 
 # Create FastAPI app
 app = FastAPI(title="O'Reilly Learning Assistant API")
@@ -570,7 +552,7 @@ async def chat_endpoint(request: ChatRequest):
     """API endpoint for the chat interface"""
     try:
         # Get the appropriate agent based on content type
-        agent = get_agent_for_content_type(request.contentType)
+        agent = create_session_agent(request.contentType, summarization_mode='inline')
         
         # Get response from specialized agent
         result = agent(request.message)
@@ -593,6 +575,7 @@ async def root():
 
 def main():
     """Run the O'Reilly ChatBot in API-only mode"""
+    writer_Agent = create_session_agent('all')
     while True:
         try:
             # Get user input without any decorative prompt
@@ -617,12 +600,83 @@ def main():
         except Exception as e:
             print(f"Error: {e}")
 
+def worker_main():
+    """Serve agent requests for api_server's worker pool over stdin/stdout.
+
+    Protocol: one JSON object per line in each direction. Requests are
+    {"id", "type": "chat", "message", "session_id", "content_type", "state",
+    "request_id", "trace_context"} or
+    {"id", "type": "ping"}; every request gets exactly one response with the
+    same id and either "ok": true plus "text", "tool_uses", "usage",
+    "stop_reason" and "state", or "ok": false plus "error". "state" is the
+    session's agent state (see agent_result.encode_state) before and after
+    the turn; the worker keeps nothing between requests.
+    A {"type": "ready"} line is sent once the model client is set up.
+    """
+    import json
+    from agent_result import agent_state, decode_state, encode_state, extract_agent_turn, messages_after, restore_agent
+
+    configure_tracing("edumentor-agent-worker")
+
+    # Keep the protocol stream to ourselves: anything else printed (agent
+    # output, credential messages) goes to stderr instead of corrupting frames
+    protocol_out = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8", buffering=1)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    def send(frame):
+        protocol_out.write(json.dumps(frame, ensure_ascii=False) + "\n")
+        protocol_out.flush()
+
+    # Set up credentials and the model client before reporting ready, so
+    # the first fallback turn doesn't pay for them
+    warm_up(("all",))
+    send({"type": "ready", "pid": os.getpid()})
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            # Log under the API request that sent this turn
+            request_id_var.set(request.get("request_id") or "-")
+            if request.get("type") == "ping":
+                send({"id": request_id, "ok": True})
+                continue
+
+            # Each request gets a fresh agent with the right prompt, holding only
+            # the state it was sent, so nothing leaks between sessions
+            agent = create_session_agent(request.get("content_type") or "all", summarization_mode="inline")
+            restore_agent(agent, decode_state(request["state"]) if request.get("state") else None)
+            last_message = agent.messages[-1] if agent.messages else None
+            # Spans join the trace of the API request that fell back to us
+            with remote_parent(request.get("trace_context")):
+                result = agent(request["message"])
+            turn = extract_agent_turn(result, messages_after(agent.messages, last_message))
+            send({
+                "id": request_id,
+                "ok": True,
+                "text": turn.text,
+                "tool_uses": turn.tool_uses,
+                "usage": turn.usage,
+                "stop_reason": turn.stop_reason,
+                "state": encode_state(agent_state(agent)),
+            })
+        except Exception as e:
+            send({"id": request_id, "ok": False, "error": str(e), "error_type": type(e).__name__})
+
 if __name__ == "__main__":
-    # Check if the script is run with --cli flag
+    # Check if the script is run with --cli or --worker flag
     import sys
     if len(sys.argv) > 1 and sys.argv[1] == "--cli":
         # Run in API mode (no UI messages)
         main()
+    elif len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        # Long-lived worker for api_server's agent worker pool
+        worker_main()
     else:
         # Run the FastAPI app
         print("🚀 Starting O'Reilly Learning Assistant API...")
@@ -0,0 +1,321 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from strands.hooks import (
+    HookProvider, HookRegistry,
+    BeforeModelCallEvent, AfterModelCallEvent, BeforeToolCallEvent, AfterToolCallEvent,
+)
+
+# Seconds; spans sub-millisecond cleaning up to multi-minute agent turns
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    """Monotonically increasing count, per label combination"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, per label combination"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe how long the with-block took, even if it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Holds every metric and renders them in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+CHAT_REQUEST_SECONDS = registry.histogram(
+    "edumentor_chat_request_seconds",
+    "End-to-end latency of chat requests until the last response byte, by endpoint and status class",
+    ("endpoint", "status"),
+)
+# Stages: agent_acquisition (waiting for the session lock and a free agent
+# slot), agent_setup (building/restoring the session agent), model (Bedrock
+# calls), tool (tool execution, including catalog HTTP) and clean (response cleaning)
+CHAT_STAGE_SECONDS = registry.histogram(
+    "edumentor_chat_stage_seconds",
+    "Time spent in each stage of an agent turn",
+    ("stage",),
+)
+TOOL_CALL_SECONDS = registry.histogram(
+    "edumentor_tool_call_seconds",
+    "Duration of agent tool calls, by tool and outcome",
+    ("tool", "status"),
+)
+UPSTREAM_REQUEST_SECONDS = registry.histogram(
+    "edumentor_upstream_request_seconds",
+    "Latency of HTTP requests to the O'Reilly APIs",
+    ("api",),
+)
+UPSTREAM_REQUESTS_TOTAL = registry.counter(
+    "edumentor_upstream_requests_total",
+    "HTTP requests sent to the O'Reilly APIs, by API and status code",
+    ("api", "status"),
+)
+CACHE_LOOKUPS_TOTAL = registry.counter(
+    "edumentor_cache_lookups_total",
+    "Cache lookups by cache and result (hit, similar_hit or miss)",
+    ("cache", "result"),
+)
+WORKER_FALLBACKS_TOTAL = registry.counter(
+    "edumentor_worker_fallbacks_total",
+    "Turns sent to the subprocess worker pool after the in-process agent failed",
+    ("status",),
+)
+SESSION_EVICTIONS_TOTAL = registry.counter(
+    "edumentor_session_evictions_total",
+    "Sessions removed by the inactivity cleanup or the memory budget, by reason (inactive, heartbeat or memory)",
+    ("reason",),
+)
+AGENT_TURNS_TOTAL = registry.counter(
+    "edumentor_agent_turns_total",
+    "Completed agent turns, by content type",
+    ("content_type",),
+)
+TOKENS_TOTAL = registry.counter(
+    "edumentor_tokens_total",
+    "Bedrock tokens used, by content type and token kind",
+    ("content_type", "kind"),
+)
+
+CONTEXT_TOKENS_SAVED_TOTAL = registry.counter(
+    "edumentor_context_tokens_saved_total",
+    "Estimated input tokens removed to keep agents within their context budget, by content type",
+    ("content_type",),
+)
+SESSION_RESTORE_SECONDS = registry.histogram(
+    "edumentor_session_restore_seconds",
+    "Time to load a session back into memory, by source (snapshot after a restart, or spill after eviction)",
+    ("source",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+# route: the canned intent answered without an agent (greeting, thanks,
+# goodbye or help), the content type a default-profile turn was sent to,
+# or "agent" when the turn ran as requested
+INTENT_ROUTES_TOTAL = registry.counter(
+    "edumentor_intent_routes_total",
+    "Chat messages by the route intent_router picked for them",
+    ("route",),
+)
+# mode: inline (inside a user's turn, on context overflow) or background
+# (after a turn, off the request path); status: success, error or discarded
+# (the conversation changed before a background summary could be swapped in)
+SUMMARIZATIONS_TOTAL = registry.counter(
+    "edumentor_summarizations_total",
+    "Conversation summarizations, by mode and outcome",
+    ("mode", "status"),
+)
+SUMMARY_SECONDS = registry.histogram(
+    "edumentor_summary_seconds",
+    "Time spent generating conversation summaries, by mode",
+    ("mode",),
+)
+SUMMARY_TOKENS_TOTAL = registry.counter(
+    "edumentor_summary_tokens_total",
+    "Bedrock tokens used to generate conversation summaries, by mode and token kind",
+    ("mode", "kind"),
+)
+
+def status_label(status_code: Optional[int]) -> str:
+    """Collapse HTTP status codes to 2xx/4xx/5xx, or 'error' if no response came back"""
+    return f"{status_code // 100}xx" if status_code else "error"
+
+class RequestLatencyMiddleware:
+    """ASGI middleware that observes CHAT_REQUEST_SECONDS for the given paths.
+
+    Timing stops when the last body chunk is sent, so streamed responses
+    count their full duration rather than time to first byte.
+    """
+
+    def __init__(self, app, paths: Sequence[str]):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = None
+        observed = False
+
+        def observe():
+            nonlocal observed
+            if not observed:
+                observed = True
+                CHAT_REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                             endpoint=scope["path"], status=status_label(status_code))
+
+        async def send_and_time(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                observe()
+
+        try:
+            await self.app(scope, receive, send_and_time)
+        finally:
+            # Client went away or the app raised before finishing the body
+            observe()
+
+class AgentMetricsHooks(HookProvider):
+    """Times an agent's Bedrock calls and tool calls into the stage histograms.
+
+    One instance per agent: an agent runs one turn at a time, so the model
+    start time can live on the instance.
+    """
+
+    def __init__(self):
+        self._model_started: Optional[float] = None
+        self._tool_started: Dict[str, float] = {}
+
+    def register_hooks(self, registry: HookRegistry, **kwargs) -> None:
+        registry.add_callback(BeforeModelCallEvent, self._before_model)
+        registry.add_callback(AfterModelCallEvent, self._after_model)
+        registry.add_callback(BeforeToolCallEvent, self._before_tool)
+        registry.add_callback(AfterToolCallEvent, self._after_tool)
+
+    def _before_model(self, event: BeforeModelCallEvent) -> None:
+        self._model_started = time.perf_counter()
+
+    def _after_model(self, event: AfterModelCallEvent) -> None:
+        if self._model_started is not None:
+            CHAT_STAGE_SECONDS.observe(time.perf_counter() - self._model_started, stage="model")
+            self._model_started = None
+
+    def _before_tool(self, event: BeforeToolCallEvent) -> None:
+        self._tool_started[event.tool_use["toolUseId"]] = time.perf_counter()
+
+    def _after_tool(self, event: AfterToolCallEvent) -> None:
+        started = self._tool_started.pop(event.tool_use["toolUseId"], None)
+        if started is None:
+            return
+        duration = time.perf_counter() - started
+        failed = event.exception is not None or (event.result or {}).get("status") == "error"
+        CHAT_STAGE_SECONDS.observe(duration, stage="tool")
+        TOOL_CALL_SECONDS.observe(duration, tool=event.tool_use.get("name", ""),
+                                  status="error" if failed else "success")
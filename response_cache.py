@@ -0,0 +1,223 @@
+import os
+import re
+import math
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from metrics import CACHE_LOOKUPS_TOTAL
+
+# Opt-in: cached answers skip the agent entirely, so they are only served for
+# first-turn queries that don't depend on earlier conversation
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").strip().lower() in ("1", "true", "yes")
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# Minimum trigram cosine similarity for a near-duplicate hit; 0 disables that tier
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.9"))
+
+_WORD_RE = re.compile(r"[a-z0-9+#]+")
+
+# Filler that doesn't change what the user is asking for. Topic words that
+# look generic ("learning" in "machine learning") must not be listed here.
+STOPWORDS = frozenset({
+    "a", "an", "the", "for", "of", "on", "in", "to", "and", "or", "with", "about",
+    "i", "im", "me", "my", "we", "you", "can", "could", "would", "please", "some", "any",
+    "want", "need", "like", "show", "find", "give", "get", "recommend", "suggest",
+    "learn", "looking", "search", "is", "are", "there", "what",
+})
+
+def _stem(word: str) -> str:
+    # Just enough to fold plurals: "books" -> "book", "courses" -> "course"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def normalize_query(message: str) -> str:
+    """Reduce a query to its content words, e.g. 'Python books for beginners' -> 'python book beginner'.
+
+    Word order is kept: "python for java developers" and "java for python
+    developers" ask for different things.
+    """
+    return " ".join(_stem(word) for word in _WORD_RE.findall(message.lower()) if word not in STOPWORDS)
+
+def same_word_order(words: List[str], other: List[str]) -> bool:
+    """True if two normalized queries differ at most in how words are spelled.
+
+    Words may differ position by position (typos, variants), but a word of
+    one query may not turn up elsewhere in the other: that is a reordering,
+    which trigram similarity alone barely notices.
+    """
+    if len(words) != len(other):
+        return False
+    return all(word == other_word or (word not in other and other_word not in words)
+               for word, other_word in zip(words, other))
+
+def trigram_vector(text: str) -> Dict[str, int]:
+    """Character trigram counts, padded so short words still contribute"""
+    padded = f"  {text} "
+    vector: Dict[str, int] = {}
+    for i in range(len(padded) - 2):
+        gram = padded[i:i + 3]
+        vector[gram] = vector.get(gram, 0) + 1
+    return vector
+
+class _CacheEntry:
+    __slots__ = ("key", "response", "expires_at", "latency", "vector", "norm", "size")
+
+    def __init__(self, key, response, expires_at, latency, vector, norm, size):
+        self.key = key
+        self.response = response
+        self.expires_at = expires_at
+        self.latency = latency
+        self.vector = vector
+        self.norm = norm
+        self.size = size
+
+class ResponseCache:
+    """LRU + TTL cache of agent answers to first-turn queries, bounded by entry
+    count and approximate memory.
+
+    Lookups try the exact normalized query first, then the closest cached
+    query for the same content type by trigram cosine similarity, found via
+    an inverted trigram index so only entries sharing trigrams are scored.
+    Near-duplicates must have the same words in the same order, give or
+    take spelling (see same_word_order).
+    """
+
+    def __init__(self, enabled: bool = RESPONSE_CACHE_ENABLED,
+                 max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+                 ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS,
+                 similarity: float = RESPONSE_CACHE_SIMILARITY):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self._entries: "OrderedDict[Tuple[str, str], _CacheEntry]" = OrderedDict()
+        # content_type -> trigram -> keys of entries containing it
+        self._gram_index: Dict[str, Dict[str, set]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        grams = self._gram_index.get(key[0], {})
+        for gram in entry.vector:
+            keys = grams.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del grams[gram]
+
+    def _closest(self, content_type: str, words: List[str], vector: Dict[str, int],
+                 norm: float) -> Optional[_CacheEntry]:
+        grams = self._gram_index.get(content_type)
+        if not grams or not norm:
+            return None
+        dots: Dict[Tuple[str, str], int] = {}
+        for gram, count in vector.items():
+            for key in grams.get(gram, ()):
+                dots[key] = dots.get(key, 0) + count * self._entries[key].vector[gram]
+        best, best_score = None, self.similarity
+        for key, dot in dots.items():
+            entry = self._entries[key]
+            score = dot / (norm * entry.norm)
+            if score >= best_score and same_word_order(words, key[1].split()):
+                best, best_score = entry, score
+        return best
+
+    def get(self, message: str, content_type: Optional[str]) -> Optional[str]:
+        """Return a cached answer for the query, or None"""
+        if not self.enabled:
+            return None
+        content_type = content_type or "all"
+        normalized = normalize_query(message)
+        if not normalized:
+            return None
+        key = (content_type, normalized)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            exact = entry is not None
+            if entry is None and self.similarity > 0:
+                vector = trigram_vector(normalized)
+                entry = self._closest(content_type, normalized.split(), vector,
+                                      math.sqrt(sum(c * c for c in vector.values())))
+            if entry is not None and entry.expires_at < now:
+                self._remove(entry.key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                CACHE_LOOKUPS_TOTAL.inc(cache="response", result="miss")
+                return None
+
+            self._entries.move_to_end(entry.key)
+            if exact:
+                self.exact_hits += 1
+            else:
+                self.similar_hits += 1
+            CACHE_LOOKUPS_TOTAL.inc(cache="response", result="hit" if exact else "similar_hit")
+            self.saved_seconds += entry.latency
+            return entry.response
+
+    def put(self, message: str, content_type: Optional[str], response: str, latency: float) -> None:
+        """Cache an answer along with how long the agent took to produce it"""
+        if not self.enabled or not response:
+            return
+        content_type = content_type or "all"
+        normalized = normalize_query(message)
+        if not normalized:
+            return
+        key = (content_type, normalized)
+        vector = trigram_vector(normalized)
+        # Rough footprint: the text plus per-trigram dict/index overhead
+        size = len(response.encode("utf-8")) + len(normalized) + 200 + 120 * len(vector)
+        if size > self.max_bytes:
+            return
+        entry = _CacheEntry(key, response, time.monotonic() + self.ttl_seconds, latency,
+                            vector, math.sqrt(sum(c * c for c in vector.values())), size)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += size
+            grams = self._gram_index.setdefault(content_type, {})
+            for gram in vector:
+                grams.setdefault(gram, set()).add(key)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._gram_index.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.exact_hits + self.similar_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "saved_seconds": round(self.saved_seconds, 2),
+        }
+
+response_cache = ResponseCache()
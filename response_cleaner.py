@@ -0,0 +1,186 @@
+import re
+from typing import List
+
+# AI thinking/meta-commentary lines stripped from responses
+META_COMMENTARY_PATTERNS = [
+    r"^Thank you for providing.*",
+    r"^I'll now (?:summarize|present|provide).*",
+    r"^Let me (?:summarize|present|provide).*",
+    r"^Here's (?:a summary|what I found).*search results.*",
+    r"^Based on (?:the|your) search results.*",
+]
+
+# Every pattern runs to the end of its line, so one alternation removes the
+# same lines as applying them one after another
+_META_COMMENTARY_RE = re.compile("|".join(META_COMMENTARY_PATTERNS), re.MULTILINE | re.IGNORECASE)
+# Literal openings of the patterns above; text without any of them can skip the regex
+_META_COMMENTARY_PREFIXES = ("thank you for providing", "i'll now ", "let me ", "here's ", "based on ")
+
+# JSON structure artifacts left when a whole message dict is stringified
+_LEADING_ARTIFACT_RES = [
+    re.compile(r"^'role'\s*:\s*'assistant'\s*,?\s*'?content'?\s*:\s*\[\s*\{\s*'text'\s*:\s*[\"']"),
+    re.compile(r"^\{\s*'content'\s*:\s*\[\s*\{\s*'text'\s*:\s*[\"']"),
+    re.compile(r"^\[\s*\{\s*'text'\s*:\s*[\"']"),
+]
+_TRAILING_ARTIFACT_RES = [
+    re.compile(r"[\"']\s*\}\s*\]\s*\}\s*$"),
+    re.compile(r"[\"']\s*\}\s*\]\s*$"),
+]
+# Raw lines that could open, or continue, a trailing artifact when streaming
+_ARTIFACT_OPENING_RE = re.compile(r"[\"'][\s}\]]*$")
+_ARTIFACT_CONTINUATION_RE = re.compile(r"[\s}\]]*")
+
+# Escaped characters, all handled in one pass: \n, \t, \" and \'
+_ESCAPE_RE = re.compile(r"\\([nt\"'])")
+_ESCAPES = {"n": "\n", "t": " ", '"': '"', "'": "'"}
+
+_EXCESS_BLANK_LINES_RE = re.compile(r"\n{4,}")
+
+def _unescape(text: str) -> str:
+    if "\\" not in text:
+        return text
+    return _ESCAPE_RE.sub(lambda m: _ESCAPES[m.group(1)], text)
+
+def _strip_leading_artifacts(text: str) -> str:
+    # Anchored at the start of the text, so these fail on the first character
+    for pattern in _LEADING_ARTIFACT_RES:
+        text = pattern.sub("", text, count=1)
+    return text
+
+def _strip_trailing_artifacts(text: str) -> str:
+    """Remove a trailing '}] / '}]} artifact without scanning the whole text.
+
+    A match is a quote followed only by whitespace, } and ], so it can only
+    start right before the text's trailing run of those characters.
+    """
+    for pattern in _TRAILING_ARTIFACT_RES:
+        head = text
+        while True:
+            trimmed = head.rstrip().rstrip("}]")
+            if trimmed == head:
+                break
+            head = trimmed
+        start = max(len(head) - 1, 0)
+        text = text[:start] + pattern.sub("", text[start:], count=1)
+    return text
+
+def clean_and_format_response(text):
+    """Clean and format the response for better UI presentation"""
+    if not text:
+        return ""
+
+    text = str(text)  # Ensure it's a string
+
+    # Remove AI thinking/meta-commentary lines
+    lowered = text.lower()
+    if any(prefix in lowered for prefix in _META_COMMENTARY_PREFIXES):
+        text = _META_COMMENTARY_RE.sub("", text)
+
+    # Only remove obvious JSON structure artifacts, but preserve content
+    text = _strip_leading_artifacts(text)
+    text = _strip_trailing_artifacts(text)
+
+    # Clean up escaped characters
+    text = _unescape(text)
+
+    # Trim trailing whitespace on every line (preserve formatting)
+    text = "\n".join([line.rstrip() for line in text.split("\n")])
+
+    # Remove excessive blank lines (more than 2 in a row)
+    if "\n\n\n\n" in text:
+        text = _EXCESS_BLANK_LINES_RE.sub("\n\n\n", text)
+
+    return text.strip()
+
+class StreamingResponseCleaner:
+    """Incremental counterpart of clean_and_format_response for streamed text.
+
+    Chunks are fed as they arrive and cleaned text is released a raw line at
+    a time, so every line-anchored pattern sees whole lines in the same order
+    as the batch cleaner. Blank lines are held back until more content
+    arrives, which keeps the output stripped and capped at two consecutive
+    blank lines without a second pass. A line ending in a quote is held
+    until later text shows it isn't the start of a trailing JSON artifact.
+    Leading artifacts are recognised on the first line, which is where
+    stringified messages put them.
+    """
+
+    def __init__(self):
+        self._line = ""         # raw text of the current, unfinished line
+        self._held: List[str] = []  # lines that may still be a trailing artifact
+        self._first_line = True
+        self._blank_lines = 0
+        self._emitted = False
+        self._parts: List[str] = []
+
+    def feed(self, chunk: str) -> str:
+        """Add a chunk of raw model text and return any newly cleaned text"""
+        if "\n" not in chunk:
+            self._line += chunk
+            return ""
+        *complete, self._line = (self._line + chunk).split("\n")
+        out = []
+        for line in complete:
+            line = self._prepare_line(line)
+            opening = _ARTIFACT_OPENING_RE.search(line)
+            if opening:
+                # '}] right after a held '}]} can go in the same strip, so keep both
+                if not (self._held and _ARTIFACT_CONTINUATION_RE.fullmatch(line, 0, opening.start())):
+                    out.append(self._release_held())
+                self._held.append(line)
+            elif self._held and _ARTIFACT_CONTINUATION_RE.fullmatch(line):
+                self._held.append(line)
+            else:
+                out.append(self._release_held())
+                out.append(self._emit_raw(line))
+        return "".join(out)
+
+    def finish(self) -> str:
+        """Flush the last line once the stream has ended"""
+        line, self._line = self._line, ""
+        tail = "\n".join(self._held + [self._prepare_line(line)])
+        self._held = []
+        return self._emit_raw(_strip_trailing_artifacts(tail))
+
+    def clean(self, text: str) -> str:
+        """Clean a complete response in one go"""
+        return self.feed(text) + self.finish()
+
+    @property
+    def text(self) -> str:
+        """Everything released so far"""
+        return "".join(self._parts)
+
+    def _prepare_line(self, line: str) -> str:
+        if _META_COMMENTARY_RE.match(line):
+            line = ""
+        if self._first_line:
+            self._first_line = False
+            line = _strip_leading_artifacts(line)
+        return line
+
+    def _release_held(self) -> str:
+        if not self._held:
+            return ""
+        held, self._held = self._held, []
+        return "".join([self._emit_raw(line) for line in held])
+
+    def _emit_raw(self, line: str) -> str:
+        # An escaped \n splits one raw line into several output lines
+        return "".join([self._emit_line(part) for part in _unescape(line).split("\n")])
+
+    def _emit_line(self, line: str) -> str:
+        line = line.rstrip()
+        if not line:
+            if self._emitted:
+                self._blank_lines += 1
+            return ""
+
+        if self._emitted:
+            out = "\n" * (1 + min(self._blank_lines, 2)) + line
+        else:
+            out = line.lstrip()
+        self._blank_lines = 0
+        self._emitted = True
+        self._parts.append(out)
+        return out
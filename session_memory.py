@@ -0,0 +1,73 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Memory all sessions together may hold in this process - chat history,
+# stored agent state and live agents' messages, measured as serialized bytes
+# (Python objects take a few times more). 0 disables the limit.
+SESSION_MEMORY_BUDGET_MB = float(os.getenv("SESSION_MEMORY_BUDGET_MB", "256"))
+
+class SessionMemoryManager:
+    """Per-session memory footprints in least-recently-used order.
+
+    Callers report a session's footprint after each turn with update(),
+    which marks it most recently used and returns the sessions to evict,
+    oldest first, to get back under the budget. The session being updated
+    is never returned: a single oversized session stays until it expires.
+    """
+
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        # session_id -> {part: bytes}, oldest first
+        self._footprints: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+        self._totals: Dict[str, int] = {}
+        self.total_bytes = 0
+        self.evictions = 0
+
+    def update(self, session_id: str, footprint: Dict[str, int]) -> List[str]:
+        with self._lock:
+            self._remove(session_id)
+            self._footprints[session_id] = footprint
+            self._totals[session_id] = sum(footprint.values())
+            self.total_bytes += self._totals[session_id]
+
+            evict = []
+            if self.budget_bytes > 0:
+                for candidate in list(self._footprints):
+                    if self.total_bytes <= self.budget_bytes:
+                        break
+                    if candidate != session_id:
+                        self._remove(candidate)
+                        evict.append(candidate)
+            self.evictions += len(evict)
+            return evict
+
+    def forget(self, session_id: str) -> None:
+        """Stop tracking a session, e.g. after it expired or was reset"""
+        with self._lock:
+            self._remove(session_id)
+
+    def _remove(self, session_id: str) -> None:
+        if self._footprints.pop(session_id, None) is not None:
+            self.total_bytes -= self._totals.pop(session_id)
+
+    def footprint(self, session_id: str) -> Optional[Dict[str, int]]:
+        footprint = self._footprints.get(session_id)
+        if footprint is None:
+            return None
+        return dict(footprint, total=sum(footprint.values()))
+
+    def stats(self, largest: int = 10) -> Dict[str, Any]:
+        with self._lock:
+            top = sorted(self._totals.items(), key=lambda item: item[1], reverse=True)[:largest]
+            return {
+                "budget_bytes": self.budget_bytes,
+                "total_bytes": self.total_bytes,
+                "sessions": len(self._footprints),
+                "evictions": self.evictions,
+                "largest_sessions": [{"session_id": session_id, "bytes": size} for session_id, size in top],
+            }
+
+session_memory = SessionMemoryManager(int(SESSION_MEMORY_BUDGET_MB * 1024 * 1024))
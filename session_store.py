@@ -0,0 +1,779 @@
+import os
+import sys
+import json
+import time
+import zlib
+import heapq
+import hashlib
+import sqlite3
+import threading
+from array import array
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from agent_result import decode_state, encode_state
+from structured_logging import get_logger
+from metrics import SESSION_RESTORE_SECONDS
+
+logger = get_logger("session_store")
+
+# "memory" keeps sessions in this process (single uvicorn worker only);
+# "sqlite" shares them between every worker/process pointed at the same file
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "memory").strip().lower()
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions.db"))
+SESSION_STORE_BUSY_TIMEOUT_MS = int(os.getenv("SESSION_STORE_BUSY_TIMEOUT_MS", "5000"))
+# Where the in-memory store writes sessions evicted for memory (see
+# session_memory.py); unset drops their history and agent state instead
+SESSION_SPILL_DIR = os.getenv("SESSION_SPILL_DIR", "")
+# SQLite file the in-memory store checkpoints every write to, so sessions
+# survive restarts; unset keeps them in memory only
+SESSION_SNAPSHOT_PATH = os.getenv("SESSION_SNAPSHOT_PATH", "")
+# The in-memory store keeps this many recent history messages as plain text
+# and zlib-compresses older ones that are long enough to shrink
+HISTORY_HOT_MESSAGES = int(os.getenv("HISTORY_HOT_MESSAGES", "4"))
+HISTORY_COMPRESS_MIN_CHARS = 256
+
+def expiry_reason(now: float, last_activity: Optional[float], last_heartbeat: Optional[float],
+                  activity_timeout: float, heartbeat_timeout: float) -> Optional[str]:
+    """Why a session should be cleaned up, or None if it is still live"""
+    reason = None
+    if last_activity is not None and now - last_activity > activity_timeout:
+        reason = f"inactive for {activity_timeout / 60:g} minutes"
+    if last_heartbeat is not None:
+        if now - last_heartbeat > heartbeat_timeout:
+            reason = f"no heartbeat for {heartbeat_timeout / 60:g} minutes"
+    elif last_activity is not None and now - last_activity > heartbeat_timeout:
+        # No heartbeat recorded but has activity - give it a grace period
+        reason = f"no heartbeat recorded and inactive for {heartbeat_timeout / 60:g} minutes"
+    return reason
+
+def next_version(current: int) -> int:
+    """Version for the next write of an agent's state.
+
+    Millisecond-based rather than a plain counter, so a session that is reset
+    and started again never reuses a version another process may still hold.
+    """
+    return max(current + 1, int(time.time() * 1000))
+
+class ExpiryHeap:
+    """Sessions ordered by last touch, so expiry only looks at the oldest.
+
+    A min-heap of (touched_at, session_id) with lazy deletion: touching a
+    session pushes a new entry and leaves the old one behind as stale, to be
+    skipped when it reaches the top. touch, remove and each expired session
+    cost O(log n). Not thread-safe; callers hold their own lock.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, str]] = []
+        self._touched: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._touched)
+
+    def touch(self, session_id: str, touched_at: float) -> None:
+        self._touched[session_id] = touched_at
+        heapq.heappush(self._heap, (touched_at, session_id))
+        # Frequent heartbeats leave many stale entries; rebuild once they dominate
+        if len(self._heap) > 2 * len(self._touched) + 64:
+            self._heap = [(touched, sid) for sid, touched in self._touched.items()]
+            heapq.heapify(self._heap)
+
+    def remove(self, session_id: str) -> None:
+        self._touched.pop(session_id, None)
+
+    def pop_older_than(self, cutoff: float) -> List[Tuple[str, float]]:
+        """Remove and return (session_id, touched_at) for sessions last touched before cutoff"""
+        popped = []
+        heap = self._heap
+        while heap and heap[0][0] < cutoff:
+            touched_at, session_id = heapq.heappop(heap)
+            if self._touched.get(session_id) == touched_at:
+                del self._touched[session_id]
+                popped.append((session_id, touched_at))
+        return popped
+
+# Role names by one-byte code, shared by every HistoryLog
+_ROLES: List[str] = ["user", "assistant"]
+_ROLE_CODES: Dict[str, int] = {role: code for code, role in enumerate(_ROLES)}
+
+def _role_code(role: str) -> int:
+    code = _ROLE_CODES.get(role)
+    if code is None:
+        code = _ROLE_CODES.setdefault(role, len(_ROLES))
+        if code == len(_ROLES):
+            _ROLES.append(sys.intern(role))
+    return code
+
+def _utf8_size(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+class HistoryLog:
+    """One session's chat history in compact form.
+
+    Roles are one byte each; bodies are str while recent and zlib-compressed
+    bytes once older than HISTORY_HOT_MESSAGES, if that makes them smaller.
+    Length and size are kept up to date, so reading them costs nothing.
+    """
+
+    __slots__ = ("_roles", "_bodies", "nbytes")
+
+    def __init__(self):
+        self._roles = array("B")
+        self._bodies: List[Any] = []
+        # UTF-8 bytes of plain bodies plus bytes of compressed ones
+        self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._bodies)
+
+    def append(self, role: str, content: str) -> None:
+        self._roles.append(_role_code(role))
+        self._bodies.append(content)
+        self.nbytes += _utf8_size(content)
+        cold = len(self._bodies) - 1 - HISTORY_HOT_MESSAGES
+        if cold >= 0:
+            body = self._bodies[cold]
+            if isinstance(body, str) and len(body) >= HISTORY_COMPRESS_MIN_CHARS:
+                encoded = body.encode("utf-8")
+                packed = zlib.compress(encoded)
+                if len(packed) < len(encoded):
+                    self._bodies[cold] = packed
+                    self.nbytes += len(packed) - len(encoded)
+
+    def pop(self) -> None:
+        self._roles.pop()
+        body = self._bodies.pop()
+        self.nbytes -= _utf8_size(body) if isinstance(body, str) else len(body)
+
+    def messages(self) -> List[Dict[str, str]]:
+        return [
+            {"role": _ROLES[code], "content": body if isinstance(body, str) else zlib.decompress(body).decode("utf-8")}
+            for code, body in zip(self._roles, self._bodies)
+        ]
+
+    @classmethod
+    def from_messages(cls, messages: List[Dict[str, str]]) -> "HistoryLog":
+        log = cls()
+        for message in messages:
+            log.append(message["role"], message["content"])
+        return log
+
+def _to_datetime(timestamp: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(timestamp) if timestamp is not None else None
+
+class SessionStore:
+    """Where per-session state lives: activity/heartbeat times, the chat
+    history shown to the client, and each agent's serialized message history.
+
+    Agent state is versioned per (session_id, agent_key) so a process can tell
+    whether the agent it holds in memory is still current or another process
+    has run a turn for the session since.
+    """
+
+    backend = "base"
+
+    def touch(self, session_id: str) -> datetime:
+        """Record activity and a heartbeat for the session, creating it if needed"""
+        raise NotImplementedError
+
+    def get_activity(self, session_id: str) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """Return (last_activity, last_heartbeat) for the session"""
+        raise NotImplementedError
+
+    def append_history(self, session_id: str, role: str, content: str) -> int:
+        """Add a chat message and return the new history length"""
+        raise NotImplementedError
+
+    def pop_history(self, session_id: str) -> None:
+        """Drop the most recent chat message, e.g. when its turn failed"""
+        raise NotImplementedError
+
+    def get_history(self, session_id: str) -> List[Dict[str, str]]:
+        raise NotImplementedError
+
+    def history_length(self, session_id: str) -> int:
+        raise NotImplementedError
+
+    def has_history(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    def has_heartbeat(self, session_id: str) -> bool:
+        return self.get_activity(session_id)[1] is not None
+
+    def get_agent_version(self, session_id: str, agent_key: str) -> int:
+        """Current version of the stored agent state, 0 if there is none"""
+        raise NotImplementedError
+
+    def load_agent_state(self, session_id: str, agent_key: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """Return (version, state) for the agent, or (0, None) if nothing is stored"""
+        raise NotImplementedError
+
+    def save_agent_state(self, session_id: str, agent_key: str, state: Dict[str, Any],
+                         expected_version: Optional[int] = None) -> int:
+        """Store agent state and return its new version.
+
+        If expected_version is given and the stored version moved on in the
+        meantime, another process ran a turn concurrently; the write still
+        wins, but the conflict is logged.
+        """
+        raise NotImplementedError
+
+    def delete_session(self, session_id: str) -> bool:
+        """Remove everything stored for the session; True if anything existed"""
+        raise NotImplementedError
+
+    def expired_sessions(self, activity_timeout: float, heartbeat_timeout: float) -> List[Tuple[str, str]]:
+        """Return (session_id, reason) for every session past its timeouts (in seconds)"""
+        raise NotImplementedError
+
+    def existing_sessions(self, session_ids: Iterable[str]) -> Set[str]:
+        """Those of session_ids the store still holds, e.g. not reaped or reset by another worker"""
+        raise NotImplementedError
+
+    def agent_state_sizes(self, session_id: str) -> Dict[str, int]:
+        """Serialized size of each stored agent state of the session, by agent key"""
+        raise NotImplementedError
+
+    def memory_footprint(self, session_id: str) -> Dict[str, int]:
+        """Bytes of the session's history and agent state held in this process's memory"""
+        return {}
+
+    def spill(self, session_id: str) -> bool:
+        """Move the session's history and agent state out of memory; True if any was freed"""
+        return False
+
+    def spill_drops_state(self) -> bool:
+        """True if spill() has nowhere to keep what it frees, so evicted sessions start over"""
+        return False
+
+    def session_ids(self) -> List[str]:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def _log_conflict(self, session_id: str, agent_key: str, expected: int, current: int) -> None:
+        logger.warning("Agent state for session %s (%s) moved from version %d to %d during the turn; "
+                       "overwriting with this turn's state", session_id, agent_key, expected, current)
+
+class InMemorySessionStore(SessionStore):
+    """Session state held in this process - fast, but invisible to other workers.
+
+    With a snapshot store, every write (including activity times) is also
+    committed to it before the call returns, so a crash loses nothing that
+    was acknowledged. After a restart the snapshot's sessions are only
+    indexed, with their saved activity times; each is loaded back into
+    memory when first used.
+    """
+
+    backend = "memory"
+
+    def __init__(self, spill_dir: str = SESSION_SPILL_DIR, snapshot: Optional["SQLiteSessionStore"] = None):
+        # Reentrant so reads of a spilled session can reload it inside a write
+        self._lock = threading.RLock()
+        self._activity: Dict[str, float] = {}
+        self._heartbeats: Dict[str, float] = {}
+        self._history: Dict[str, HistoryLog] = {}
+        # session_id -> agent_key -> (version, encoded state)
+        self._agent_states: Dict[str, Dict[str, Tuple[int, str]]] = {}
+        # touch() sets activity and heartbeat together, so one heap orders both
+        self._expiry = ExpiryHeap()
+        # session_id -> (spill file, history length) for sessions not in
+        # memory; the file is None for sessions held only by the snapshot
+        self.spill_dir = spill_dir
+        self._spilled: Dict[str, Tuple[Optional[str], int]] = {}
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+        self.snapshot = snapshot
+        if snapshot is not None:
+            self._index_snapshot()
+
+    def _index_snapshot(self) -> None:
+        started = time.perf_counter()
+        now = time.time()
+        for session_id, (history_length, last_activity, last_heartbeat) in self.snapshot.stored_sessions().items():
+            self._spilled[session_id] = (None, history_length)
+            # Expire on the saved schedule; sessions never touched start it now
+            last_activity = last_activity if last_activity is not None else now
+            self._activity[session_id] = last_activity
+            self._heartbeats[session_id] = last_heartbeat if last_heartbeat is not None else last_activity
+            self._expiry.touch(session_id, min(self._activity[session_id], self._heartbeats[session_id]))
+        logger.info("Indexed %d sessions from snapshot %s in %.1f ms", len(self._spilled),
+                    self.snapshot.path, (time.perf_counter() - started) * 1000)
+
+    def _checkpoint(self, method: str, *args: Any) -> None:
+        # Called under self._lock, so the snapshot sees writes in memory's order.
+        # Each is its own WAL commit, which survives the process dying right after.
+        if self.snapshot is not None:
+            try:
+                getattr(self.snapshot, method)(*args)
+            except sqlite3.Error as e:
+                logger.error("Session snapshot write %s for %s failed: %s", method, args[0], e)
+
+    def _spill_path(self, session_id: str) -> str:
+        name = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.spill_dir, f"{name}.json")
+
+    def _unspill(self, session_id: str) -> None:
+        """Load a spilled or snapshotted session back into memory before it is read or written"""
+        if session_id not in self._spilled:
+            return
+        with self._lock:
+            entry = self._spilled.pop(session_id, None)
+            if entry is None:
+                return
+            started = time.perf_counter()
+            path = entry[0]
+            source = "spill" if path else "snapshot"
+            try:
+                if path:
+                    with open(path, encoding="utf-8") as f:
+                        data = json.load(f)
+                    os.remove(path)
+                    history, agent_states = data["history"], data["agent_states"]
+                else:
+                    history, agent_states = self.snapshot.load_session(session_id)
+            except (OSError, ValueError, sqlite3.Error) as e:
+                logger.error("Could not reload session %s from %s: %s", session_id, path or source, e)
+                return
+            if history:
+                self._history[session_id] = HistoryLog.from_messages(history)
+            if agent_states:
+                self._agent_states[session_id] = {key: tuple(entry) for key, entry in agent_states.items()}
+            elapsed = time.perf_counter() - started
+            SESSION_RESTORE_SECONDS.observe(elapsed, source=source)
+            logger.debug("Reloaded session %s from %s in %.2f ms", session_id, source, elapsed * 1000,
+                         extra={"messages": len(history), "agent_states": len(agent_states)})
+
+    def touch(self, session_id: str) -> datetime:
+        now = time.time()
+        with self._lock:
+            self._activity[session_id] = now
+            self._heartbeats[session_id] = now
+            self._expiry.touch(session_id, now)
+            self._checkpoint("put_activity", session_id, now, now)
+        return datetime.fromtimestamp(now)
+
+    def get_activity(self, session_id: str) -> Tuple[Optional[datetime], Optional[datetime]]:
+        return _to_datetime(self._activity.get(session_id)), _to_datetime(self._heartbeats.get(session_id))
+
+    def append_history(self, session_id: str, role: str, content: str) -> int:
+        with self._lock:
+            self._unspill(session_id)
+            history = self._history.get(session_id)
+            if history is None:
+                history = self._history[session_id] = HistoryLog()
+            history.append(role, content)
+            self._checkpoint("append_history", session_id, role, content)
+            return len(history)
+
+    def pop_history(self, session_id: str) -> None:
+        with self._lock:
+            self._unspill(session_id)
+            history = self._history.get(session_id)
+            if history:
+                history.pop()
+                self._checkpoint("pop_history", session_id)
+
+    def get_history(self, session_id: str) -> List[Dict[str, str]]:
+        self._unspill(session_id)
+        history = self._history.get(session_id)
+        return history.messages() if history is not None else []
+
+    def history_length(self, session_id: str) -> int:
+        spilled = self._spilled.get(session_id)
+        if spilled is not None:
+            return spilled[1]
+        return len(self._history.get(session_id, ()))
+
+    def has_history(self, session_id: str) -> bool:
+        return self.history_length(session_id) > 0
+
+    def get_agent_version(self, session_id: str, agent_key: str) -> int:
+        self._unspill(session_id)
+        entry = self._agent_states.get(session_id, {}).get(agent_key)
+        return entry[0] if entry else 0
+
+    def load_agent_state(self, session_id: str, agent_key: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        self._unspill(session_id)
+        entry = self._agent_states.get(session_id, {}).get(agent_key)
+        if entry is None:
+            return 0, None
+        return entry[0], decode_state(entry[1])
+
+    def save_agent_state(self, session_id: str, agent_key: str, state: Dict[str, Any],
+                         expected_version: Optional[int] = None) -> int:
+        text = encode_state(state)
+        with self._lock:
+            current = self.get_agent_version(session_id, agent_key)
+            if expected_version is not None and current != expected_version:
+                self._log_conflict(session_id, agent_key, expected_version, current)
+            version = next_version(current)
+            self._agent_states.setdefault(session_id, {})[agent_key] = (version, text)
+            self._checkpoint("put_agent_state", session_id, agent_key, version, text)
+            return version
+
+    def delete_session(self, session_id: str) -> bool:
+        with self._lock:
+            existed = session_id in self._history or session_id in self._activity
+            spilled = self._spilled.pop(session_id, None)
+            if spilled is not None:
+                existed = True
+                if spilled[0]:
+                    try:
+                        os.remove(spilled[0])
+                    except OSError:
+                        pass
+            self._checkpoint("delete_session", session_id)
+            self._history.pop(session_id, None)
+            self._activity.pop(session_id, None)
+            self._heartbeats.pop(session_id, None)
+            self._expiry.remove(session_id)
+            if self._agent_states.pop(session_id, None):
+                existed = True
+            return existed
+
+    def expired_sessions(self, activity_timeout: float, heartbeat_timeout: float) -> List[Tuple[str, str]]:
+        """Sessions past their timeouts, oldest first.
+
+        Only sessions touched before the shorter timeout are looked at, and
+        they leave the expiry schedule: the caller is expected to delete them.
+        """
+        now = time.time()
+        expired = []
+        with self._lock:
+            candidates = self._expiry.pop_older_than(now - min(activity_timeout, heartbeat_timeout))
+            for session_id, touched_at in candidates:
+                reason = expiry_reason(now, self._activity.get(session_id), self._heartbeats.get(session_id),
+                                       activity_timeout, heartbeat_timeout)
+                if reason:
+                    expired.append((session_id, reason))
+                else:
+                    self._expiry.touch(session_id, touched_at)
+        return expired
+
+    def existing_sessions(self, session_ids: Iterable[str]) -> Set[str]:
+        with self._lock:
+            return {session_id for session_id in session_ids
+                    if session_id in self._activity or session_id in self._history or session_id in self._spilled}
+
+    def agent_state_sizes(self, session_id: str) -> Dict[str, int]:
+        self._unspill(session_id)
+        return {agent_key: _utf8_size(text) for agent_key, (_, text) in self._agent_states.get(session_id, {}).items()}
+
+    def memory_footprint(self, session_id: str) -> Dict[str, int]:
+        history = self._history.get(session_id)
+        return {
+            "history": history.nbytes if history is not None else 0,
+            "agent_state": sum(_utf8_size(text) for _, text in self._agent_states.get(session_id, {}).values()),
+        }
+
+    def spill_drops_state(self) -> bool:
+        return self.snapshot is None and not self.spill_dir
+
+    def spill(self, session_id: str) -> bool:
+        with self._lock:
+            history = self._history.get(session_id)
+            states = self._agent_states.get(session_id)
+            if not history and not states:
+                return False
+            if self.snapshot is not None:
+                # Everything is checkpointed already; it reloads from there
+                self._spilled[session_id] = (None, len(history or ()))
+            elif self.spill_dir:
+                path = self._spill_path(session_id)
+                try:
+                    with open(path, "w", encoding="utf-8") as f:
+                        json.dump({"history": history.messages() if history else [], "agent_states": states or {}},
+                              f, ensure_ascii=False)
+                except OSError as e:
+                    logger.error("Could not spill session %s to %s, keeping it in memory: %s", session_id, path, e)
+                    return False
+                self._spilled[session_id] = (path, len(history or ()))
+            else:
+                logger.warning("Dropping history and agent state of session %s to stay within the memory budget",
+                               session_id)
+            self._history.pop(session_id, None)
+            self._agent_states.pop(session_id, None)
+            return True
+
+    def session_ids(self) -> List[str]:
+        with self._lock:
+            return list(set(self._activity) | set(self._history) | set(self._spilled))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "sessions": len(self.session_ids()),
+            "heartbeats": len(self._heartbeats),
+            "histories": len(self._history),
+            "agent_states": sum(len(states) for states in self._agent_states.values()),
+            "spilled": len(self._spilled),
+            "snapshot": self.snapshot.path if self.snapshot is not None else None,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            # Spill files can't outlive the in-memory sessions they belong to;
+            # the snapshot is meant to
+            for path, _ in self._spilled.values():
+                if path:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            self._spilled.clear()
+            if self.snapshot is not None:
+                self.snapshot.close()
+
+class SQLiteSessionStore(SessionStore):
+    """Session state in a SQLite database in WAL mode, shared by every process
+    that opens the same file - run uvicorn with --workers N and any worker can
+    serve any session. Each thread gets its own connection.
+    """
+
+    backend = "sqlite"
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        last_activity REAL,
+        last_heartbeat REAL
+    );
+    CREATE INDEX IF NOT EXISTS sessions_last_activity ON sessions (last_activity);
+    CREATE INDEX IF NOT EXISTS sessions_last_heartbeat ON sessions (last_heartbeat);
+    CREATE TABLE IF NOT EXISTS history (
+        session_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        PRIMARY KEY (session_id, seq)
+    );
+    CREATE TABLE IF NOT EXISTS agent_state (
+        session_id TEXT NOT NULL,
+        agent_key TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        state TEXT NOT NULL,
+        PRIMARY KEY (session_id, agent_key)
+    );
+    """
+
+    def __init__(self, path: str = SESSION_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # executescript manages its own transaction
+        self._connect().executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; writes open explicit BEGIN IMMEDIATE transactions
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                                   timeout=SESSION_STORE_BUSY_TIMEOUT_MS / 1000)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={SESSION_STORE_BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        # Take the write lock up front so concurrent writers queue instead of deadlocking
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        return self._connect().execute(sql, params).fetchall()
+
+    def touch(self, session_id: str) -> datetime:
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO sessions (session_id, last_activity, last_heartbeat) VALUES (?, ?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET last_activity = excluded.last_activity, "
+                "last_heartbeat = excluded.last_heartbeat",
+                (session_id, now, now),
+            )
+        return datetime.fromtimestamp(now)
+
+    def get_activity(self, session_id: str) -> Tuple[Optional[datetime], Optional[datetime]]:
+        rows = self._query("SELECT last_activity, last_heartbeat FROM sessions WHERE session_id = ?", (session_id,))
+        if not rows:
+            return None, None
+        return _to_datetime(rows[0][0]), _to_datetime(rows[0][1])
+
+    def append_history(self, session_id: str, role: str, content: str) -> int:
+        with self._transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO sessions (session_id) VALUES (?)", (session_id,))
+            seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM history WHERE session_id = ?",
+                               (session_id,)).fetchone()[0]
+            conn.execute("INSERT INTO history (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+                         (session_id, seq, role, content))
+        return self.history_length(session_id)
+
+    def pop_history(self, session_id: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM history WHERE session_id = ? AND seq = "
+                         "(SELECT MAX(seq) FROM history WHERE session_id = ?)", (session_id, session_id))
+
+    def get_history(self, session_id: str) -> List[Dict[str, str]]:
+        rows = self._query("SELECT role, content FROM history WHERE session_id = ? ORDER BY seq", (session_id,))
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def history_length(self, session_id: str) -> int:
+        # seq runs 1..n without gaps (appends take MAX + 1, pops remove the MAX),
+        # so the primary key answers this without counting rows
+        return self._query("SELECT COALESCE(MAX(seq), 0) FROM history WHERE session_id = ?", (session_id,))[0][0]
+
+    def has_history(self, session_id: str) -> bool:
+        return self.history_length(session_id) > 0
+
+    def get_agent_version(self, session_id: str, agent_key: str) -> int:
+        rows = self._query("SELECT version FROM agent_state WHERE session_id = ? AND agent_key = ?",
+                           (session_id, agent_key))
+        return rows[0][0] if rows else 0
+
+    def load_agent_state(self, session_id: str, agent_key: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        rows = self._query("SELECT version, state FROM agent_state WHERE session_id = ? AND agent_key = ?",
+                           (session_id, agent_key))
+        if not rows:
+            return 0, None
+        return rows[0][0], decode_state(rows[0][1])
+
+    def save_agent_state(self, session_id: str, agent_key: str, state: Dict[str, Any],
+                         expected_version: Optional[int] = None) -> int:
+        text = encode_state(state)
+        with self._transaction() as conn:
+            row = conn.execute("SELECT version FROM agent_state WHERE session_id = ? AND agent_key = ?",
+                               (session_id, agent_key)).fetchone()
+            current = row[0] if row else 0
+            if expected_version is not None and current != expected_version:
+                self._log_conflict(session_id, agent_key, expected_version, current)
+            version = next_version(current)
+            conn.execute(
+                "INSERT INTO agent_state (session_id, agent_key, version, state) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (session_id, agent_key) DO UPDATE SET version = excluded.version, state = excluded.state",
+                (session_id, agent_key, version, text),
+            )
+        return version
+
+    def delete_session(self, session_id: str) -> bool:
+        with self._transaction() as conn:
+            deleted = 0
+            for table in ("sessions", "history", "agent_state"):
+                deleted += conn.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,)).rowcount
+        return deleted > 0
+
+    def expired_sessions(self, activity_timeout: float, heartbeat_timeout: float) -> List[Tuple[str, str]]:
+        now = time.time()
+        # Only rows past the shorter timeout can be expired, so let the indexes do the scan
+        cutoff = now - min(activity_timeout, heartbeat_timeout)
+        rows = self._query(
+            "SELECT session_id, last_activity, last_heartbeat FROM sessions "
+            "WHERE last_activity < ? OR last_heartbeat < ?",
+            (cutoff, cutoff),
+        )
+        expired = []
+        for session_id, last_activity, last_heartbeat in rows:
+            reason = expiry_reason(now, last_activity, last_heartbeat, activity_timeout, heartbeat_timeout)
+            if reason:
+                expired.append((session_id, reason))
+        return expired
+
+    def existing_sessions(self, session_ids: Iterable[str]) -> Set[str]:
+        session_ids = list(session_ids)
+        existing = set()
+        # Stay under SQLite's bound parameter limit
+        for start in range(0, len(session_ids), 500):
+            chunk = session_ids[start:start + 500]
+            rows = self._query(f"SELECT session_id FROM sessions WHERE session_id IN ({','.join('?' * len(chunk))})",
+                               tuple(chunk))
+            existing.update(row[0] for row in rows)
+        return existing
+
+    def agent_state_sizes(self, session_id: str) -> Dict[str, int]:
+        rows = self._query("SELECT agent_key, length(CAST(state AS BLOB)) FROM agent_state WHERE session_id = ?", (session_id,))
+        return dict(rows)
+
+    def put_agent_state(self, session_id: str, agent_key: str, version: int, text: str) -> None:
+        """Store already-encoded agent state at the given version, e.g. mirrored from another store"""
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO agent_state (session_id, agent_key, version, state) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (session_id, agent_key) DO UPDATE SET version = excluded.version, state = excluded.state",
+                (session_id, agent_key, version, text),
+            )
+
+    def put_activity(self, session_id: str, last_activity: float, last_heartbeat: float) -> None:
+        """Store activity times taken elsewhere, e.g. mirrored from another store"""
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO sessions (session_id, last_activity, last_heartbeat) VALUES (?, ?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET last_activity = excluded.last_activity, "
+                "last_heartbeat = excluded.last_heartbeat",
+                (session_id, last_activity, last_heartbeat),
+            )
+
+    def load_session(self, session_id: str) -> Tuple[List[Dict[str, str]], Dict[str, Tuple[int, str]]]:
+        """The session's history and (version, encoded state) per agent key"""
+        states = self._query("SELECT agent_key, version, state FROM agent_state WHERE session_id = ?", (session_id,))
+        return self.get_history(session_id), {agent_key: (version, text) for agent_key, version, text in states}
+
+    def stored_sessions(self) -> Dict[str, Tuple[int, Optional[float], Optional[float]]]:
+        """(history length, last activity, last heartbeat) of every session with anything stored"""
+        rows = self._query(
+            "SELECT ids.session_id, COALESCE(MAX(history.seq), 0), sessions.last_activity, sessions.last_heartbeat"
+            " FROM (SELECT session_id FROM sessions UNION SELECT session_id FROM history"
+            "       UNION SELECT session_id FROM agent_state) AS ids"
+            " LEFT JOIN sessions ON sessions.session_id = ids.session_id"
+            " LEFT JOIN history ON history.session_id = ids.session_id"
+            " GROUP BY ids.session_id"
+        )
+        return {session_id: (length, last_activity, last_heartbeat)
+                for session_id, length, last_activity, last_heartbeat in rows}
+
+    def session_ids(self) -> List[str]:
+        return [row[0] for row in self._query("SELECT session_id FROM sessions")]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "path": self.path,
+            "sessions": self._query("SELECT COUNT(*) FROM sessions")[0][0],
+            "heartbeats": self._query("SELECT COUNT(*) FROM sessions WHERE last_heartbeat IS NOT NULL")[0][0],
+            "histories": self._query("SELECT COUNT(DISTINCT session_id) FROM history")[0][0],
+            "agent_states": self._query("SELECT COUNT(*) FROM agent_state")[0][0],
+        }
+
+    def close(self) -> None:
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+def create_session_store(backend: str = SESSION_STORE_BACKEND) -> SessionStore:
+    """Build the session store selected by SESSION_STORE_BACKEND"""
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    if backend != "memory":
+        logger.warning("Unknown SESSION_STORE_BACKEND %r, using in-memory sessions", backend)
+    snapshot = SQLiteSessionStore(SESSION_SNAPSHOT_PATH) if SESSION_SNAPSHOT_PATH else None
+    return InMemorySessionStore(snapshot=snapshot)
+
+session_store = create_session_store()
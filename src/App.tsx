@@ -7,8 +7,8 @@ import LoginPage from './components/LoginPage';
 import LoadingSpinner from './components/LoadingSpinner';
 import Sidebar from './components/Sidebar';
 import LiveEventsView from './components/LiveEventsView';
-import { Message, ContentType } from './types';
-import { sendMessage } from './api';
+import { Message, ContentType, ApiResponse } from './types';
+import { sendMessage, streamMessage } from './api';
 import { useAuth } from './contexts/AuthContext';
 
 const gradientAnimation = keyframes`
@@ -520,9 +520,39 @@ function App() {
     }));
     setIsLoading(true);
 
+    // Replace the placeholder message in place as the stream progresses
+    const updateAssistantMessage = (changes: Partial<Message>) => {
+      setMessagesByType(prev => ({
+        ...prev,
+        [activeContentType]: prev[activeContentType].map(msg =>
+          msg.id === loadingMessage.id ? { ...msg, ...changes } : msg
+        )
+      }));
+    };
+
     try {
-      // Send message to API and get response
-      const response = await sendMessage(content, activeContentType);
+      // Stream the response, falling back to the regular endpoint if nothing arrived
+      let streamedText = '';
+      let response: ApiResponse;
+      try {
+        response = await streamMessage(content, activeContentType, {
+          onToolProgress: (progress) => {
+            if (!streamedText) {
+              updateAssistantMessage({ content: `${progress}...` });
+            }
+          },
+          onToken: (text) => {
+            streamedText += text;
+            updateAssistantMessage({ content: streamedText, isLoading: false, isStreamed: true });
+          }
+        });
+      } catch (streamError) {
+        if (streamedText) {
+          throw streamError;
+        }
+        console.warn('Streaming failed, falling back to /chat:', streamError);
+        response = await sendMessage(content, activeContentType);
+      }
 
       // Format the response - replace any cover links with markdown images
       let formattedMessage = response.message;
@@ -532,6 +562,7 @@ function App() {
         id: loadingMessage.id,
         role: 'assistant',
         content: formattedMessage,
+        isStreamed: Boolean(streamedText),
         timestamp: new Date()
       };
 
@@ -617,7 +648,7 @@ function App() {
                       message={message.content}
                       role={message.role}
                       isLatest={index === messages.length - 1}
-                      useTypewriter={enableTypewriter}
+                      useTypewriter={enableTypewriter && !message.isStreamed}
                       isLoading={message.isLoading}
                       typingSpeed={200}
                     />
@@ -162,6 +162,86 @@ export const sendMessage = async (message: string, contentType: ContentType = 'a
     }
 };
 
+export interface StreamHandlers {
+    onToken?: (text: string) => void;
+    onToolProgress?: (message: string) => void;
+}
+
+// Parse one server-sent event block into its event name and JSON payload
+const parseSseEvent = (block: string): { event: string; data: any } | null => {
+    let event = 'message';
+    const dataLines: string[] = [];
+    for (const line of block.split('\n')) {
+        if (line.startsWith('event:')) {
+            event = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trim());
+        }
+    }
+    if (dataLines.length === 0) {
+        return null;
+    }
+    return { event, data: JSON.parse(dataLines.join('\n')) };
+};
+
+// Stream a chat turn from /chat/stream, reporting tokens and tool progress as they arrive.
+// Resolves with the final response once the server sends the "done" event.
+export const streamMessage = async (
+    message: string,
+    contentType: ContentType = 'all',
+    handlers: StreamHandlers = {}
+): Promise<ApiResponse> => {
+    const response = await fetch(`${api.defaults.baseURL}/chat/stream`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream'
+        },
+        body: JSON.stringify({ message, sessionId: currentSessionId, contentType })
+    });
+
+    if (!response.ok || !response.body) {
+        throw new Error(`Streaming request failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    for (;;) {
+        const { done, value } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary = buffer.indexOf('\n\n');
+        while (boundary !== -1) {
+            const parsed = parseSseEvent(buffer.slice(0, boundary));
+            buffer = buffer.slice(boundary + 2);
+            boundary = buffer.indexOf('\n\n');
+
+            if (!parsed) {
+                continue;
+            }
+            if (parsed.event === 'token') {
+                handlers.onToken?.(parsed.data.text);
+            } else if (parsed.event === 'tool') {
+                handlers.onToolProgress?.(parsed.data.message);
+            } else if (parsed.event === 'done') {
+                if (parsed.data.sessionId) {
+                    currentSessionId = parsed.data.sessionId;
+                }
+                return parsed.data;
+            } else if (parsed.event === 'error') {
+                throw new Error(parsed.data.message);
+            }
+        }
+    }
+
+    throw new Error('Stream ended before the response was complete');
+};
+
 export const resetChat = async (): Promise<ApiResponse> => {
     try {
         if (!currentSessionId) {
@@ -1,13 +1,11 @@
 import { FC, useState, useEffect } from 'react';
 import styled from 'styled-components';
 
-const CACHE_KEY = 'live_events_cache';
-const CACHE_DURATION = 5 * 60 * 1000; // 5 minutes in milliseconds
+// Small pages keep payloads and render time down on mobile
+const PAGE_SIZE = 12;
 
-interface CacheData {
-    events: LiveEvent[];
-    timestamp: number;
-}
+type DurationFilter = '' | 'short' | 'medium' | 'long';
+type SortOrder = '' | 'start' | '-start' | 'title' | 'duration' | '-duration';
 
 interface LiveEvent {
     id: string;
@@ -16,7 +14,9 @@ interface LiveEvent {
     coverUrl: string;
     eventUrl: string;
     startDate?: string;
+    endDate?: string;
     duration?: string;
+    sessionCount?: number;
     instructor?: string;
     level?: string;
     status: 'upcoming' | 'ongoing' | 'on-demand';
@@ -29,8 +29,19 @@ interface PaginationInfo {
     total_events: number;
     has_next: boolean;
     has_prev: boolean;
+    next_cursor?: string | null;
+    prev_cursor?: string | null;
 }
 
+const EMPTY_PAGINATION: PaginationInfo = {
+    page: 1,
+    page_size: PAGE_SIZE,
+    total_pages: 0,
+    total_events: 0,
+    has_next: false,
+    has_prev: false
+};
+
 const EventsContainer = styled.div`
   flex: 1;
   overflow-y: auto;
@@ -160,6 +171,29 @@ const ClearButton = styled.button`
   }
 `;
 
+const FilterBar = styled.div`
+  display: flex;
+  gap: 12px;
+  margin: -1rem 0 2rem 0;
+  flex-wrap: wrap;
+`;
+
+const FilterSelect = styled.select`
+  padding: 10px 14px;
+  background: rgba(30, 41, 59, 0.8);
+  border: 1.5px solid rgba(148, 163, 184, 0.3);
+  border-radius: 8px;
+  color: #e2e8f0;
+  font-size: 14px;
+  cursor: pointer;
+  transition: all 0.2s ease;
+
+  &:focus {
+    outline: none;
+    border-color: rgba(59, 130, 246, 0.6);
+  }
+`;
+
 const EventsGrid = styled.div`
   display: grid;
   grid-template-columns: repeat(auto-fill, minmax(320px, 1fr));
@@ -358,13 +392,16 @@ const PaginationInfo = styled.span`
 `;
 
 const LiveEventsView: FC = () => {
-    const [allEvents, setAllEvents] = useState<LiveEvent[]>([]);  // Store all events
-    const [events, setEvents] = useState<LiveEvent[]>([]);  // Displayed events (filtered/paginated)
+    const [events, setEvents] = useState<LiveEvent[]>([]);  // Current page from the server
+    const [pagination, setPagination] = useState<PaginationInfo>(EMPTY_PAGINATION);
     const [isLoading, setIsLoading] = useState(true);
     const [searchQuery, setSearchQuery] = useState('');
     const [debouncedSearchQuery, setDebouncedSearchQuery] = useState('');
+    const [durationFilter, setDurationFilter] = useState<DurationFilter>('');
+    const [sortOrder, setSortOrder] = useState<SortOrder>('');
     const [currentPage, setCurrentPage] = useState(1);
-    const pageSize = 20;
+    // Set when paging with prev/next; takes precedence over the page number
+    const [cursor, setCursor] = useState<string | null>(null);
 
     // Debounce search query - only update after 300ms of no typing
     useEffect(() => {
@@ -375,129 +412,91 @@ const LiveEventsView: FC = () => {
         return () => clearTimeout(timer);
     }, [searchQuery]);
 
-    // Filter events based on debounced search query
-    const filteredEvents = allEvents.filter(event => {
-        if (!debouncedSearchQuery.trim()) return true;
-
-        const query = debouncedSearchQuery.toLowerCase();
-        const titleMatch = event.title.toLowerCase().includes(query);
-        const instructorMatch = event.instructor?.toLowerCase().includes(query);
-        const descriptionMatch = event.description?.toLowerCase().includes(query);
-
-        return titleMatch || instructorMatch || descriptionMatch;
-    });
-
-    // Calculate pagination for filtered events
-    const totalEvents = filteredEvents.length;
-    const totalPages = Math.max(1, Math.ceil(totalEvents / pageSize));
-    const startIdx = (currentPage - 1) * pageSize;
-    const endIdx = startIdx + pageSize;
-    const paginatedEvents = filteredEvents.slice(startIdx, endIdx);
-
-    const pagination: PaginationInfo = {
-        page: currentPage,
-        page_size: pageSize,
-        total_pages: totalPages,
-        total_events: totalEvents,
-        has_next: currentPage < totalPages,
-        has_prev: currentPage > 1
-    };
-
-    // Fetch all events once on component mount
+    // Fetch the current page whenever the query changes, and refresh it every 5 minutes
     useEffect(() => {
-        fetchAllEvents();
-
-        fetchAllEvents();
+        const controller = new AbortController();
+        fetchEvents(controller.signal);
 
-        // Auto-refresh every 5 minutes to keep events up to date
         const refreshInterval = setInterval(() => {
-            fetchAllEvents();
+            fetchEvents(controller.signal);
         }, 5 * 60 * 1000); // 5 minutes
 
-        return () => clearInterval(refreshInterval);
-    }, []);
-
-    // Update displayed events when filters or page changes
-    useEffect(() => {
-        setEvents(paginatedEvents);
-    }, [debouncedSearchQuery, currentPage, allEvents]);
-
-    const fetchAllEvents = async () => {
-        // Check cache first
-        const cached = localStorage.getItem(CACHE_KEY);
-        if (cached) {
-            try {
-                const cacheData: CacheData = JSON.parse(cached);
-                const cacheAge = Date.now() - cacheData.timestamp;
-
-                // Use cache if it's less than 5 minutes old
-                if (cacheAge < CACHE_DURATION) {
-                    console.log(`Using cached events (${Math.round(cacheAge / 1000)}s old)`);
-                    setAllEvents(cacheData.events);
-                    setIsLoading(false);
-                    return;
-                }
-            } catch (e) {
-                console.warn('Cache parse error:', e);
-                localStorage.removeItem(CACHE_KEY);
-            }
-        }
+        return () => {
+            controller.abort();
+            clearInterval(refreshInterval);
+        };
+    }, [debouncedSearchQuery, durationFilter, sortOrder, currentPage, cursor]);
 
-        // Fetch from API if no valid cache
+    const fetchEvents = async (signal?: AbortSignal) => {
         setIsLoading(true);
         try {
-            console.log('Fetching all live events from API...');
             const apiUrl = import.meta.env.VITE_API_BASE_URL || 'http://127.0.0.1:8000';
+            const params = new URLSearchParams({ page_size: String(PAGE_SIZE) });
+            if (debouncedSearchQuery.trim()) params.set('search', debouncedSearchQuery.trim());
+            if (durationFilter) params.set('duration', durationFilter);
+            if (sortOrder) params.set('sort', sortOrder);
+            if (cursor) {
+                params.set('cursor', cursor);
+            } else {
+                params.set('page', String(currentPage));
+            }
 
-            // Fetch all events at once (page_size=1000 to get everything)
-            const response = await fetch(`${apiUrl}/live-events?page=1&page_size=1000`);
+            const response = await fetch(`${apiUrl}/live-events?${params.toString()}`, { signal });
 
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
 
             const data = await response.json();
-            console.log('Live events response:', data);
 
             if (data.events && Array.isArray(data.events)) {
-                setAllEvents(data.events);
-
-                // Cache the events
-                const cacheData: CacheData = {
-                    events: data.events,
-                    timestamp: Date.now()
-                };
-                localStorage.setItem(CACHE_KEY, JSON.stringify(cacheData));
-
-                console.log(`Loaded and cached ${data.events.length} total live events`);
+                setEvents(data.events);
+                setPagination(data.pagination || EMPTY_PAGINATION);
             } else {
                 console.warn('No events found in response');
-                setAllEvents([]);
+                setEvents([]);
+                setPagination(EMPTY_PAGINATION);
             }
         } catch (error) {
+            if ((error as Error).name === 'AbortError') {
+                return;
+            }
             console.error('Failed to fetch live events:', error);
-            setAllEvents([]);
+            setEvents([]);
+            setPagination(EMPTY_PAGINATION);
         } finally {
-            setIsLoading(false);
+            if (!signal?.aborted) {
+                setIsLoading(false);
+            }
         }
     };
 
     const goToPage = (page: number) => {
-        if (page >= 1 && page <= totalPages) {
+        if (page >= 1 && page <= pagination.total_pages) {
+            setCursor(null);
             setCurrentPage(page);
         }
     };
 
+    const goToCursor = (nextCursor?: string | null) => {
+        if (nextCursor) {
+            setCursor(nextCursor);
+        }
+    };
+
+    // Any change to the query starts again from the first page
+    const resetPaging = () => {
+        setCursor(null);
+        setCurrentPage(1);
+    };
+
     const handleSearchChange = (value: string) => {
         setSearchQuery(value);
-        // Reset to page 1 when search changes
-        setCurrentPage(1);
+        resetPaging();
     };
 
     const refreshEvents = () => {
-        // Clear cache and force refresh
-        localStorage.removeItem(CACHE_KEY);
-        fetchAllEvents();
+        fetchEvents();
     };
 
     return (
@@ -534,6 +533,36 @@ const LiveEventsView: FC = () => {
                 )}
             </SearchContainer>
 
+            <FilterBar>
+                <FilterSelect
+                    value={durationFilter}
+                    onChange={(e) => {
+                        setDurationFilter(e.target.value as DurationFilter);
+                        resetPaging();
+                    }}
+                    aria-label="Filter by duration"
+                >
+                    <option value="">Any duration</option>
+                    <option value="short">Under 1 hour</option>
+                    <option value="medium">1-3 hours</option>
+                    <option value="long">3+ hours</option>
+                </FilterSelect>
+                <FilterSelect
+                    value={sortOrder}
+                    onChange={(e) => {
+                        setSortOrder(e.target.value as SortOrder);
+                        resetPaging();
+                    }}
+                    aria-label="Sort events"
+                >
+                    <option value="">{searchQuery ? 'Best match' : 'Soonest first'}</option>
+                    <option value="-start">Latest first</option>
+                    <option value="title">Title A-Z</option>
+                    <option value="duration">Shortest first</option>
+                    <option value="-duration">Longest first</option>
+                </FilterSelect>
+            </FilterBar>
+
             {isLoading ? (
                 <LoadingContainer>
                     <LoadingSpinner />
@@ -579,7 +608,7 @@ const LiveEventsView: FC = () => {
                 </EventsGrid>
             )}
 
-            {!isLoading && events.length > 0 && !searchQuery && pagination.total_pages > 1 && (
+            {!isLoading && events.length > 0 && pagination.total_pages > 1 && (
                 <PaginationContainer>
                     <PaginationButton
                         onClick={() => goToPage(1)}
@@ -588,7 +617,7 @@ const LiveEventsView: FC = () => {
                         «
                     </PaginationButton>
                     <PaginationButton
-                        onClick={() => goToPage(pagination.page - 1)}
+                        onClick={() => goToCursor(pagination.prev_cursor)}
                         disabled={!pagination.has_prev}
                     >
                         ‹
@@ -618,7 +647,7 @@ const LiveEventsView: FC = () => {
                     })}
 
                     <PaginationButton
-                        onClick={() => goToPage(pagination.page + 1)}
+                        onClick={() => goToCursor(pagination.next_cursor)}
                         disabled={!pagination.has_next}
                     >
                         ›
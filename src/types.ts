@@ -7,6 +7,7 @@ export interface Message {
     timestamp: Date;
     isError?: boolean;
     isLoading?: boolean;
+    isStreamed?: boolean;  // Rendered as tokens arrived, so no typewriter replay
     contentType?: ContentType;
 }
 
@@ -0,0 +1,38 @@
+"""The Strands internals conversation_managers.py relies on, in one place.
+
+None of these are part of the Strands public API. requirements.txt pins the
+release they were written against, and tests/test_strands_compat.py fails
+if an upgrade renames or reshapes any of them.
+"""
+from typing import Optional
+
+from strands.agent.conversation_manager import SummarizingConversationManager
+from strands.agent.conversation_manager.summarizing_conversation_manager import (
+    DEFAULT_SUMMARIZATION_PROMPT, as_user_summary,
+)
+from strands.event_loop.streaming import process_stream
+from strands.types.content import Message, _ensure_tracking_id
+
+__all__ = [
+    "DEFAULT_SUMMARIZATION_PROMPT", "as_user_summary", "process_stream", "stop_event",
+    "ensure_tracking_id", "adjust_split_point", "get_summary_message", "set_summary_message",
+]
+
+def stop_event(event) -> Optional[tuple]:
+    """(stop_reason, message, usage, metrics) from a process_stream event, or None"""
+    return event["stop"] if "stop" in event else None
+
+def ensure_tracking_id(message: Message) -> None:
+    """Give a summary the tracking id Strands adds to the messages it creates"""
+    _ensure_tracking_id(message)
+
+def adjust_split_point(manager: SummarizingConversationManager, messages, split_point: int) -> int:
+    """Move split_point so it doesn't separate a tool use from its result"""
+    return manager._adjust_split_point_for_tool_pairs(messages, split_point)
+
+def get_summary_message(manager: SummarizingConversationManager) -> Optional[Message]:
+    return manager._summary_message
+
+def set_summary_message(manager: SummarizingConversationManager, message: Message) -> None:
+    """Record message as the summary the manager saves and restores with the session"""
+    manager._summary_message = message
@@ -0,0 +1,137 @@
+import os
+import sys
+import json
+import uuid
+import random
+import logging
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+# DEBUG, INFO, WARNING, ERROR
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").strip().upper()
+# "json" for log shipping, "text" for reading locally
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").strip().lower()
+# Share of request/response payloads dumped at DEBUG level; 0 turns dumps off
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0"))
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "500"))
+
+ROOT_LOGGER = "edumentor"
+
+# Correlation ID of the request being handled, attached to every log record
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# LogRecord attributes that aren't caller-supplied fields
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any extra= fields as top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines, with extra= fields appended as key=value"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+_configured = False
+_configure_lock = threading.Lock()
+
+def configure_logging() -> None:
+    """Attach the stderr handler to the app's logger tree once"""
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler(sys.stderr)
+        handler.addFilter(RequestIdFilter())
+        handler.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+        root = logging.getLogger(ROOT_LOGGER)
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        # Keep our records out of uvicorn's/the root logger's handlers
+        root.propagate = False
+        _configured = True
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for one of our modules, e.g. get_logger("api") -> edumentor.api"""
+    configure_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+def log_payload(logger: logging.Logger, label: str, payload: Any, **fields: Any) -> None:
+    """Log a sampled, truncated request/response payload at DEBUG level.
+
+    Does nothing - not even stringifying the payload - unless DEBUG is
+    enabled and LOG_PAYLOAD_SAMPLE_RATE selects this call.
+    """
+    if LOG_PAYLOAD_SAMPLE_RATE <= 0 or not logger.isEnabledFor(logging.DEBUG):
+        return
+    if LOG_PAYLOAD_SAMPLE_RATE < 1 and random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    text = payload if isinstance(payload, str) else repr(payload)
+    logger.debug(label, extra=dict(fields, payload=text[:LOG_PAYLOAD_MAX_CHARS], payload_chars=len(text)))
+
+class CorrelationIdMiddleware:
+    """ASGI middleware that gives each HTTP request a correlation ID.
+
+    Uses the caller's X-Request-ID if present, makes it available to log
+    records through request_id_var and echoes it in the response headers.
+    """
+
+    def __init__(self, app, header: str = "x-request-id"):
+        self.app = app
+        self.header = header.encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id: Optional[str] = None
+        for name, value in scope.get("headers", ()):
+            if name == self.header:
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or new_request_id()
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ())) + [(self.header, request_id.encode("latin-1"))]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
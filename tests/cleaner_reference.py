@@ -0,0 +1,41 @@
+"""The response cleaner as it was before response_cleaner.py, minus its debug prints.
+
+Kept as the reference the current cleaner must match output for output.
+"""
+import re
+
+META_COMMENTARY_PATTERNS = [
+    r"^Thank you for providing.*",
+    r"^I'll now (?:summarize|present|provide).*",
+    r"^Let me (?:summarize|present|provide).*",
+    r"^Here's (?:a summary|what I found).*search results.*",
+    r"^Based on (?:the|your) search results.*",
+]
+
+def reference_clean(text):
+    if not text:
+        return ""
+
+    text = str(text)
+
+    for pattern in META_COMMENTARY_PATTERNS:
+        text = re.sub(pattern, "", text, flags=re.MULTILINE | re.IGNORECASE)
+
+    text = re.sub(r"^'role'\s*:\s*'assistant'\s*,?\s*'?content'?\s*:\s*\[\s*\{\s*'text'\s*:\s*[\"']", "", text)
+    text = re.sub(r"^\{\s*'content'\s*:\s*\[\s*\{\s*'text'\s*:\s*[\"']", "", text)
+    text = re.sub(r"^\[\s*\{\s*'text'\s*:\s*[\"']", "", text)
+
+    text = re.sub(r"[\"']\s*\}\s*\]\s*\}\s*$", "", text)
+    text = re.sub(r"[\"']\s*\}\s*\]\s*$", "", text)
+
+    text = re.sub(r'\\n', '\n', text)
+    text = re.sub(r'\\t', ' ', text)
+    text = re.sub(r'\\"', '"', text)
+    text = re.sub(r"\\'", "'", text)
+
+    lines = [line.rstrip() for line in text.split('\n')]
+    text = '\n'.join(lines)
+
+    text = re.sub(r'\n{4,}', '\n\n\n', text)
+
+    return text.strip()
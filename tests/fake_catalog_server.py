@@ -0,0 +1,73 @@
+"""A local stand-in for the O'Reilly content API, served over real HTTP."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+def make_item(title: str, **fields):
+    """One content API result, with the fields the API sends but the agents never see"""
+    item = {
+        "title": title,
+        "content_format": "book",
+        "content_level": "Beginner",
+        "virtual_pages": 320,
+        "authors": [{"name": "Ada Example"}],
+        "description": f"{title} covers the fundamentals.",
+        "cover": "/covers/urn:orm:book:1",
+        "web_url": f"/library/view/{title.lower().replace(' ', '-')}/",
+        "isbn": "9780000000000",
+        "publishers": ["O'Reilly Media"],
+        "popularity": 1234,
+    }
+    item.update(fields)
+    return item
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+class FakeCatalogServer:
+    """Serves results_by_topic[any_topic_slug], or status_code with no results when it's set"""
+
+    def __init__(self, results_by_topic, status_code: int = 200):
+        self.results_by_topic = results_by_topic
+        self.status_code = status_code
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/api/v1/integrations/content/"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+                with fake._lock:
+                    fake.requests.append((query, self.headers.get("Authorization")))
+                if fake.status_code == 200:
+                    body = {"results": fake.results_by_topic.get(query.get("any_topic_slug"), [])}
+                else:
+                    body = {"detail": "upstream error"}
+                payload = json.dumps(body).encode()
+                self.send_response(fake.status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
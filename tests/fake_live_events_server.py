@@ -0,0 +1,96 @@
+"""A local stand-in for the paginated live events API, served over real HTTP."""
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+def make_events(count: int, undated_every: int = 0):
+    """count upcoming API items; every undated_every-th one has no start time"""
+    start = datetime.now(timezone.utc) + timedelta(days=2)
+    items = []
+    for i in range(count):
+        item = {
+            "identifier": f"event-{i}",
+            "title": f"Live Event {i}",
+            "series_ourn": f"urn:orm:live-event-series:{i}",
+            "start_datetime": (start + timedelta(hours=i)).isoformat(),
+            "end_datetime": (start + timedelta(hours=i, minutes=90)).isoformat(),
+            "sessions": [{}],
+        }
+        if undated_every and i % undated_every == 0:
+            item["start_datetime"] = None
+        items.append(item)
+    return items
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for every concurrent page request without refused connections
+    request_queue_size = 64
+
+class FakeLiveEventsServer:
+    """Serves limit/offset pages of events, each after latency seconds.
+
+    The first fail_first requests get a 429, to exercise retries.
+    """
+
+    def __init__(self, events, latency: float = 0.0, fail_first: int = 0):
+        self.events = events
+        self.latency = latency
+        self.fail_first = fail_first
+        self.requests = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server = _Server(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/live-events/"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with fake._lock:
+                    fake.requests += 1
+                    failing = fake.requests <= fake.fail_first
+                    fake._in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake._in_flight)
+                try:
+                    time.sleep(fake.latency)
+                    query = parse_qs(urlparse(self.path).query)
+                    offset = int(query.get("offset", ["0"])[0])
+                    limit = int(query.get("limit", ["100"])[0])
+                    if failing:
+                        status, body = 429, {"detail": "slow down"}
+                    else:
+                        status, body = 200, {"count": len(fake.events),
+                                             "results": fake.events[offset:offset + limit]}
+                    payload = json.dumps(body).encode()
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    if failing:
+                        self.send_header("Retry-After", "0")
+                    self.end_headers()
+                    self.wfile.write(payload)
+                finally:
+                    with fake._lock:
+                        fake._in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
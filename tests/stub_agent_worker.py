@@ -0,0 +1,37 @@
+"""Speaks main.py's --worker protocol without building agents.
+
+Replies "<pid>: <message>" and appends the exchange to the state it was
+sent. "hang" never gets an answer; after "sick", pings report not ok.
+"""
+import json
+import os
+import sys
+import time
+
+def send(frame):
+    sys.stdout.write(json.dumps(frame) + "\n")
+    sys.stdout.flush()
+
+def main():
+    healthy = True
+    send({"type": "ready", "pid": os.getpid()})
+    for line in sys.stdin:
+        request = json.loads(line)
+        if request["type"] == "ping":
+            send({"id": request["id"], "ok": healthy})
+            continue
+        message = request["message"]
+        if message == "hang":
+            time.sleep(60)
+            continue
+        if message == "sick":
+            healthy = False
+        state = json.loads(request["state"]) if request.get("state") else {"messages": []}
+        text = f"{os.getpid()}: {message}"
+        state["messages"] += [{"role": "user", "content": [{"text": message}]},
+                              {"role": "assistant", "content": [{"text": text}]}]
+        send({"id": request["id"], "ok": True, "text": text, "tool_uses": [], "usage": {"totalTokens": 3},
+              "stop_reason": "end_turn", "state": json.dumps(state)})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+import pytest
+
+api_server = pytest.importorskip("api_server")
+
+@pytest.fixture(autouse=True)
+def short_queue(monkeypatch):
+    monkeypatch.setattr(api_server, "AGENT_QUEUE_TIMEOUT_SECONDS", 0.3)
+    # Semaphores bind to the event loop they're first used on
+    monkeypatch.setattr(api_server, "agent_slots", None)
+
+def slow_turn(seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+async def gather(*calls):
+    return await asyncio.gather(*(api_server.run_in_agent_pool(session_id, slow_turn, seconds)
+                                  for session_id, seconds in calls), return_exceptions=True)
+
+def test_same_session_waits_at_most_the_queue_timeout():
+    started = time.monotonic()
+    first, second, other = asyncio.run(gather(("pool-a", 1.0), ("pool-a", 0.1), ("pool-b", 0.1)))
+    assert first == 1.0 and other == 0.1
+    assert isinstance(second, api_server.AgentPoolBusyError)
+    assert time.monotonic() - started < 1.5
+    assert "pool-a" not in api_server.session_lock_users
+
+def test_same_session_calls_run_one_at_a_time():
+    async def scenario():
+        running = []
+
+        def turn():
+            running.append(1)
+            assert len(running) == 1
+            time.sleep(0.05)
+            running.pop()
+
+        await asyncio.gather(*(api_server.run_in_agent_pool("pool-c", turn) for _ in range(3)))
+
+    asyncio.run(scenario())
+
+def test_busy_workers_time_out(monkeypatch):
+    monkeypatch.setattr(api_server, "AGENT_MAX_WORKERS", 1)
+    first, second = asyncio.run(gather(("pool-d", 1.0), ("pool-e", 0.1)))
+    assert first == 1.0
+    assert isinstance(second, api_server.AgentPoolBusyError)
@@ -0,0 +1,105 @@
+import asyncio
+import os
+
+import pytest
+
+import agent_workers
+from agent_workers import AgentWorkerPool
+
+STUB_WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_agent_worker.py")
+
+@pytest.fixture(autouse=True)
+def stub_worker(monkeypatch):
+    monkeypatch.setattr(agent_workers, "WORKER_SCRIPT", STUB_WORKER)
+    # Failed startups retry after this long
+    monkeypatch.setattr(agent_workers, "AGENT_WORKER_HEALTHCHECK_SECONDS", 0.1)
+
+def run(scenario, **pool_options):
+    async def main():
+        pool = AgentWorkerPool(**pool_options)
+        pool.start()
+        try:
+            return await scenario(pool)
+        finally:
+            await pool.stop()
+    return asyncio.run(main())
+
+def pid_of(turn) -> int:
+    return int(turn.text.split(":")[0])
+
+async def wait_for(condition, timeout: float = 10.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out waiting"
+        await asyncio.sleep(0.05)
+
+def test_turn_continues_from_the_sent_state():
+    async def scenario(pool):
+        history = {"messages": [{"role": "user", "content": [{"text": "python books"}]},
+                                {"role": "assistant", "content": [{"text": "Here are three."}]}]}
+        turn, state = await pool.call("which first?", "s1", "books", history)
+        assert turn.text.endswith(": which first?") and turn.usage == {"totalTokens": 3}
+        assert [message["content"][0]["text"] for message in state["messages"]] == [
+            "python books", "Here are three.", "which first?", turn.text]
+
+    run(scenario, size=1)
+
+def test_worker_is_recycled_after_max_requests():
+    async def scenario(pool):
+        first = [pid_of((await pool.call(f"q{i}"))[0]) for i in range(2)]
+        third = pid_of((await pool.call("q2"))[0])
+        assert first[0] == first[1] != third
+        assert pool.recycled == 1 and pool.failures == 0
+
+    run(scenario, size=1, max_requests=2)
+
+def test_worker_that_times_out_is_replaced():
+    async def scenario(pool):
+        before = pid_of((await pool.call("hello"))[0])
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.call("hang", timeout=0.5)
+        assert pool.failures == 1
+        after = pid_of((await pool.call("hello again"))[0])
+        assert after != before
+
+    run(scenario, size=1)
+
+def test_supervisor_replaces_unhealthy_workers(monkeypatch):
+    monkeypatch.setattr(agent_workers, "AGENT_WORKER_HEALTHCHECK_SECONDS", 0.2)
+
+    async def scenario(pool):
+        await pool.call("sick")
+        await wait_for(lambda: pool.failures == 1 and pool.stats()["idle"] == 1)
+        crashed = pool._workers[0]
+        crashed.process.kill()
+        await wait_for(lambda: pool.failures == 2 and pool.stats()["idle"] == 1 and pool._workers[0] is not crashed)
+        # The healthy replacement keeps passing its pings
+        await asyncio.sleep(0.5)
+        assert pool.failures == 2
+        assert (await pool.call("still there"))[0].text.endswith(": still there")
+
+    run(scenario, size=1)
+
+def test_fallback_turns_keep_the_session_history(monkeypatch):
+    api_server = pytest.importorskip("api_server")
+    monkeypatch.setattr(api_server, "INTENT_ROUTER_ENABLED", False)
+    monkeypatch.setattr(api_server.response_cache, "enabled", False)
+
+    def direct_agent_fails(*args):
+        raise RuntimeError("Bedrock unavailable")
+
+    monkeypatch.setattr(api_server, "invoke_session_agent", direct_agent_fails)
+    session_id = "fallback-test"
+
+    async def scenario(pool):
+        monkeypatch.setattr(api_server, "agent_worker_pool", pool)
+        await api_server.get_chatbot_response("python books", session_id, "books")
+        await api_server.get_chatbot_response("which first?", session_id, "books")
+        _, state = api_server.session_store.load_agent_state(session_id, "books")
+        return [message["content"][0]["text"] for message in state["messages"]]
+
+    try:
+        texts = run(scenario, size=1)
+    finally:
+        api_server.session_store.delete_session(session_id)
+    assert texts[0] == "python books" and texts[2] == "which first?" and len(texts) == 4
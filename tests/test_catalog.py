@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+import catalog
+from catalog import TTLCache, search_catalog, trim_result
+from fake_catalog_server import FakeCatalogServer, make_item
+
+RESULTS = {
+    "python": [make_item(f"Python Book {i}") for i in range(12)],
+    "machine-learning": [make_item("Hands-On ML", content_format="video", duration_seconds=5400)],
+    "rust": [make_item("Rust in Action")],
+}
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Point the tool at a fake server with an empty cache: upstream(status_code=200)"""
+    monkeypatch.setenv("OREILLY_API_KEY", "test-key")
+    monkeypatch.setattr(catalog, "catalog_cache", TTLCache(max_entries=100, ttl_seconds=60))
+    monkeypatch.setattr(catalog, "upstream_calls", 0)
+    servers = []
+
+    def start(status_code=200):
+        server = FakeCatalogServer(RESULTS, status_code).__enter__()
+        servers.append(server)
+        monkeypatch.setattr(catalog, "CONTENT_API_URL", server.url)
+        return server
+
+    yield start
+    catalog.close_http_client()
+    for server in servers:
+        server.__exit__(None, None, None)
+
+def search(topic, content_format="", limit=10):
+    result = search_catalog(topic, content_format, limit)
+    assert result["status"] == "success", result
+    return json.loads(result["content"][0]["text"])
+
+def test_trim_result_keeps_only_rendered_fields():
+    trimmed = trim_result(make_item("Fluent Python", description="word " * 100, content_level=None))
+    assert trimmed == {
+        "title": "Fluent Python",
+        "format": "book",
+        "duration": "320 pages",
+        "authors": ["Ada Example"],
+        "description": trimmed["description"],
+        "cover": "https://learning.oreilly.com/covers/urn:orm:book:1/400w/",
+        "link": "https://learning.oreilly.com/library/view/fluent-python/",
+    }
+    assert len(trimmed["description"]) <= catalog.DESCRIPTION_MAX_CHARS + 3
+    assert trimmed["description"].endswith("word...")
+    assert trim_result(make_item("Course", duration_seconds=5400))["duration"] == "1h 30m"
+
+def test_search_sends_one_request_per_topic_and_format(upstream):
+    server = upstream()
+    assert [item["title"] for item in search("Python", limit=3)] == ["Python Book 0", "Python Book 1", "Python Book 2"]
+    # Same topic slug and format: different limits and spelling are served from the cache
+    assert len(search("python ", limit=10)) == 10
+    assert search("Machine Learning", "video")[0]["duration"] == "1h 30m"
+    search("machine learning", "VIDEO")
+    search("machine learning", "book")
+    # Unknown formats search everything, like an empty one
+    search("python", "pamphlet")
+
+    assert catalog.upstream_calls == len(server.requests) == 3
+    (first, auth), (second, _), (third, _) = server.requests
+    assert auth == "Token test-key"
+    assert first == {"any_topic_slug": "python", "limit": "30", "status": "Live"}
+    assert second["any_topic_slug"] == "machine-learning" and second["content_format"] == "video"
+    assert third["content_format"] == "book"
+
+def test_expired_entries_are_fetched_again(upstream, monkeypatch):
+    server = upstream()
+    monkeypatch.setattr(catalog, "catalog_cache", TTLCache(max_entries=100, ttl_seconds=0))
+    search("rust")
+    search("rust")
+    assert len(server.requests) == 2
+
+def test_least_recently_used_entry_is_evicted(upstream, monkeypatch):
+    server = upstream()
+    monkeypatch.setattr(catalog, "catalog_cache", TTLCache(max_entries=2, ttl_seconds=60))
+    for topic in ("python", "rust", "python", "machine learning"):
+        search(topic)
+    assert len(server.requests) == 3
+    search("python")
+    assert len(server.requests) == 3
+    search("rust")
+    assert len(server.requests) == 4
+
+@pytest.mark.parametrize("status_code", [429, 500, 503])
+def test_upstream_errors_are_reported_and_not_cached(upstream, status_code):
+    server = upstream(status_code)
+    result = search_catalog("python")
+    assert result["status"] == "error"
+    assert str(status_code) in result["content"][0]["text"]
+    search_catalog("python")
+    assert len(server.requests) == 2
+    assert len(catalog.catalog_cache) == 0
+
+def test_missing_api_key_is_an_error(upstream, monkeypatch):
+    server = upstream()
+    monkeypatch.delenv("OREILLY_API_KEY")
+    monkeypatch.delenv("COURSE_API_KEY", raising=False)
+    result = search_catalog("python")
+    assert result["status"] == "error" and "OREILLY_API_KEY" in result["content"][0]["text"]
+    assert not server.requests
@@ -0,0 +1,107 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pytest
+from strands import Agent
+
+from conversation_managers import BackgroundSummarizingConversationManager, ContextBudget, estimate_tokens
+from strands_compat import get_summary_message
+from test_strands_compat import FakeModel, text, tool_turn
+
+class GatedModel(FakeModel):
+    """FakeModel whose summaries wait until release() is called"""
+
+    def __init__(self, reply: str = "Summary of the chat."):
+        super().__init__(reply)
+        self.gate = threading.Event()
+
+    def release(self):
+        self.gate.set()
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        self.gate.wait(5)
+        async for event in super().stream(messages, tool_specs, system_prompt, **kwargs):
+            yield event
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        yield pool
+
+def conversation(turns: int, size: int = 10):
+    messages = []
+    for turn in range(turns):
+        messages.append(text("user", f"question {turn} " + "x" * size))
+        messages += tool_turn(f"t{turn}")
+        messages.append(text("assistant", f"answer {turn} " + "y" * size))
+    return messages
+
+def make_agent(manager, model):
+    agent = Agent(model=model, conversation_manager=manager, callback_handler=None)
+    agent.messages.extend(conversation(6))
+    return agent
+
+def finish(manager):
+    wait([manager._pending])
+
+def test_background_summary_replaces_the_summarized_messages(executor):
+    model = GatedModel()
+    manager = BackgroundSummarizingConversationManager(preserve_recent_messages=4, summarize_after_messages=8,
+                                                       executor=executor)
+    agent = make_agent(manager, model)
+    recent = agent.messages[-4:]
+
+    manager.apply_management(agent)
+    assert manager._pending is not None
+    # The turn doesn't wait: nothing changes until the summary is ready
+    assert not manager._swap_in_summary(agent)
+    assert len(agent.messages) == 24
+
+    model.release()
+    finish(manager)
+    assert manager._swap_in_summary(agent)
+    assert len(agent.messages) == 5
+    assert agent.messages[0] is get_summary_message(manager)
+    assert "Summary of the chat." in agent.messages[0]["content"][0]["text"]
+    assert all(current is kept for current, kept in zip(agent.messages[1:], recent))
+    assert manager.removed_message_count == 20
+    assert len(model.requests[0][0]) == 21  # the 20 summarized messages plus the request
+
+def test_stale_background_summary_is_dropped(executor):
+    model = GatedModel()
+    manager = BackgroundSummarizingConversationManager(preserve_recent_messages=4, summarize_after_messages=8,
+                                                       executor=executor)
+    agent = make_agent(manager, model)
+    manager.apply_management(agent)
+    # A restore in the meantime swaps in different message objects
+    agent.messages[:] = [dict(message) for message in agent.messages]
+    model.release()
+    finish(manager)
+
+    assert not manager._swap_in_summary(agent)
+    assert len(agent.messages) == 24
+    assert manager._pending is None and manager.removed_message_count == 0
+
+def test_over_budget_turn_trims_instead_of_waiting(executor):
+    model = GatedModel()
+    manager = BackgroundSummarizingConversationManager(preserve_recent_messages=4, summarize_after_messages=100,
+                                                       executor=executor)
+    agent = make_agent(manager, model)
+    agent.system_prompt = None
+    budget = estimate_tokens(agent.messages) // 2
+    manager.context_budget = ContextBudget(max_tokens=budget, keep_recent_turns=6)
+
+    # The summary is still blocked, so this only returns if the turn doesn't wait for it
+    manager._enforce_budget(agent)
+    assert manager._pending is not None and not manager._pending.done()
+    assert estimate_tokens(agent.messages) <= budget
+    assert agent.messages[0]["role"] == "user" and "toolResult" not in agent.messages[0]["content"][0]
+    trimmed = manager.removed_message_count
+    assert 0 < trimmed < 20 and len(agent.messages) == 24 - trimmed
+
+    # The summary covers the trimmed messages too and replaces what's left of them
+    model.release()
+    finish(manager)
+    assert manager._swap_in_summary(agent)
+    assert len(agent.messages) == 5
+    assert manager.removed_message_count == 20
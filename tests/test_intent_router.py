@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from intent_router import CANNED_REPLIES, IntentRouter, PhraseMatcher, tokenize
+
+@pytest.fixture
+def router():
+    return IntentRouter()
+
+def test_matcher_finds_overlapping_phrases():
+    matcher = PhraseMatcher([("audio book", "audiobooks"), ("book", "books"), ("book club", "club"),
+                             ("a b c", "abc"), ("b", "b")])
+    assert sorted(matcher.find(tokenize("an audio book club"))) == [
+        (1, 3, "audiobooks"), (2, 3, "books"), (2, 4, "club")]
+    # A failed longer phrase still reports the shorter one it contains
+    assert matcher.find(tokenize("a b d")) == [(1, 2, "b")]
+    assert sorted(matcher.find(tokenize("a b c"))) == [(0, 3, "abc"), (1, 2, "b")]
+
+def test_matcher_matches_whole_words_only():
+    matcher = PhraseMatcher([("hi", "greeting"), ("ty", "thanks")])
+    assert matcher.find(tokenize("high quality typescript")) == []
+    assert matcher.find(tokenize("Hi, there!")) == [(0, 1, "greeting")]
+    assert tokenize("Let's start-over") == ["lets", "start", "over"]
+
+@pytest.mark.parametrize("message, intent", [
+    ("hi", "greeting"),
+    ("Hello there!", "greeting"),
+    ("thanks for the help", "thanks"),
+    ("ok thank you so much", "thanks"),
+    ("hey, what can you do?", "help"),
+    ("thanks, bye", "thanks"),
+    ("thanks, let's start over", "reset"),
+    ("Reset please", "reset"),
+])
+def test_canned_intents_by_priority(router, message, intent):
+    route = router.classify(message)
+    assert route.name == intent
+    assert route.reply == CANNED_REPLIES[intent]
+
+@pytest.mark.parametrize("message", [
+    "hi, I want to learn python",
+    "thanks, now show me kubernetes courses",
+    "high performance python",
+    "how do I reset a git branch",
+    "hello " * 9,
+    "",
+])
+def test_real_questions_go_to_the_agent(router, message):
+    assert router.classify(message).reply is None
+
+@pytest.mark.parametrize("message, content_type", [
+    ("python books for beginners", "books"),
+    ("any audio books on leadership?", "audiobooks"),
+    ("show me courses instead", "courses"),
+    ("upcoming live events about AI", "live-event-series"),
+    ("books and courses on rust", None),
+    ("learn python", None),
+])
+def test_content_type_requests(router, message, content_type):
+    route = router.classify(message)
+    assert route.reply is None
+    assert route.content_type == content_type
+
+def test_counts(router):
+    router.record("greeting")
+    router.record("greeting")
+    router.record("books")
+    assert router.stats() == {"greeting": 2, "books": 1}
+
+def test_route_follows_the_latest_explicit_content_type(monkeypatch):
+    api_server = pytest.importorskip("api_server")
+    monkeypatch.setattr(api_server, "INTENT_ROUTER_ENABLED", True)
+    session_id = "route-test"
+
+    def routed(message):
+        return api_server.route_message(message, session_id)[1]
+
+    try:
+        assert routed("python books for beginners") == "books"
+        assert routed("which one is shortest?") == "books"
+        assert routed("show me courses instead") == "courses"
+        assert routed("books and courses on rust") == "courses"
+        assert routed("python books") == "books"
+    finally:
+        asyncio.run(api_server.reset_session(session_id))
+    assert routed("what should I learn next?") is None
+    asyncio.run(api_server.reset_session(session_id))
+
+def test_reset_clears_the_session(monkeypatch):
+    api_server = pytest.importorskip("api_server")
+    monkeypatch.setattr(api_server, "INTENT_ROUTER_ENABLED", True)
+    store = api_server.session_store
+    session_id = "reset-test"
+    store.append_history(session_id, "user", "python books")
+    store.append_history(session_id, "assistant", "Here are some books.")
+    store.save_agent_state(session_id, api_server.ROUTE_STATE_KEY, {"content_type": "books"})
+
+    turn = asyncio.run(api_server.get_chatbot_response("Let's start over", session_id))
+    assert turn.text == CANNED_REPLIES["reset"]
+    assert store.history_length(session_id) == 0
+    assert store.load_agent_state(session_id, api_server.ROUTE_STATE_KEY)[1] is None
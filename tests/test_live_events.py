@@ -0,0 +1,79 @@
+import asyncio
+import math
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import live_events
+from fake_live_events_server import FakeLiveEventsServer, make_events
+from live_events import LiveEventsStore, filter_events, normalize_event, public_event, sort_events
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Point the fetcher at a fake server: upstream(events, **server_options)"""
+    monkeypatch.setenv("OREILLY_API_KEY", "test-key")
+    servers = []
+
+    def start(events, **options):
+        server = FakeLiveEventsServer(events, **options).__enter__()
+        servers.append(server)
+        monkeypatch.setattr(live_events, "LIVE_EVENTS_API_URL", server.url)
+        return server
+
+    yield start
+    for server in servers:
+        server.__exit__(None, None, None)
+
+def fetch():
+    async def run():
+        try:
+            return await live_events.fetch_upstream_events()
+        finally:
+            await live_events.close_http_client()
+    return asyncio.run(run())
+
+def test_fetches_every_page_concurrently(upstream, monkeypatch):
+    monkeypatch.setattr(live_events, "LIVE_EVENTS_FETCH_CONCURRENCY", 4)
+    server = upstream(make_events(950), latency=0.02)
+    items, calls = fetch()
+    assert [item["identifier"] for item in items] == [f"event-{i}" for i in range(950)]
+    assert calls == 10
+    assert 1 < server.max_in_flight <= 4
+
+def test_caps_events(upstream, monkeypatch):
+    monkeypatch.setattr(live_events, "LIVE_EVENTS_MAX_EVENTS", 250)
+    server = upstream(make_events(1000))
+    items, calls = fetch()
+    assert len(items) == 250
+    assert calls == server.requests == 3
+
+def test_retries_rate_limited_pages(upstream):
+    upstream(make_events(150), fail_first=2)
+    items, calls = fetch()
+    assert len(items) == 150
+    assert calls == 4
+
+def test_undated_events_are_kept_and_sort_last():
+    event = normalize_event({"identifier": "tbd", "title": "Date TBD", "start_datetime": None,
+                             "end_datetime": "2030-01-01T10:00:00Z"})
+    assert event["_start_ts"] == math.inf
+    assert event["startDate"] is None and event["duration"] == "Multiple sessions"
+    assert "_start_ts" not in public_event(event)
+    assert normalize_event({"identifier": "bad", "start_datetime": "not a date"}) is None
+
+def test_store_serves_undated_events_last(upstream):
+    upstream(make_events(30, undated_every=10))
+    store = LiveEventsStore()
+
+    async def upcoming():
+        await store.refresh()
+        return await store.get_upcoming()
+
+    events = asyncio.run(upcoming())
+    assert len(events) == 30
+    assert [event["id"] for event in events[-3:]] == ["event-0", "event-10", "event-20"]
+    assert [event["id"] for event in sort_events(events, "-start")[-3:]] == ["event-0", "event-10", "event-20"]
+    assert sort_events(events, "-start")[0]["id"] == "event-29"
+
+    tomorrow = datetime.now(timezone.utc) + timedelta(days=1)
+    assert all(event["startDate"] for event in filter_events(events, start_after=tomorrow))
@@ -0,0 +1,39 @@
+"""Live events refresh time against a local fake paginated server.
+
+Each page takes PAGE_LATENCY seconds to serve. Concurrency 1 fetches the
+pages one after another, like the old next-page loop; the default setting
+overlaps them. Run with: python -m pytest tests/test_live_events_benchmark.py
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import live_events
+from fake_live_events_server import FakeLiveEventsServer, make_events
+
+PAGE_LATENCY = 0.05
+EVENTS = 1000
+
+@pytest.fixture(scope="module")
+def server():
+    with FakeLiveEventsServer(make_events(EVENTS), latency=PAGE_LATENCY) as fake:
+        yield fake
+
+def refresh() -> int:
+    async def run():
+        try:
+            items, _ = await live_events.fetch_upstream_events()
+        finally:
+            await live_events.close_http_client()
+        return len(items)
+    return asyncio.run(run())
+
+@pytest.mark.parametrize("concurrency", [1, live_events.LIVE_EVENTS_FETCH_CONCURRENCY, 10])
+def test_fetch_upstream_events(benchmark, server, monkeypatch, concurrency):
+    monkeypatch.setenv("OREILLY_API_KEY", "test-key")
+    monkeypatch.setattr(live_events, "LIVE_EVENTS_API_URL", server.url)
+    monkeypatch.setattr(live_events, "LIVE_EVENTS_FETCH_CONCURRENCY", concurrency)
+    benchmark.group = f"{EVENTS} events, {PAGE_LATENCY * 1000:.0f}ms per page"
+    assert benchmark.pedantic(refresh, rounds=5) == EVENTS
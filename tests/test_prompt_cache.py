@@ -0,0 +1,86 @@
+"""Prompt caching against a stubbed Bedrock runtime client."""
+from types import SimpleNamespace
+
+import pytest
+
+import main
+from metrics import TOKENS_TOTAL
+
+USAGE = {"inputTokens": 30, "outputTokens": 12, "totalTokens": 1542,
+         "cacheReadInputTokens": 1200, "cacheWriteInputTokens": 300}
+
+class FakeBedrockClient:
+    """Answers every converse_stream call with a short text reply and USAGE"""
+
+    def __init__(self):
+        self.requests = []
+        self.meta = SimpleNamespace(region_name="us-east-1")
+
+    def converse_stream(self, **request):
+        self.requests.append(request)
+        return {"stream": iter([
+            {"messageStart": {"role": "assistant"}},
+            {"contentBlockDelta": {"contentBlockIndex": 0, "delta": {"text": "## Python Books\n\nFluent Python"}}},
+            {"contentBlockStop": {"contentBlockIndex": 0}},
+            {"messageStop": {"stopReason": "end_turn"}},
+            {"metadata": {"usage": dict(USAGE), "metrics": {"latencyMs": 5}}},
+        ])}
+
+class FakeSession:
+    region_name = "us-east-1"
+
+    def __init__(self):
+        self.client_instance = FakeBedrockClient()
+
+    def client(self, service_name, **kwargs):
+        assert service_name == "bedrock-runtime"
+        return self.client_instance
+
+@pytest.fixture
+def bedrock(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(main, "get_aws_session", lambda: session)
+    monkeypatch.setattr(main, "bedrock_models", {})
+    monkeypatch.setattr(main, "PROMPT_CACHE", "off")
+    monkeypatch.setenv("PROMPT_CACHE_BOOKS", "system,tools")
+    monkeypatch.setenv("PROMPT_CACHE_COURSES", "tools")
+    monkeypatch.setenv("PROMPT_CACHE_AUDIOBOOKS", "system")
+    return session.client_instance
+
+def cache_points(blocks):
+    return [index for index, block in enumerate(blocks) if "cachePoint" in block]
+
+@pytest.mark.parametrize("content_type, system_cached, tools_cached", [
+    ("all", False, False),
+    ("books", True, True),
+    ("courses", False, True),
+    ("audiobooks", True, False),
+    ("live-event-series", False, False),
+])
+def test_cache_points_per_profile(bedrock, content_type, system_cached, tools_cached):
+    agent = main.create_session_agent(content_type, summarization_mode="inline")
+    agent("python books")
+    request = bedrock.requests[-1]
+
+    system, tools = request["system"], request["toolConfig"]["tools"]
+    assert system[0]["text"] == main.AGENT_PROFILES[content_type][0]
+    assert cache_points(system) == ([len(system) - 1] if system_cached else [])
+    assert cache_points(tools) == ([len(tools) - 1] if tools_cached else [])
+
+def test_profiles_with_the_same_setting_share_a_client(bedrock):
+    assert main.bedrock_model_for("all") is main.bedrock_model_for("live-event-series")
+    assert main.bedrock_model_for("books") is not main.bedrock_model_for("all")
+
+def test_cache_tokens_reach_turn_usage_and_metrics(bedrock):
+    api_server = pytest.importorskip("api_server")
+    before = {kind: TOKENS_TOTAL.value(content_type="books", kind=kind) for kind in USAGE}
+    try:
+        turn = api_server.invoke_session_agent("python books", "prompt-cache-test", "books")
+    finally:
+        api_server.drop_local_session("prompt-cache-test")
+        api_server.session_store.delete_session("prompt-cache-test")
+
+    assert turn.usage["cacheReadInputTokens"] == 1200
+    assert turn.usage["cacheWriteInputTokens"] == 300
+    for kind, value in USAGE.items():
+        assert TOKENS_TOTAL.value(content_type="books", kind=kind) - before[kind] == value
@@ -0,0 +1,49 @@
+import pytest
+
+from response_cache import ResponseCache, normalize_query, same_word_order
+
+ANSWER = "## Python Books\n\n**Fluent Python**"
+
+@pytest.fixture
+def cache():
+    return ResponseCache(enabled=True, max_entries=100, max_bytes=1024 * 1024, ttl_seconds=60, similarity=0.9)
+
+def test_normalize_keeps_word_order_and_topic_words():
+    assert normalize_query("Python books for beginners") == "python book beginner"
+    assert normalize_query("Machine learning books") == "machine learning book"
+    assert normalize_query("books on python for java developers") != normalize_query("books on java for python developers")
+
+@pytest.mark.parametrize("cached, asked", [
+    ("books on python for java developers", "books on java for python developers"),
+    ("machine learning books", "machine books"),
+    ("python books for beginners", "beginners books for python"),
+    ("python books for beginners", "python books"),
+    ("advanced books on python for java developers with hands on examples",
+     "advanced books on java for python developers with hands on examples"),
+])
+def test_different_meaning_misses(cache, cached, asked):
+    cache.put(cached, "all", ANSWER, latency=5.0)
+    assert cache.get(asked, "all") is None
+
+@pytest.mark.parametrize("cached, asked", [
+    ("python books for beginners", "Python book for beginners please"),
+    ("I want to learn kubernetes", "learn kubernetes"),
+])
+def test_filler_and_plurals_hit_exactly(cache, cached, asked):
+    cache.put(cached, "all", ANSWER, latency=5.0)
+    assert cache.get(asked, "all") == ANSWER
+    assert cache.exact_hits == 1
+
+def test_misspelling_hits_near_duplicate(cache):
+    cache.put("complete beginner guide books for learning python programming fundamentals", "all", ANSWER, 5.0)
+    assert cache.get("complete beginner guide books for learning pyhton programming fundamentals", "all") == ANSWER
+    assert cache.similar_hits == 1
+
+def test_content_types_are_separate(cache):
+    cache.put("python books", "books", ANSWER, latency=5.0)
+    assert cache.get("python books", "courses") is None
+
+def test_same_word_order():
+    assert same_word_order(["python", "book"], ["pyhton", "book"])
+    assert not same_word_order(["python", "java"], ["java", "python"])
+    assert not same_word_order(["python", "book"], ["python", "book", "beginner"])
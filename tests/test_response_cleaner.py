@@ -0,0 +1,35 @@
+import json
+import os
+
+import pytest
+
+from cleaner_reference import reference_clean
+from response_cleaner import StreamingResponseCleaner, clean_and_format_response
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "data", "agent_responses.json")
+
+with open(CORPUS_PATH, encoding="utf-8") as corpus_file:
+    CORPUS = json.load(corpus_file)
+
+def stream(text: str, chunk_size: int) -> str:
+    cleaner = StreamingResponseCleaner()
+    out = "".join(cleaner.feed(text[i:i + chunk_size]) for i in range(0, len(text), chunk_size))
+    out += cleaner.finish()
+    assert out == cleaner.text
+    return out
+
+@pytest.mark.parametrize("sample", CORPUS, ids=[sample["name"] for sample in CORPUS])
+def test_matches_reference(sample):
+    assert clean_and_format_response(sample["text"]) == reference_clean(sample["text"])
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 4096])
+@pytest.mark.parametrize("sample", CORPUS, ids=[sample["name"] for sample in CORPUS])
+def test_streaming_matches_reference(sample, chunk_size):
+    assert stream(sample["text"], chunk_size) == reference_clean(sample["text"])
+
+def test_artifacts_and_escapes_are_removed():
+    sample = next(sample for sample in CORPUS if sample["name"] == "stringified_role_message")
+    cleaned = clean_and_format_response(sample["text"])
+    assert cleaned.startswith("## Python Books for Beginners\n\n")
+    assert "\\n" not in cleaned and "'text'" not in cleaned
+    assert not cleaned.endswith("}")
@@ -0,0 +1,52 @@
+"""Cleaner speed on response-sized inputs, against the reference implementation.
+
+Run with: python -m pytest tests/test_response_cleaner_benchmark.py
+(--benchmark-disable turns it into a plain equivalence check).
+"""
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from cleaner_reference import reference_clean
+from response_cleaner import StreamingResponseCleaner, clean_and_format_response
+from test_response_cleaner import CORPUS
+
+# Agent responses run to tens of KB
+TARGET_CHARS = 40_000
+
+def escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"').replace("'", "\\'")
+
+def _markdown() -> str:
+    names = ("markdown_books", "learning_path_table", "live_events", "meta_commentary_midtext")
+    body = "\n\n".join(sample["text"] for sample in CORPUS if sample["name"] in names)
+    return "\n\n".join([body] * (TARGET_CHARS // len(body) + 1))
+
+MARKDOWN = _markdown()
+INPUTS = {
+    "markdown": MARKDOWN,
+    "escaped_newlines": escape(MARKDOWN),
+    "stringified_message": "'role': 'assistant', 'content': [{'text': \"" + escape(MARKDOWN) + "\"}]}",
+}
+
+def stream(text: str, chunk_size: int = 32) -> str:
+    cleaner = StreamingResponseCleaner()
+    for i in range(0, len(text), chunk_size):
+        cleaner.feed(text[i:i + chunk_size])
+    cleaner.finish()
+    return cleaner.text
+
+@pytest.mark.parametrize("name", INPUTS)
+def test_reference(benchmark, name):
+    benchmark.group = name
+    benchmark(reference_clean, INPUTS[name])
+
+@pytest.mark.parametrize("name", INPUTS)
+def test_clean_and_format_response(benchmark, name):
+    benchmark.group = name
+    assert benchmark(clean_and_format_response, INPUTS[name]) == reference_clean(INPUTS[name])
+
+@pytest.mark.parametrize("name", INPUTS)
+def test_streaming_cleaner(benchmark, name):
+    benchmark.group = name
+    assert benchmark(stream, INPUTS[name]) == reference_clean(INPUTS[name])
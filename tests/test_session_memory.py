@@ -0,0 +1,32 @@
+from session_memory import SessionMemoryManager
+
+def test_evicts_least_recently_used_first():
+    manager = SessionMemoryManager(budget_bytes=100)
+    assert manager.update("a", {"history": 40}) == []
+    assert manager.update("b", {"history": 40}) == []
+    # Using "a" again makes "b" the oldest
+    assert manager.update("a", {"history": 40, "agent_state": 10}) == []
+    assert manager.update("c", {"history": 30}) == ["b"]
+    assert manager.total_bytes == 80
+    assert manager.update("d", {"history": 80}) == ["a", "c"]
+    assert manager.stats()["evictions"] == 3
+    assert manager.footprint("a") is None
+    assert manager.footprint("d") == {"history": 80, "total": 80}
+
+def test_never_evicts_the_session_being_updated():
+    manager = SessionMemoryManager(budget_bytes=100)
+    manager.update("a", {"history": 10})
+    assert manager.update("big", {"history": 500}) == ["a"]
+    assert manager.total_bytes == 500
+    assert manager.update("big", {"history": 50}) == []
+
+def test_forget_and_disabled_budget():
+    manager = SessionMemoryManager(budget_bytes=100)
+    manager.update("a", {"history": 90})
+    manager.forget("a")
+    assert manager.total_bytes == 0
+    assert manager.update("b", {"history": 90}) == []
+
+    unlimited = SessionMemoryManager(budget_bytes=0)
+    for session_id in "abc":
+        assert unlimited.update(session_id, {"history": 10 ** 9}) == []
@@ -0,0 +1,76 @@
+"""Reaping with the shared SQLite store across two worker processes."""
+import asyncio
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from session_store import SQLiteSessionStore
+
+api_server = pytest.importorskip("api_server")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The other worker: its reaper finds every session expired and deletes it
+OTHER_WORKER = textwrap.dedent("""
+    import asyncio
+    import api_server
+    api_server.SESSION_TIMEOUT_HOURS = 0
+    api_server.HEARTBEAT_TIMEOUT_MINUTES = 0
+    print(asyncio.run(api_server.cleanup_old_sessions()))
+""")
+
+def run_other_worker(path: str) -> int:
+    env = dict(os.environ, SESSION_STORE_BACKEND="sqlite", SESSION_STORE_PATH=path,
+               SESSION_SNAPSHOT_PATH="", AGENT_WORKER_PROCESSES="0",
+               AWS_ACCESS_KEY_ID="x", AWS_SECRET_ACCESS_KEY="y")
+    done = subprocess.run([sys.executable, "-c", OTHER_WORKER], cwd=ROOT, env=env,
+                          capture_output=True, text=True, timeout=120, check=True)
+    return int(done.stdout.strip().splitlines()[-1])
+
+@pytest.fixture
+def shared_store(tmp_path, monkeypatch):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    monkeypatch.setattr(api_server, "session_store", store)
+    yield store
+    store.close()
+
+def hold_agents(session_id: str) -> None:
+    """Pretend this worker ran a turn for the session"""
+    key = f"{session_id}_books"
+    api_server.agent_instances[key] = object()
+    api_server.session_agent_keys[session_id] = {key: "books"}
+    api_server.session_locks[session_id] = asyncio.Lock()
+
+def test_agents_of_sessions_reaped_elsewhere_are_dropped(shared_store):
+    for session_id in ("gone", "busy"):
+        shared_store.touch(session_id)
+        shared_store.append_history(session_id, "user", "python books")
+        hold_agents(session_id)
+    api_server.session_lock_users["busy"] = 1
+    try:
+        assert run_other_worker(shared_store.path) == 2
+        assert shared_store.existing_sessions(["gone", "busy"]) == set()
+
+        # This worker's own reaper has nothing expired, but still lets go of the agents
+        assert asyncio.run(api_server.cleanup_old_sessions()) == 0
+        assert "gone" not in api_server.session_agent_keys
+        assert "gone_books" not in api_server.agent_instances
+        assert "gone" not in api_server.session_locks
+        # A turn is still running for this one; a later pass picks it up
+        assert "busy" in api_server.session_agent_keys
+    finally:
+        api_server.session_lock_users.pop("busy", None)
+    asyncio.run(api_server.cleanup_old_sessions())
+    assert "busy" not in api_server.session_agent_keys
+
+def test_live_sessions_keep_their_agents(shared_store):
+    shared_store.touch("live")
+    hold_agents("live")
+    try:
+        assert asyncio.run(api_server.cleanup_old_sessions()) == 0
+        assert "live" in api_server.session_agent_keys
+    finally:
+        api_server.drop_local_session("live")
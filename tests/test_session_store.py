@@ -0,0 +1,115 @@
+import logging
+import time
+
+import pytest
+
+import session_store
+from session_store import HistoryLog, InMemorySessionStore, SQLiteSessionStore
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    return str(tmp_path / "snapshot.db")
+
+def open_store(path: str) -> InMemorySessionStore:
+    return InMemorySessionStore(spill_dir="", snapshot=SQLiteSessionStore(path))
+
+def crash(store: InMemorySessionStore) -> None:
+    """Lose the process without any shutdown: only what reached the snapshot file remains"""
+    store.snapshot.close()
+
+def test_session_survives_a_crash(snapshot_path):
+    store = open_store(snapshot_path)
+    touched = store.touch("s1")
+    store.append_history("s1", "user", "python books")
+    store.append_history("s1", "assistant", "Here are some books." * 50)
+    store.append_history("s1", "user", "dropped")
+    store.pop_history("s1")
+    version = store.save_agent_state("s1", "all", {"messages": [{"role": "user", "content": [{"text": "hi"}]}]})
+    store.save_agent_state("s2", "books", {"messages": []})
+    store.delete_session("s2")
+    crash(store)
+
+    restored = open_store(snapshot_path)
+    assert restored.session_ids() == ["s1"]
+    assert restored.history_length("s1") == 2
+    assert restored.get_history("s1") == [
+        {"role": "user", "content": "python books"},
+        {"role": "assistant", "content": "Here are some books." * 50},
+    ]
+    assert restored.load_agent_state("s1", "all") == (
+        version, {"messages": [{"role": "user", "content": [{"text": "hi"}]}]})
+    assert restored.get_activity("s1") == (touched, touched)
+    restored.close()
+
+def test_restored_sessions_keep_their_expiry_schedule(snapshot_path):
+    store = open_store(snapshot_path)
+    store.touch("recent")
+    store.append_history("idle", "user", "python books")
+    store.snapshot.put_activity("idle", time.time() - 3600, time.time() - 3600)
+    crash(store)
+
+    restored = open_store(snapshot_path)
+    expired = restored.expired_sessions(activity_timeout=1800, heartbeat_timeout=300)
+    assert [session_id for session_id, _ in expired] == ["idle"]
+    restored.close()
+
+def test_history_log_round_trips_compressed_bodies():
+    cold = "Here are some Python books: « Fluent Python », 流畅的Python. " * 20
+    messages = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"{i}: {cold}"} for i in range(10)]
+    messages.append({"role": "system", "content": "ünïcode"})
+    log = HistoryLog.from_messages(messages)
+
+    assert log.messages() == messages
+    packed = [body for body in log._bodies if isinstance(body, bytes)]
+    assert len(packed) == len(messages) - session_store.HISTORY_HOT_MESSAGES
+    plain = [body for body in log._bodies if isinstance(body, str)]
+    assert log.nbytes == sum(len(body) for body in packed) + sum(len(body.encode("utf-8")) for body in plain)
+    assert log.nbytes < sum(len(m["content"].encode("utf-8")) for m in messages)
+
+    log.pop()
+    assert log.messages() == messages[:-1]
+    assert log.nbytes == sum(len(body) for body in packed) + sum(len(body.encode("utf-8")) for body in plain[:-1])
+    while len(log):
+        log.pop()
+    assert log.nbytes == 0
+
+def test_memory_footprint_counts_utf8_bytes():
+    store = InMemorySessionStore(spill_dir="")
+    store.append_history("s1", "user", "日本語の本")
+    store.save_agent_state("s1", "all", {"messages": [{"role": "user", "content": [{"text": "日本語"}]}]})
+    footprint = store.memory_footprint("s1")
+    assert footprint["history"] == len("日本語の本".encode("utf-8"))
+    assert footprint["agent_state"] == sum(store.agent_state_sizes("s1").values())
+    assert footprint["agent_state"] > len(store._agent_states["s1"]["all"][1])
+
+def test_spilled_session_reloads_on_use(tmp_path):
+    store = InMemorySessionStore(spill_dir=str(tmp_path))
+    store.append_history("s1", "user", "python books " * 100)
+    store.append_history("s1", "assistant", "Fluent Python — 流畅的Python")
+    version = store.save_agent_state("s1", "books", {"messages": []})
+    history = store.get_history("s1")
+
+    assert store.spill("s1")
+    assert store.memory_footprint("s1") == {"history": 0, "agent_state": 0}
+    assert store.history_length("s1") == 2
+    assert len(list(tmp_path.iterdir())) == 1
+
+    assert store.get_history("s1") == history
+    assert store.load_agent_state("s1", "books") == (version, {"messages": []})
+    assert list(tmp_path.iterdir()) == []
+    assert not store.spill_drops_state()
+    store.close()
+
+def test_spill_without_a_target_warns(caplog):
+    logger = logging.getLogger("edumentor.session_store")
+    logger.addHandler(caplog.handler)
+    try:
+        store = InMemorySessionStore(spill_dir="")
+        store.append_history("s1", "user", "python books")
+        assert store.spill_drops_state()
+        assert store.spill("s1")
+    finally:
+        logger.removeHandler(caplog.handler)
+    assert store.get_history("s1") == []
+    assert {(r.levelno, r.getMessage()) for r in caplog.records} == {
+        (logging.WARNING, "Dropping history and agent state of session s1 to stay within the memory budget")}
@@ -0,0 +1,99 @@
+"""The private Strands APIs strands_compat.py wraps still behave as it expects.
+
+A failure here after upgrading strands-agents means strands_compat.py (and
+the pin in requirements.txt) needs updating before the managers can be trusted.
+"""
+import asyncio
+import inspect
+import logging
+
+from strands.agent.conversation_manager import SummarizingConversationManager
+from strands.models.model import Model
+
+import conversation_managers
+import strands_compat
+from conversation_managers import BackgroundSummarizingConversationManager, generate_summary_with_usage
+
+class FakeModel(Model):
+    """Streams a fixed reply with fixed usage"""
+
+    def __init__(self, reply: str = "Summary of the chat."):
+        self.reply = reply
+        self.config = {}
+        self.requests = []
+
+    def update_config(self, **model_config):
+        self.config.update(model_config)
+
+    def get_config(self):
+        return self.config
+
+    async def structured_output(self, *args, **kwargs):
+        raise NotImplementedError
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs):
+        self.requests.append((messages, system_prompt))
+        yield {"messageStart": {"role": "assistant"}}
+        yield {"contentBlockStart": {"start": {}}}
+        yield {"contentBlockDelta": {"delta": {"text": self.reply}}}
+        yield {"contentBlockStop": {}}
+        yield {"messageStop": {"stopReason": "end_turn"}}
+        yield {"metadata": {"usage": {"inputTokens": 40, "outputTokens": 8, "totalTokens": 48},
+                            "metrics": {"latencyMs": 1}}}
+
+def text(role, value):
+    return {"role": role, "content": [{"text": value}]}
+
+def tool_turn(tool_id):
+    return [
+        {"role": "assistant", "content": [{"toolUse": {"toolUseId": tool_id, "name": "search_catalog", "input": {}}}]},
+        {"role": "user", "content": [{"toolResult": {"toolUseId": tool_id, "status": "success",
+                                                     "content": [{"text": "[]"}]}}]},
+    ]
+
+def test_manager_hooks_exist():
+    assert "_generate_summary_with_model" in vars(SummarizingConversationManager)
+    assert list(inspect.signature(SummarizingConversationManager._generate_summary_with_model).parameters) == [
+        "self", "messages", "agent"]
+    assert list(inspect.signature(SummarizingConversationManager._adjust_split_point_for_tool_pairs).parameters) == [
+        "self", "messages", "split_point"]
+
+def test_summary_message_round_trips_through_state():
+    manager = SummarizingConversationManager()
+    assert strands_compat.get_summary_message(manager) is None
+    summary = text("user", "Earlier: the user wants Python books.")
+    strands_compat.ensure_tracking_id(summary)
+    assert summary.get("tracking_id")
+    strands_compat.set_summary_message(manager, summary)
+
+    restored = SummarizingConversationManager()
+    restored.restore_from_session(manager.get_state())
+    assert strands_compat.get_summary_message(restored)["content"] == summary["content"]
+
+def test_split_point_does_not_separate_tool_pairs():
+    manager = SummarizingConversationManager()
+    messages = [text("user", "python books")] + tool_turn("t1") + [text("assistant", "Here they are")]
+    # Splitting at 2 would leave a toolResult without its toolUse
+    assert strands_compat.adjust_split_point(manager, messages, 2) == 3
+
+def test_generate_summary_with_usage():
+    model = FakeModel()
+    messages = [text("user", "python books"), text("assistant", "Here are three.")]
+    summary, usage = asyncio.run(generate_summary_with_usage(messages, model))
+    assert summary["role"] == "user"
+    assert "Summary of the chat." in summary["content"][0]["text"]
+    assert usage == {"inputTokens": 40, "outputTokens": 8, "totalTokens": 48}
+    sent, system_prompt = model.requests[0]
+    assert sent[:2] == messages and system_prompt == strands_compat.DEFAULT_SUMMARIZATION_PROMPT
+
+def test_background_trigger_is_clamped_to_twice_preserved(caplog, monkeypatch):
+    monkeypatch.setattr(conversation_managers, "_clamped_triggers", set())
+    with caplog.at_level(logging.WARNING):
+        manager = BackgroundSummarizingConversationManager(preserve_recent_messages=10, summarize_after_messages=12)
+        BackgroundSummarizingConversationManager(preserve_recent_messages=10, summarize_after_messages=12)
+    assert manager.summarize_after_messages == 20
+    assert len([r for r in caplog.records if "twice" in r.getMessage()]) == 1
+
+    caplog.clear()
+    assert BackgroundSummarizingConversationManager(summarize_after_messages=30).summarize_after_messages == 30
+    assert not caplog.records
@@ -0,0 +1,141 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+from opentelemetry import context, propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+
+from structured_logging import get_logger, request_id_var
+
+# Opt-in: without it spans go to OpenTelemetry's no-op tracer
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").strip().lower() in ("1", "true", "yes")
+# "file" writes one JSON span per line; "otlp" sends to OTEL_EXPORTER_OTLP_ENDPOINT
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "file").strip().lower()
+TRACING_FILE_PATH = os.getenv("TRACING_FILE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces.jsonl"))
+TRACING_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "edumentor-api")
+
+logger = get_logger("tracing")
+
+# Strands' own agent, cycle, model and tool spans come from the global
+# tracer provider too, so they nest under the spans started here
+tracer = trace.get_tracer("edumentor")
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Append finished spans to a file as JSON lines - a local stand-in for a collector"""
+
+    def __init__(self, path: str = TRACING_FILE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+        try:
+            with self._lock:
+                self._file.write(lines)
+                self._file.flush()
+        except (OSError, ValueError) as e:
+            logger.error("Failed to write spans to %s: %s", self.path, e)
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+def _create_exporter(name: str) -> Optional[SpanExporter]:
+    if name == "file":
+        return JsonLinesSpanExporter()
+    if name == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.error("TRACING_EXPORTER=otlp needs the opentelemetry-exporter-otlp-proto-http package")
+            return None
+        # Endpoint, headers and timeout come from the standard OTEL_EXPORTER_OTLP_* variables
+        return OTLPSpanExporter()
+    logger.error("Unknown TRACING_EXPORTER %r, tracing disabled", name)
+    return None
+
+_provider: Optional[TracerProvider] = None
+_configure_lock = threading.Lock()
+
+def configure_tracing(service_name: str = TRACING_SERVICE_NAME) -> bool:
+    """Install the global tracer provider and exporter once; True if tracing is on"""
+    global _provider
+    if not TRACING_ENABLED:
+        return False
+    with _configure_lock:
+        if _provider is not None:
+            return True
+        exporter = _create_exporter(TRACING_EXPORTER)
+        if exporter is None:
+            return False
+        provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+        trace.set_tracer_provider(provider)
+        _provider = provider
+        logger.info("Tracing enabled, exporting spans via %s", TRACING_EXPORTER)
+        return True
+
+def shutdown_tracing() -> None:
+    """Flush buffered spans, e.g. on server shutdown"""
+    if _provider is not None:
+        _provider.shutdown()
+
+@contextmanager
+def traced(name: str, **attributes: Any) -> Iterator[trace.Span]:
+    """Run the with-block in a child span of the current one.
+
+    Exceptions are recorded on the span and re-raised. None-valued
+    attributes are dropped since OpenTelemetry rejects them.
+    """
+    with tracer.start_as_current_span(name) as span:
+        if span.is_recording():
+            for key, value in attributes.items():
+                if value is not None:
+                    span.set_attribute(key, value)
+        yield span
+
+def inject_trace_context() -> Dict[str, str]:
+    """W3C trace headers for the current span, to hand to another process"""
+    carrier: Dict[str, str] = {}
+    propagate.inject(carrier)
+    return carrier
+
+@contextmanager
+def remote_parent(carrier: Optional[Dict[str, str]]) -> Iterator[None]:
+    """Make spans in the with-block children of the span carrier was injected from"""
+    token = context.attach(propagate.extract(carrier or {}))
+    try:
+        yield
+    finally:
+        context.detach(token)
+
+class TracingMiddleware:
+    """ASGI middleware that opens a chat.request span for requests to the given paths.
+
+    The span stays open until the response body is finished, so streamed
+    turns and everything they trigger land in one trace.
+    """
+
+    def __init__(self, app, paths: Sequence[str]):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        with traced("chat.request", **{"http.method": scope["method"], "http.route": scope["path"],
+                                       "request_id": request_id_var.get()}) as span:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start" and span.is_recording():
+                    span.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)